@@ -34,6 +34,7 @@ import ipv6_utils
 from static import OF_TABLE_UES
 from static import OF_TABLE_NEIGH
 from static import OF_TABLE_ROUTING
+from static import TEEM_MAKE_BEFORE_BREAK
 
 from switch import OFRule
 
@@ -56,6 +57,8 @@ from nmm.event import EventSwitchUpdate
 from nmm.event import EventSwitchLeave
 
 from amm.event import EventUEAnchorsUpdate
+
+from teem.event import EventHandoverComplete
 # End import from iJOIN solution files
 
 # Start import from Ryu files
@@ -96,12 +99,15 @@ class AccessPoint(app_manager.RyuApp):
 		================ =========================================================
 		access_points    The dictionary storing the switches enabled with access
 						 point functionalities
+		_pending_removals The dictionary storing the EventRemoveNeighborNode
+						 waiting for the end of the handover, by UE hw_addr
 		================ =========================================================
 		"""	
 		super(AccessPoint, self).__init__(*args, **kwargs)
 		self.logger = log.get_logger(self.name)
 		self.access_points = {}
 		self.connected_ues = {}
+		self._pending_removals = {}
 
 
 	def _add_switch_ap(self, switch):
@@ -165,6 +171,23 @@ class AccessPoint(app_manager.RyuApp):
 		if prev_att and prev_att.switch != ev.ue.attachment.switch and prev_att.port != ev.ue.attachment.port:
 			# Remove IPv6 local address
 			req = EventRemoveNeighborNode(prev_att.switch, prev_att.port, ev.ue.ipv6_addr, ev.ue.hw_addr)
+			if TEEM_MAKE_BEFORE_BREAK:
+				# Once the traffic is redirected to the new AP
+				self._pending_removals.setdefault(ev.ue.hw_addr, []).append(req)
+			else:
+				self.send_event(req.dst, req)
+
+
+	@set_ev_cls(EventHandoverComplete, MAIN_DISPATCHER)
+	def _handler_handover_complete(self, ev):
+		"""
+		Handler for EventHandoverComplete
+		Remove UE's IPv6 local address from the previous UE's attachment 
+		points neighbors, but the current one
+		"""
+		for req in self._pending_removals.pop(ev.ue.hw_addr, []):
+			if ev.ue.attachment and req.switch == ev.ue.attachment.switch and req.port == ev.ue.attachment.port:
+				continue
 			self.send_event(req.dst, req)
 
 
@@ -178,6 +201,9 @@ class AccessPoint(app_manager.RyuApp):
 		   point neighbors
 		3) Remove the UE from UE's attachment point served UEs
 		"""
+		for req in self._pending_removals.pop(ev.ue.hw_addr, []):
+			self.send_event(req.dst, req)
+
 		prev_att = ev.ue.get_prev_attachment()
 		if prev_att:
 			# Remove IPv6 local address
@@ -32,6 +32,14 @@ import log
 
 from node import Anchor
 
+from timeslice import TimeSlicer
+
+from tracing import tracer
+
+from static import AMM_LOAD_WEIGHT
+from static import AMM_RATE_WEIGHT
+from static import AMM_GW_MAX_UES
+
 from event import *
 
 from nmm.event import EventTopologyUpdate
@@ -75,6 +83,17 @@ class Amm(app_manager.RyuApp):
 		switches         The dictionary storing the switches
 		gateways         The dictionary storing the switches enabled with
 						 gateway functionalities
+		matrix           The distance matrix between the switches
+		index            The dictionary storing the matrix index of each dpid
+		ap_gateways      The dictionary storing the dpid of the closest gateway
+						 of each AP, None if no gateway is reachable, by AP 
+						 dpid. An entry is dropped when the distances from 
+						 the AP to the gateways change.
+		ue_gateways      The dictionary storing the dpid of the closest 
+						 gateway of the AP of each UE when its anchors were
+						 selected, by UE id
+		served_ues       The dictionary storing the set of the ids of the UEs
+						 anchored by default to each gateway, by gateway dpid
 		================ =========================================================
 		"""	
 		super(Amm, self).__init__(*args, **kwargs)
@@ -84,6 +103,15 @@ class Amm(app_manager.RyuApp):
 		self.gateways = {}
 		self.pgw = None
 
+		self.previous = {}
+		self.distance = {}
+		self.matrix = numpy.zeros((0, 0))
+		self.index = {}
+
+		self.ap_gateways = {}
+		self.ue_gateways = {}
+		self.served_ues = {}
+
 
 	def _assign_ue_anchors(self, ue):
 		"""
@@ -105,8 +133,12 @@ class Amm(app_manager.RyuApp):
 
 		# The default gw
 		anch = self._get_closest_ue_anchor(ue)
+		self.ue_gateways[ue.id] = self._get_ap_gateway(ue.attachment.switch.switch.dp.id)
+		for served in self.served_ues.itervalues():
+			served.discard(ue.id)
 		if anch:
 			a_dict[anch.gw.switch.dp.id] = anch
+			self.served_ues.setdefault(anch.gw.switch.dp.id, set()).add(ue.id)
 			self.logger.info("Switch <" + str(hex(anch.gw.switch.dp.id)) + "> " + \
 							 "selected as default gateway for UE <" + str(self.ues[ue.id].hw_addr) + ">")
 
@@ -122,21 +154,57 @@ class Amm(app_manager.RyuApp):
 		Find the Local GW
 		"""
 		# Find the Local-GW
-		dists = {}
-		for gw_dpid in self.gateways.keys():
-			try:
-				dists[gw_dpid] = self.distance[self.ues[ue.id].attachment.switch.switch.dp.id][gw_dpid]
-			except KeyError:
-				pass
-
-		if dists:
-			index = min(dists, key=dists.get)
-			if index in self.switches:
-				return self._get_anchor_from_gw_ue(self.switches[min(dists, key=dists.get)], ue)
+		ap_dpid = self.ues[ue.id].attachment.switch.switch.dp.id
+		if AMM_LOAD_WEIGHT or AMM_RATE_WEIGHT or AMM_GW_MAX_UES:
+			index = self._get_least_cost_gateway(ap_dpid, ue)
+		else:
+			index = self._get_ap_gateway(ap_dpid)
+		if index in self.switches:
+			return self._get_anchor_from_gw_ue(self.switches[index], ue)
 
 		return self.pgw
 
 
+	def _get_ap_gateway(self, ap_dpid):
+		"""
+		Return the dpid of the closest gateway of the AP, 
+		None if no gateway is reachable
+		"""
+		if ap_dpid not in self.ap_gateways:
+			gw = None
+			gws = [gw_dpid for gw_dpid in self.gateways.keys() if gw_dpid in self.index]
+			if ap_dpid in self.index and gws:
+				dists = self.matrix[self.index[ap_dpid], [self.index[gw_dpid] for gw_dpid in gws]]
+				gw = gws[int(numpy.argmin(dists))]
+			self.ap_gateways[ap_dpid] = gw
+
+		return self.ap_gateways[ap_dpid]
+
+
+	def _get_least_cost_gateway(self, ap_dpid, ue):
+		"""
+		Return the dpid of the gateway with the lowest cost from the AP,
+		combining the distance with the load of the gateway
+		"""
+		gws = [gw_dpid for gw_dpid in self.gateways.keys() if gw_dpid in self.index]
+		if ap_dpid not in self.index or not gws:
+			return None
+
+		dists = self.matrix[self.index[ap_dpid], [self.index[gw_dpid] for gw_dpid in gws]]
+		# The UE itself does not load the gateway it is anchored to
+		served = numpy.array([len(self.served_ues.get(gw_dpid, ())) - 
+							(ue.id in self.served_ues.get(gw_dpid, ())) for gw_dpid in gws])
+		rates = numpy.array([self.gateways[gw_dpid].gw_conf.rate / 1e6 for gw_dpid in gws])
+		costs = dists + AMM_LOAD_WEIGHT * served + AMM_RATE_WEIGHT * rates
+
+		if AMM_GW_MAX_UES:
+			full = served >= AMM_GW_MAX_UES
+			if (numpy.isfinite(dists) & ~full).any():
+				costs[full] = numpy.inf
+
+		return gws[int(numpy.argmin(costs))]
+
+
 	def _get_anchor_from_gw_ue(self, gw, ue):
 		"""
 		Return an Anchor object.
@@ -149,13 +217,28 @@ class Amm(app_manager.RyuApp):
 		return Anchor(gw, nw_prefix)
 
 
+	def _check_ue_routing_changed(self, ue, changed):
+		"""
+		Check if a path between the UE's access point and
+		an anchor of the UE changed.
+		"""
+		ap_dpid = ue.attachment.switch.switch.dp.id
+		for gw_dpid in ue.attachment.anchors.keys():
+			if (ap_dpid, gw_dpid) in changed or (gw_dpid, ap_dpid) in changed:
+				return True
+
+		return False
+
+
 	@set_ev_cls(EventUEConnected, MAIN_DISPATCHER)
 	def _handler_ue_connected(self, ev):
 		"""
 		Manage UE connection
 		"""
+		tracer.stamp(ev.ue.attachment.trace_id, 'connected')
 		self.ues[ev.ue.id] = ev.ue
 		self._assign_ue_anchors(ev.ue)
+		tracer.stamp(ev.ue.attachment.trace_id, 'anchors')
 
 
 	@set_ev_cls(EventUEDisconnected, MAIN_DISPATCHER)
@@ -167,6 +250,9 @@ class Amm(app_manager.RyuApp):
 			del self.ues[ev.ue.id]
 		except KeyError:
 			pass
+		self.ue_gateways.pop(ev.ue.id, None)
+		for served in self.served_ues.itervalues():
+			served.discard(ev.ue.id)
 
 
 	@set_ev_cls(EventRoutingUpdate, MAIN_DISPATCHER)
@@ -177,25 +263,54 @@ class Amm(app_manager.RyuApp):
 		"""
 		self.previous = ev.previous
 		self.distance = ev.distance
-
-		# Find the P-GW
-		dists = {}
-		for gw_dpid in self.gateways.keys():
-			try:
-				ap_dist = [ap_dist for ap_dpid, ap_dist in self.distance[gw_dpid].iteritems() if ap_dpid in self.switches and self.switches[ap_dpid].is_ap]
-				if ap_dist and float('inf') not in ap_dist:
-					dists[gw_dpid] = numpy.median(ap_dist)/(1+numpy.var(ap_dist)) 
-
-				if dists:
-					index = max(dists, key=dists.get)
-					if index in self.switches:
-						self.pgw = self.switches[index]
-			except KeyError:
-				pass
-
-		# Update UE anchors, the topology changed, so select the best anchor
-		for ue in self.ues.itervalues():
-			self._assign_ue_anchors(ue)
+		self.matrix = ev.matrix
+		self.index = ev.index
+		pgw = self.pgw
+
+		# Find the P-GW: the gateway reaching all the APs with the best
+		# ratio between the median distance and the distance variance
+		gws = [gw_dpid for gw_dpid in self.gateways.keys() if gw_dpid in self.index]
+		aps = [i for dpid, i in self.index.iteritems() if dpid in self.switches and self.switches[dpid].is_ap]
+		if gws and aps:
+			ap_dist = self.matrix[numpy.ix_([self.index[gw_dpid] for gw_dpid in gws], aps)]
+			reach_all = numpy.isfinite(ap_dist).all(axis = 1)
+			if reach_all.any():
+				with numpy.errstate(invalid = 'ignore'):
+					dists = numpy.median(ap_dist, axis = 1)/(1+numpy.var(ap_dist, axis = 1))
+				dists[~reach_all] = -numpy.inf
+				index = gws[int(numpy.argmax(dists))]
+				if index in self.switches:
+					self.pgw = self.switches[index]
+
+		# Forget the closest gateway of the APs whose distances 
+		# toward the gateways changed
+		if ev.changed is None:
+			self.ap_gateways = {}
+		else:
+			for src, dst in ev.changed:
+				if src in self.gateways:
+					self.ap_gateways.pop(dst, None)
+				if dst in self.gateways:
+					self.ap_gateways.pop(src, None)
+
+		# Update UE anchors, the topology changed, so select the best anchor.
+		# Only the UEs whose closest gateway changed are reassigned, the 
+		# UEs whose paths toward the anchors changed are updated
+		reassigned = 0
+		updated = 0
+		slicer = TimeSlicer("Anchors reassignment", self.logger)
+		for ue in slicer.iterate(self.ues.values()):
+			gw_dpid = self._get_ap_gateway(ue.attachment.switch.switch.dp.id)
+			if gw_dpid != self.ue_gateways.get(ue.id) or (gw_dpid is None and self.pgw is not pgw):
+				self._assign_ue_anchors(ue)
+				reassigned += 1
+			elif ev.changed is None or self._check_ue_routing_changed(ue, ev.changed):
+				ev_ue = EventUEAnchorsUpdate(ue)
+				self.send_event_to_observers(ev_ue)
+				updated += 1
+		slicer.done()
+
+		self.logger.debug("Anchors of " + str(reassigned) + " UEs reassigned, " + str(updated) + " UEs with new paths")
 
 
 	@set_ev_cls(EventTopologyUpdate, MAIN_DISPATCHER)
@@ -206,8 +321,10 @@ class Amm(app_manager.RyuApp):
 		"""
 		self.switches = ev.switches
 
-		for sw_dpid, sw in ev.switches.iteritems():
-			if sw.is_gw and sw_dpid not in self.gateways:
-				self.gateways[sw_dpid] = sw
-			if not sw.is_gw and sw_dpid in self.gateways:
-				del self.gateways[sw_dpid]
+		# The gateways which left are dropped and those which 
+		# reconnected come with a new Switch and GatewayConf
+		gws = set(self.gateways.keys())
+		self.gateways = dict((sw_dpid, sw) for sw_dpid, sw in ev.switches.iteritems() if sw.is_gw)
+		# The closest gateway of every AP may change
+		if set(self.gateways.keys()) != gws:
+			self.ap_gateways = {}
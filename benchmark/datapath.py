@@ -0,0 +1,250 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+
+# Start import from iJOIN solution files
+from static import TEEM_DEBOUNCE_MAX_DELAY
+# End import from iJOIN solution files
+
+# Start import from Ryu files
+import collections
+import inspect
+import logging
+import struct
+
+from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_3 as ofproto
+from ryu.ofproto import ofproto_v1_3_parser as ofp_parser
+
+from ryu.topology import event as topo_event
+from ryu.topology.switches import Switch as RyuSwitch
+from ryu.topology.switches import Link as RyuLink
+# End import from Ryu files
+
+
+
+
+class FakeDatapath(object):
+	"""
+	A datapath which records the OpenFlow messages sent by the controller
+	instead of writing them to a socket.
+	"""
+	ofproto = ofproto
+	ofproto_parser = ofp_parser
+
+	def __init__(self, dpid):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		id               The datapath id, Int instance
+		xid              The last transaction id assigned
+		msg_count        Counter of the messages sent, by OpenFlow message type
+		writes           The number of socket writes
+		================ =========================================================
+		"""
+		self.id = dpid
+		self.xid = 0
+		self.msg_count = collections.Counter()
+		self.writes = 0
+
+
+	def set_xid(self, msg):
+		self.xid += 1
+		msg.set_xid(self.xid)
+		return self.xid
+
+
+	def send_msg(self, msg):
+		if msg.xid is None:
+			self.set_xid(msg)
+		msg.serialize()
+		self.send(msg.buf)
+
+
+	def send(self, buf):
+		"""
+		Account a socket write, a buffer may hold several messages.
+		"""
+		self.writes += 1
+		off = 0
+		while off + ofproto.OFP_HEADER_SIZE <= len(buf):
+			_, msg_type, msg_len, _ = struct.unpack_from(ofproto.OFP_HEADER_PACK_STR, buf, off)
+			self.msg_count[msg_type] += 1
+			off += msg_len
+
+
+	def reset(self):
+		self.msg_count.clear()
+		self.writes = 0
+
+
+class EventBus(object):
+	"""
+	Dispatch the events among a set of RyuApps synchronously,
+	in FIFO order, without the Ryu app manager.
+	"""
+	def __init__(self, apps):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		apps             The dictionary storing the RyuApps by name
+		================ =========================================================
+		"""
+		self.apps = collections.OrderedDict((app.name, app) for app in apps)
+		self._queue = collections.deque()
+		self._handlers = {}
+
+		for app in apps:
+			handlers = collections.defaultdict(list)
+			for _, method in inspect.getmembers(app, inspect.ismethod):
+				for ev_cls in getattr(method, 'callers', {}):
+					handlers[ev_cls].append(method)
+			self._handlers[app.name] = handlers
+
+			app.send_event = self._get_send_event(app)
+			app.send_event_to_observers = self._get_send_event_to_observers(app)
+			app.logger.setLevel(logging.WARNING)
+
+
+	def _get_send_event(self, app):
+		def send_event(name, ev, state = None):
+			if hasattr(ev, 'src'):
+				ev.src = app.name
+			self._queue.append((name, ev))
+		return send_event
+
+
+	def _get_send_event_to_observers(self, app):
+		def send_event_to_observers(ev, state = None):
+			for name in self.apps:
+				self._queue.append((name, ev))
+		return send_event_to_observers
+
+
+	def post(self, name, ev):
+		"""
+		Deliver ev to the app name and run until no event is pending.
+		"""
+		self._queue.append((name, ev))
+		self.run()
+
+
+	def run(self):
+		while self._queue:
+			while self._queue:
+				name, ev = self._queue.popleft()
+				for handler in self._handlers[name].get(type(ev), []):
+					handler(ev)
+			# Let the greenthreads spawned by the handlers run,
+			# e.g. the flush of the Nmm send queues
+			hub.sleep(0)
+
+
+	def settle(self, seconds):
+		"""
+		Let the timers of the apps expire, e.g. the Teem routing 
+		debounce, and deliver the events they posted.
+		"""
+		hub.sleep(seconds)
+		self.run()
+
+
+class Topology(object):
+	"""
+	Build a synthetic topology: a core switch connecting access points
+	and gateways. Switches and links are announced to Nmm through 
+	the Ryu topology events.
+	"""
+	def __init__(self, bus, aps, gws, first_dpid = 0x10001000):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		switches         The dictionary storing the Ryu Switch instances
+		aps              The list of access point dpids
+		gws              The list of gateway dpids
+		core             The core switch dpid
+		================ =========================================================
+		The default first_dpid gives switch addresses whose string form 
+		is canonical, so they match the addresses decoded from packets.
+		"""
+		self.bus = bus
+		self.switches = {}
+
+		self.core = first_dpid
+		self.aps = [first_dpid + 1 + i for i in range(aps)]
+		self.gws = [first_dpid + 1 + aps + i for i in range(gws)]
+
+		self.add_switch(self.core, ['core%d' % i for i in range(aps + gws)])
+		for i, dpid in enumerate(self.aps + self.gws):
+			iface = 'wlan0' if dpid in self.aps else 'gw0'
+			self.add_switch(dpid, [iface, 'up0'])
+			self.add_link(dpid, 2, self.core, i + 1)
+
+		# Wait for the routing of the whole topology
+		self.bus.settle(TEEM_DEBOUNCE_MAX_DELAY)
+
+
+	def add_switch(self, dpid, port_names):
+		sw = RyuSwitch(FakeDatapath(dpid))
+		for i, name in enumerate(port_names):
+			port_no = i + 1
+			hw_addr = '02:00:00:00:%02x:%02x' % (dpid & 0xff, port_no)
+			sw.add_port(ofp_parser.OFPPort(port_no, hw_addr, name, 0, 0, 0, 0, 0, 0, 0, 0))
+		self.switches[dpid] = sw
+		self.bus.post('Nmm', topo_event.EventSwitchEnter(sw))
+
+
+	def add_link(self, dpid_a, port_a, dpid_b, port_b):
+		port_a = self.switches[dpid_a].ports[port_a - 1]
+		port_b = self.switches[dpid_b].ports[port_b - 1]
+		self.bus.post('Nmm', topo_event.EventLinkAdd(RyuLink(port_a, port_b)))
+		self.bus.post('Nmm', topo_event.EventLinkAdd(RyuLink(port_b, port_a)))
+
+
+	def datapath(self, dpid):
+		return self.switches[dpid].dp
+
+
+	def reset(self):
+		for sw in self.switches.itervalues():
+			sw.dp.reset()
+
+
+	def msg_count(self):
+		count = collections.Counter()
+		for sw in self.switches.itervalues():
+			count.update(sw.dp.msg_count)
+		return count
+
+
+	def writes(self):
+		return sum(sw.dp.writes for sw in self.switches.itervalues())
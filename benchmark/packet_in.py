@@ -0,0 +1,273 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+
+"""
+PacketIn throughput benchmark.
+
+Generated (or recorded, from a pcap file) RS, NS, NA and unknown 
+destination IPv6 frames are fed into Packet._handler_packet_in. 
+The resulting events run through the Packet -> Mme/Ndisc -> ... chain
+synchronously, while the switches are replaced by fake datapaths
+recording the messages sent by the controller.
+
+Usage:
+	$ PYTHONPATH=$(pwd) python benchmark/packet_in.py --count 2000
+"""
+
+# Start import from iJOIN solution files
+import ipv6_utils
+
+from static import MN_ETH
+
+from benchmark.datapath import EventBus
+from benchmark.datapath import Topology
+
+from packet.packet import Packet
+from nmm.nmm import Nmm
+from mme.mme import Mme
+from ndisc.ndisc import Ndisc
+from amm.amm import Amm
+from teem.teem import Teem
+from accesspoint.accesspoint import AccessPoint
+from gateway.gateway import Gateway
+# End import from iJOIN solution files
+
+# Start import from Ryu files
+import argparse
+import collections
+import time
+
+from ryu.controller.ofp_event import EventOFPPacketIn
+
+from ryu.lib import pcaplib
+
+from ryu.lib.packet import packet
+from ryu.lib.packet import ethernet
+from ryu.lib.packet import ipv6
+from ryu.lib.packet import icmpv6
+
+from ryu.ofproto import ether
+from ryu.ofproto import inet
+from ryu.ofproto import ofproto_v1_3 as ofproto
+from ryu.ofproto import ofproto_v1_3_parser as ofp_parser
+# End import from Ryu files
+
+
+
+
+APPS = [Nmm, Packet, Mme, Ndisc, Amm, Teem, AccessPoint, Gateway]
+
+MSG_NAMES = {ofproto.OFPT_FLOW_MOD: 'FlowMod',
+			ofproto.OFPT_PACKET_OUT: 'PacketOut',
+			ofproto.OFPT_GROUP_MOD: 'GroupMod',
+			ofproto.OFPT_BARRIER_REQUEST: 'Barrier',
+		}
+
+
+def _mac(prefix, i):
+	return prefix + ':%02x:%02x:%02x' % ((i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff)
+
+
+def _serialize(*protocols):
+	pkt = packet.Packet()
+	for p in protocols:
+		pkt.add_protocol(p)
+	pkt.serialize()
+	return bytes(pkt.data)
+
+
+def router_solicitation(mac_src):
+	ipv6_src = ipv6_utils.ipv6_local_ucast_from_mac(mac_src)
+	return _serialize(ethernet.ethernet('33:33:00:00:00:02', mac_src, ether.ETH_TYPE_IPV6),
+					ipv6.ipv6(src = ipv6_src, dst = 'ff02::2', nxt = inet.IPPROTO_ICMPV6),
+					icmpv6.icmpv6(type_ = icmpv6.ND_ROUTER_SOLICIT,
+						data = icmpv6.nd_router_solicit(option = icmpv6.nd_option_sla(hw_src = mac_src))))
+
+
+def neighbor_solicitation(mac_src, ipv6_tgt):
+	ipv6_src = ipv6_utils.ipv6_local_ucast_from_mac(mac_src)
+	return _serialize(ethernet.ethernet('33:33:00:00:00:01', mac_src, ether.ETH_TYPE_IPV6),
+					ipv6.ipv6(src = ipv6_src, dst = 'ff02::1', nxt = inet.IPPROTO_ICMPV6),
+					icmpv6.icmpv6(type_ = icmpv6.ND_NEIGHBOR_SOLICIT,
+						data = icmpv6.nd_neighbor(dst = ipv6_tgt, option = icmpv6.nd_option_sla(hw_src = mac_src))))
+
+
+def neighbor_advertisement(mac_src, mac_dst, ipv6_tgt, ipv6_dst):
+	return _serialize(ethernet.ethernet(mac_dst, mac_src, ether.ETH_TYPE_IPV6),
+					ipv6.ipv6(src = ipv6_tgt, dst = ipv6_dst, nxt = inet.IPPROTO_ICMPV6),
+					icmpv6.icmpv6(type_ = icmpv6.ND_NEIGHBOR_ADVERT,
+						data = icmpv6.nd_neighbor(dst = ipv6_tgt, res = 3, option = icmpv6.nd_option_tla(hw_src = mac_src))))
+
+
+def unknown_ip(mac_dst, ipv6_src, ipv6_dst, size):
+	return _serialize(ethernet.ethernet(mac_dst, '02:ff:00:00:00:01', ether.ETH_TYPE_IPV6),
+					ipv6.ipv6(src = ipv6_src, dst = ipv6_dst, nxt = inet.IPPROTO_UDP),
+					'\0' * size)
+
+
+def packet_in(datapath, in_port, data):
+	msg = ofp_parser.OFPPacketIn(datapath, buffer_id = ofproto.OFP_NO_BUFFER, total_len = len(data),
+								reason = ofproto.OFPR_ACTION, table_id = 0, cookie = 0,
+								match = ofp_parser.OFPMatch(in_port = in_port), data = data)
+	return EventOFPPacketIn(msg)
+
+
+def percentile(values, p):
+	"""
+	Return the p-th percentile of a sorted list
+	"""
+	if not values:
+		return 0.0
+	k = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+	return values[k]
+
+
+class Benchmark(object):
+	"""
+	Drive the PacketIn chain and collect the statistics per input type
+	"""
+	def __init__(self, aps, gws):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		bus              The EventBus running the RyuApps
+		topo             The synthetic Topology
+		latency          The dictionary storing the latencies by input type
+		fanout           The dictionary storing the messages sent by input type
+		writes           The dictionary storing the socket writes by input type
+		================ =========================================================
+		"""
+		self.bus = EventBus([app() for app in APPS])
+		self.topo = Topology(self.bus, aps, gws)
+		self.nmm = self.bus.apps['Nmm']
+
+		self.latency = collections.defaultdict(list)
+		self.fanout = collections.defaultdict(collections.Counter)
+		self.writes = collections.Counter()
+
+
+	def feed(self, kind, dpid, in_port, data):
+		ev = packet_in(self.topo.datapath(dpid), in_port, data)
+
+		self.topo.reset()
+		start = time.time()
+		self.bus.post('Packet', ev)
+		self.latency[kind].append(time.time() - start)
+
+		self.fanout[kind].update(self.topo.msg_count())
+		self.writes[kind] += self.topo.writes()
+
+
+	def run_generated(self, count, size):
+		"""
+		Feed count frames of each type
+		"""
+		aps = self.topo.aps
+		gws = self.topo.gws
+
+		# Router Solicitations from mobile nodes, spread over the APs
+		for i in range(count):
+			mac = _mac('00:11:22', i)
+			if mac not in MN_ETH:
+				MN_ETH.append(mac)
+			self.feed('RS', aps[i % len(aps)], 1, router_solicitation(mac))
+
+		# Neighbor Solicitations targeting the APs
+		for i in range(count):
+			ap = self.nmm.switches[aps[i % len(aps)]]
+			self.feed('NS', ap.switch.dp.id, 1, neighbor_solicitation(_mac('02:aa:00', i), ap.ipv6_local_ucast_addr))
+
+		# Packets toward unknown destinations behind the gateways
+		targets = []
+		for i in range(count):
+			gw = self.nmm.switches[gws[i % len(gws)]]
+			ipv6_dst = '2001:db8::%x' % (i + 1)
+			targets.append((gw, ipv6_dst, _mac('02:bb:00', i)))
+			self.feed('UNKNOWN', gw.switch.dp.id, 1, unknown_ip(gw.hw_addr, '2001:db8:1::1', ipv6_dst, size))
+
+		# Neighbor Advertisements resolving the unknown destinations
+		for gw, ipv6_dst, mac in targets:
+			self.feed('NA', gw.switch.dp.id, 1, neighbor_advertisement(mac, gw.hw_addr, ipv6_dst, gw.ipv6_local_ucast_addr))
+
+
+	def run_pcap(self, pcap_file, dpid, in_port):
+		"""
+		Feed the frames recorded in a pcap file
+		"""
+		with open(pcap_file, 'rb') as f:
+			for _, data in pcaplib.Reader(f):
+				self.feed('PCAP', dpid, in_port, data)
+
+
+	def report(self):
+		total_pkts = sum(len(l) for l in self.latency.itervalues())
+		total_time = sum(sum(l) for l in self.latency.itervalues())
+
+		print('%-8s %8s %10s %9s %9s %9s %9s  %s' % ('input', 'packets', 'pkts/s', 'p50 us', 'p90 us',
+															'p99 us', 'max us', 'fan-out per input'))
+		for kind, lat in sorted(self.latency.iteritems()):
+			lat = sorted(lat)
+			n = len(lat)
+			fanout = ', '.join('%s %.2f' % (MSG_NAMES.get(t, 'type %d' % t), c / float(n))
+								for t, c in sorted(self.fanout[kind].iteritems()))
+			fanout += ', writes %.2f' % (self.writes[kind] / float(n))
+			print('%-8s %8d %10.0f %9.1f %9.1f %9.1f %9.1f  %s' % (kind, n, n / sum(lat),
+					percentile(lat, 50) * 1e6, percentile(lat, 90) * 1e6,
+					percentile(lat, 99) * 1e6, lat[-1] * 1e6, fanout))
+		print('%-8s %8d %10.0f' % ('total', total_pkts, total_pkts / total_time))
+
+		stats = self.nmm.send_stats
+		if stats['batches']:
+			print('Nmm sent %d messages in %d batches, %.2f messages per batch' % (stats['messages'],
+					stats['batches'], stats['messages'] / float(stats['batches'])))
+
+
+def main():
+	parser = argparse.ArgumentParser(description = 'PacketIn throughput benchmark')
+	parser.add_argument('--aps', type = int, default = 8, help = 'number of access points')
+	parser.add_argument('--gws', type = int, default = 2, help = 'number of gateways')
+	parser.add_argument('--count', type = int, default = 1000, help = 'frames generated per type')
+	parser.add_argument('--size', type = int, default = 512, help = 'payload of the unknown destination frames')
+	parser.add_argument('--pcap', help = 'feed the frames recorded in the pcap file instead')
+	parser.add_argument('--dpid', type = lambda x: int(x, 0), help = 'dpid receiving the recorded frames')
+	parser.add_argument('--in-port', type = int, default = 1, help = 'port receiving the recorded frames')
+	args = parser.parse_args()
+
+	bench = Benchmark(args.aps, args.gws)
+	if args.pcap:
+		bench.run_pcap(args.pcap, args.dpid or bench.topo.aps[0], args.in_port)
+	else:
+		bench.run_generated(args.count, args.size)
+	bench.report()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,227 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+"""
+Routing recomputation benchmark.
+
+Random connected topologies (a ring plus random chords and parallel
+links, unit weights so that equal cost paths are common) are routed 
+from every switch, as Teem._update_routing does on each topology change.
+The heap based Dijkstra of teem.routing is timed against the previous
+list based implementation, whose results it must reproduce exactly,
+and against the vectorized Floyd-Warshall, whose distances must match.
+The worker column is the time the controller spends to hand the same
+computation to the routing worker and to apply its result.
+
+Usage:
+	$ PYTHONPATH=$(pwd) python benchmark/routing.py --sizes 50,100,200,500,1000,2000
+"""
+
+# Start import from iJOIN solution files
+from teem import routing
+# End import from iJOIN solution files
+
+# Start import from Ryu files
+import argparse
+import random
+import time
+# End import from Ryu files
+
+
+
+
+class FakePort(object):
+	def __init__(self, dpid, port_no):
+		self.dpid = dpid
+		self.port_no = port_no
+
+
+class FakeLink(object):
+	"""
+	Both the Teem Link and the Ryu Link it extends
+	"""
+	def __init__(self, src, dst, weight = 1):
+		self.link = self
+		self.src = src
+		self.dst = dst
+		self.weight = weight
+
+
+class FakeSwitch(object):
+	def __init__(self, dpid):
+		self.dpid = dpid
+		self.links = {}
+		self.ports = 0
+
+
+	def port(self):
+		self.ports += 1
+		return FakePort(self.dpid, self.ports)
+
+
+def topology(size, degree, parallel, seed):
+	"""
+	Build size switches with an average degree close to degree,
+	a fraction parallel of the links is doubled
+	"""
+	rnd = random.Random(seed)
+	switches = dict((dpid, FakeSwitch(dpid)) for dpid in range(1, size + 1))
+
+	def add_link(a, b):
+		a_port, b_port = switches[a].port(), switches[b].port()
+		switches[a].links.setdefault(b, []).append(FakeLink(a_port, b_port))
+		switches[b].links.setdefault(a, []).append(FakeLink(b_port, a_port))
+
+	for dpid in range(1, size + 1):
+		add_link(dpid, dpid % size + 1)
+	for _ in range(size * (degree - 2) // 2):
+		a, b = rnd.sample(range(1, size + 1), 2)
+		add_link(a, b)
+		if rnd.random() < parallel:
+			add_link(a, b)
+
+	return switches
+
+
+def legacy_dijkstra(switches, start):
+	"""
+	The list based implementation previously used by Teem
+	"""
+	previous = {}
+	distance = {}
+
+	for sw in switches.keys():
+		distance[sw] = float('inf')
+		previous[sw] = None
+	distance[start] = 0
+
+	q = switches.keys()
+	while q:
+		u = q[0]
+		for node in q[1:]:
+			if (u not in distance) or ((node in distance) and (distance[node] < distance[u])):
+				u = node
+		q.remove(u)
+
+		for v, link in switches[u].links.iteritems():
+			for l in link:
+				if v in q:
+					alt = distance[u] + l.weight
+					if (v not in distance) or (alt < distance[v]):
+						distance[v] = alt
+						previous[v] = l
+
+	return distance, previous
+
+
+def recompute(switches):
+	"""
+	Route from every switch with the heap based Dijkstra
+	"""
+	graph = routing.Graph(switches)
+	return dict((dpid, routing.shortest_paths_dict(graph, dpid)) for dpid in switches)
+
+
+def recompute_floyd_warshall(switches):
+	paths = routing.ShortestPaths('floyd_warshall')
+	paths.update(switches)
+	return paths.distance
+
+
+def recompute_worker(worker, switches):
+	"""
+	Route from every switch in the routing worker.
+	Return the time spent in the controller, to snapshot the topology 
+	and to apply the result, and the distances.
+	"""
+	paths = routing.ShortestPaths(worker.algorithm)
+
+	start = time.time()
+	worker.submit(switches, reset = True)
+	hub_time = time.time() - start
+
+	result = None
+	while result is None:
+		time.sleep(0.001)
+		start = time.time()
+		result = worker.poll()
+
+	paths.apply(*result[1:])
+	hub_time += time.time() - start
+
+	return hub_time, paths.distance
+
+
+def recompute_legacy(switches):
+	return dict((dpid, legacy_dijkstra(switches, dpid)) for dpid in switches)
+
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Routing recomputation benchmark')
+	parser.add_argument('--sizes', default = '50,100,200,500,1000,2000', help = 'comma separated numbers of switches')
+	parser.add_argument('--degree', type = int, default = 4, help = 'average switch degree')
+	parser.add_argument('--parallel', type = float, default = 0.1, help = 'fraction of doubled links')
+	parser.add_argument('--legacy-max', type = int, default = 200, help = 'largest topology routed with the legacy implementation')
+	parser.add_argument('--fw-max', type = int, default = 1000, help = 'largest topology routed with Floyd-Warshall')
+	parser.add_argument('--seed', type = int, default = 1)
+	args = parser.parse_args()
+
+	worker = routing.RoutingWorker('dijkstra')
+
+	print('%8s %8s %12s %12s %12s %12s %9s' % ('switches', 'links', 'heap s', 'worker hub s', 'fw s', 'legacy s', 'speedup'))
+	for size in [int(s) for s in args.sizes.split(',')]:
+		switches = topology(size, args.degree, args.parallel, args.seed)
+		links = sum(len(l) for sw in switches.itervalues() for l in sw.links.itervalues())
+
+		start = time.time()
+		result = recompute(switches)
+		heap_time = time.time() - start
+
+		worker_time, distance = recompute_worker(worker, switches)
+		assert distance == dict((dpid, d) for dpid, (d, _) in result.iteritems()), 'heap and worker disagree'
+
+		fw_time = '-'
+		if size <= args.fw_max:
+			start = time.time()
+			distance = recompute_floyd_warshall(switches)
+			fw_time = '%.3f' % (time.time() - start)
+			assert distance == dict((dpid, d) for dpid, (d, _) in result.iteritems()), 'heap and Floyd-Warshall disagree'
+
+		legacy_time = speedup = '-'
+		if size <= args.legacy_max:
+			start = time.time()
+			legacy = recompute_legacy(switches)
+			legacy_time = time.time() - start
+			assert result == legacy, 'heap and legacy Dijkstra disagree'
+			legacy_time, speedup = '%.3f' % legacy_time, '%.1fx' % (legacy_time / heap_time)
+
+		print('%8d %8d %12.3f %12.3f %12s %12s %9s' % (size, links, heap_time, worker_time, fw_time, legacy_time, speedup))
+
+	worker.close()
+
+
+if __name__ == '__main__':
+	main()
@@ -34,9 +34,15 @@ import ipv6_utils
 from static import OF_TABLE_UES
 from static import OF_TABLE_ROUTING
 from static import OF_TABLE_UNKNOWN
+from static import SWITCH_BUFFERING
+from static import SWITCH_BUFFER_MAX_LEN
 
 from switch import OFRule
 
+from timeslice import TimeSlicer
+
+from tracing import tracer
+
 from event import *
 
 from timer.event import EventTimer1sec
@@ -119,11 +125,13 @@ class Gateway(app_manager.RyuApp):
 		"""
 		Check periodically if a UE must be advertised
 		"""
-		for ue in self._check_ue_advertisement.values():
+		slicer = TimeSlicer("Router advertisements", self.logger)
+		for ue in slicer.iterate(self._check_ue_advertisement.values()):
 			for anch in ue.attachment.anchors.itervalues():
 				tdiff = time.time() - anch.last_time_advertised
 				if (tdiff > (anch.valid_lft - 5) and tdiff < anch.valid_lft):
 					self._send_router_advertisement(ue.attachment.switch, ue.attachment.port, anch, ue.hw_addr, ue.ipv6_addr)
+		slicer.done()
 
 
 	def _send_router_advertisement(self, switch, port, anch, eth_dst, ipv6_dst):
@@ -169,7 +177,11 @@ class Gateway(app_manager.RyuApp):
 		match = ofp_parser.OFPMatch(eth_dst = switch.hw_addr,
 									eth_type = ether.ETH_TYPE_IPV6,
 									ipv6_src = (':'.join(switch.gw_conf.nw_prefix), ipv6_utils.ipv6_mask_from_cidr(switch.gw_conf.nw_prefix_len)))
-		actions = [ofp_parser.OFPActionOutput(ofproto.OFPP_CONTROLLER)]
+		if SWITCH_BUFFERING:
+			# Keep the packet in the switch buffer and punt only the headers
+			actions = [ofp_parser.OFPActionOutput(ofproto.OFPP_CONTROLLER, max_len = SWITCH_BUFFER_MAX_LEN)]
+		else:
+			actions = [ofp_parser.OFPActionOutput(ofproto.OFPP_CONTROLLER)]
 		instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
 		req = EventWriteOFRule(OFRule(switch, match, actions, instructions, table_id = OF_TABLE_UNKNOWN))
 		self.send_event(req.dst, req)
@@ -183,6 +195,7 @@ class Gateway(app_manager.RyuApp):
 		"""
 		for anch_dpid, anch in ev.ue.attachment.anchors.iteritems():
 			self._send_router_advertisement(ev.ue.attachment.switch, ev.ue.attachment.port, anch, ev.ue.hw_addr, ev.ue.ipv6_addr)
+		tracer.stamp(ev.ue.attachment.trace_id, 'ra_sent')
 
 
 	@set_ev_cls(EventUEConnected, MAIN_DISPATCHER)
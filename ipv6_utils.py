@@ -115,6 +115,34 @@ def ipv6_mask_from_cidr(cidr):
 	return mask
 
 
+def ipv6_aggregate_prefixes(nw_prefixes, nw_prefix_len):
+	"""
+	Get the fewest network prefixes covering exactly the network 
+	prefixes of length nw_prefix_len, as (nw_prefix, nw_prefix_len).
+	Example:
+		nw_prefixes: [('2001','db8','0','2','0','0','0','0'), 
+					  ('2001','db8','0','3','0','0','0','0')]
+		nw_prefix_len: 64
+		result: [(('2001','db8','0','2','0','0','0','0'), 63)]
+	"""
+	blocks = set(int(''.join([q.zfill(4) for q in p]), 16) >> (128-nw_prefix_len) for p in nw_prefixes)
+	aggregated = []
+
+	# Merge the sibling blocks, one bit at a time
+	length = nw_prefix_len
+	while blocks:
+		merged = set()
+		for block in blocks:
+			if length > 0 and block ^ 1 in blocks:
+				merged.add(block >> 1)
+			else:
+				aggregated.append((block << (128-length), length))
+		blocks = merged
+		length -= 1
+
+	return [(tuple('%x' % ((value >> (16*(7-i))) & 0xffff) for i in range(8)), plen) for value, plen in sorted(aggregated)]
+
+
 def ipv6_to_int(string):
 	"""
 	Convert an ipv6 string into a ipv6 int list
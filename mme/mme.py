@@ -37,6 +37,8 @@ from static import MN_ETH
 from node import UE
 from node import Association 
 
+from tracing import tracer
+
 from event import *
 
 from amm.event import EventUEAnchorsUpdate
@@ -56,9 +58,6 @@ from ryu.base import app_manager
 from ryu.controller.handler import MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 
-from ryu.lib.packet import packet
-from ryu.lib.packet import ethernet
-
 from ryu.ofproto import ofproto_v1_3 as ofproto
 # End import from Ryu files
 
@@ -95,7 +94,7 @@ class Mme(app_manager.RyuApp):
 		self.ues = {}
 
 
-	def manage_association(self, switch, port, ue_hw_addr):
+	def manage_association(self, switch, port, ue_hw_addr, trace_id = None):
 		"""
 		Manage a UE association. 
 		Create a new association or update the existing one.
@@ -111,6 +110,7 @@ class Mme(app_manager.RyuApp):
 			self.ues[ue_hw_addr] = UE(self.last_ue_id, ue_hw_addr, ipv6_utils.ipv6_local_ucast_from_mac(ue_hw_addr))
 			self.ues[ue_hw_addr].set_attachment(Association(switch, port))
 			self.logger.info("UE <%s> connected to <%s>, port %s", ue_hw_addr, str(hex(switch.switch.dp.id)), str(port.port_no))
+		self.ues[ue_hw_addr].attachment.trace_id = trace_id
 
 		ev = EventUEConnected(self.ues[ue_hw_addr])
 		self.send_event_to_observers(ev)
@@ -185,13 +185,9 @@ class Mme(app_manager.RyuApp):
 		Handler for EventRSReceived.
 		UE attachment is identified by a Router Solicitation sent by the UE.
 		"""
-		pkt = packet.Packet(ev.msg.data)
-		p_eth = pkt.get_protocol(ethernet.ethernet)
 		# Check if the UE has mobility support
-		if p_eth.src in MN_ETH:
-			switch = self.switches[ev.msg.datapath.id]
-			port = switch.get_port(ev.msg.match.get("in_port"))
-			self.manage_association(switch, port, p_eth.src)
+		if ev.eth_src in MN_ETH:
+			self.manage_association(ev.switch, ev.port, ev.eth_src, tracer.start())
 	
 	
 	@set_ev_cls(EventTopologyUpdate, MAIN_DISPATCHER)
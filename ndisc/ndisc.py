@@ -28,6 +28,9 @@
 
 
 # Start import from Ryu files
+import collections
+import socket
+import struct
 import time
 import threading
 
@@ -54,6 +57,12 @@ import log
 
 import ipv6_utils
 
+from static import NDISC_PACKET_TEMPLATES
+from static import NDISC_BUFFER_PER_DST
+from static import NDISC_BUFFER_MAX_BYTES
+
+from timeslice import TimeSlicer
+
 from node import Node
 from node import Attachment
 
@@ -67,6 +76,7 @@ from nmm.event import EventWriteOFRule
 from nmm.event import EventDelOFRule
 from nmm.event import EventPushPacket
 from nmm.event import EventProcessPacket
+from nmm.event import EventDropPacket
 
 from packet.event import EventNSReceived
 from packet.event import EventNAReceived
@@ -193,6 +203,286 @@ class RouterAdvertisement:
 
 
 
+# Offsets in the serialized Neighbor Discovery packets
+ETH_DST_OFF = 0
+IPV6_DST_OFF = 38
+ICMPV6_OFF = 54
+ICMPV6_CSUM_OFF = ICMPV6_OFF + 2
+ND_TARGET_OFF = ICMPV6_OFF + 8
+RA_ROU_L_OFF = ICMPV6_OFF + 6
+RA_PI_OFF = ICMPV6_OFF + 16
+PI_PL_OFF = RA_PI_OFF + 2
+PI_VAL_L_OFF = RA_PI_OFF + 4
+PI_PRE_L_OFF = RA_PI_OFF + 8
+PI_PREFIX_OFF = RA_PI_OFF + 16
+
+
+def _ones_complement_sum(buf, start, end):
+	"""
+	Sum the 16 bit words of buf[start:end]
+	"""
+	return sum(struct.unpack_from('!%dH' % ((end - start) // 2), buf, start))
+
+
+def _patch(buf, offset, value):
+	"""
+	Write value at offset and update the ICMPv6 checksum 
+	incrementally, as explained in rfc1624.
+	"""
+	value = bytearray(value)
+	# The checksum is computed on 16 bit words, patch whole words
+	start = offset & ~1
+	end = (offset + len(value) + 1) & ~1
+	if buf[offset:offset+len(value)] == value:
+		return
+
+	old = _ones_complement_sum(buf, start, end)
+	buf[offset:offset+len(value)] = value
+	new = _ones_complement_sum(buf, start, end)
+
+	# HC' = ~(~HC + ~m + m')
+	(csum,) = struct.unpack_from('!H', buf, ICMPV6_CSUM_OFF)
+	s = (~csum & 0xffff) + ((end - start) // 2) * 0xffff - old + new
+	while s >> 16:
+		s = (s & 0xffff) + (s >> 16)
+	struct.pack_into('!H', buf, ICMPV6_CSUM_OFF, ~s & 0xffff)
+
+
+def _mac_to_bin(mac):
+	return bytearray(int(b, 16) for b in mac.split(':'))
+
+
+def _ipv6_to_bin(addr):
+	return socket.inet_pton(socket.AF_INET6, addr)
+
+
+class NDPacketTemplates:
+	"""
+	Cache of pre-serialized Neighbor Discovery packets.
+	The packets are built once per (switch, packet kind) with the 
+	classes above, then only the per-target fields are patched 
+	on a copy of the template.
+	"""
+	NS = 'NS'
+	NA = 'NA'
+	NA_ROUTER = 'NA_ROUTER'
+	RA = 'RA'
+
+	def __init__(self):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		_templates       The dictionary storing the templates, bytearray 
+						 instances, by (dpid, packet kind)
+		================ =========================================================
+		"""
+		self._templates = {}
+
+
+	def _get(self, switch, kind, build):
+		key = (switch.switch.dp.id, kind)
+		if key not in self._templates:
+			pkt = build().pkt
+			pkt.serialize()
+			self._templates[key] = bytearray(pkt.data)
+		return bytearray(self._templates[key])
+
+
+	def neighbor_solicitation(self, switch, eth_dst, ipv6_dst, ipv6_tgt):
+		"""
+		Return a serialized Neighbor Solicitation sent by switch
+		"""
+		buf = self._get(switch, self.NS, lambda: NeighborSolicitation(switch.hw_addr, eth_dst,
+											switch.ipv6_local_ucast_addr, ipv6_dst, ipv6_tgt))
+		buf[ETH_DST_OFF:ETH_DST_OFF+6] = _mac_to_bin(eth_dst)
+		_patch(buf, IPV6_DST_OFF, _ipv6_to_bin(ipv6_dst))
+		_patch(buf, ND_TARGET_OFF, _ipv6_to_bin(ipv6_tgt))
+
+		return buf
+
+
+	def neighbor_advertisement(self, switch, eth_dst, ipv6_dst):
+		"""
+		Return a serialized Neighbor Advertisement sent by switch
+		"""
+		kind = self.NA_ROUTER if switch.is_gw else self.NA
+		buf = self._get(switch, kind, lambda: NeighborAdvertisement(switch.hw_addr, eth_dst,
+											switch.ipv6_local_ucast_addr, ipv6_dst, switch.is_gw))
+		buf[ETH_DST_OFF:ETH_DST_OFF+6] = _mac_to_bin(eth_dst)
+		_patch(buf, IPV6_DST_OFF, _ipv6_to_bin(ipv6_dst))
+
+		return buf
+
+
+	def router_advertisement(self, gw, eth_dst, ipv6_dst, rou_l, ipv6_option):
+		"""
+		Return a serialized Router Advertisement sent on behalf of gw,
+		announcing a single prefix.
+		ipv6_option structure: (prefix, prefix_length, valid_lft, preferred_lft)
+		"""
+		buf = self._get(gw, self.RA, lambda: RouterAdvertisement(gw.hw_addr, eth_dst,
+											gw.ipv6_local_ucast_addr, ipv6_dst, rou_l, [ipv6_option]))
+		prefix, prefix_len, valid_lft, preferred_lft = ipv6_option
+		buf[ETH_DST_OFF:ETH_DST_OFF+6] = _mac_to_bin(eth_dst)
+		_patch(buf, IPV6_DST_OFF, _ipv6_to_bin(ipv6_dst))
+		_patch(buf, RA_ROU_L_OFF, struct.pack('!H', rou_l))
+		_patch(buf, PI_PL_OFF, struct.pack('!B', prefix_len))
+		_patch(buf, PI_VAL_L_OFF, struct.pack('!II', valid_lft, preferred_lft))
+		_patch(buf, PI_PREFIX_OFF, _ipv6_to_bin(prefix))
+
+		return buf
+
+
+	def remove_switch(self, dpid):
+		"""
+		Drop the templates of the switch
+		"""
+		for key in [k for k in self._templates if k[0] == dpid]:
+			del self._templates[key]
+
+
+
+class PacketBuffer:
+	"""
+	Bounded buffer for the packets awaiting neighbor resolution.
+	Each destination has a ring of at most max_packets raw packets
+	and all the destinations share a budget of max_bytes.
+	When a limit is hit the oldest packets are evicted first.
+	The packets dropped while held by a switch are returned as 
+	(dpid, buffer_id, in_port), their switch buffers must be released.
+	"""
+	def __init__(self, max_packets, max_bytes):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		max_packets      The maximum number of packets per destination
+		max_bytes        The maximum number of bytes stored overall
+		size             The number of bytes currently stored
+		stats            Counter of stored, replayed and dropped packets
+		_rings           The dictionary storing the rings of 
+						 (seq, data, buffer_id, in_port) by (dpid, destination)
+		_order           The (seq, (dpid, destination)) queue, oldest first
+		================ =========================================================
+		"""
+		self.max_packets = max_packets
+		self.max_bytes = max_bytes
+		self.size = 0
+		self.stats = collections.Counter()
+
+		self._rings = {}
+		self._order = collections.deque()
+		self._seq = 0
+
+
+	def __len__(self):
+		return sum(len(r) for r in self._rings.itervalues())
+
+
+	def push(self, dpid, dst, data, buffer_id = None, in_port = None):
+		"""
+		Store the raw packet data sent toward dst through the switch dpid.
+		When the packet is held by the switch, buffer_id and in_port 
+		are kept for releasing it and data is only its truncated copy.
+		Return the switch buffers of the packets dropped.
+		"""
+		key = (dpid, dst)
+		if len(data) > self.max_bytes:
+			self.stats['dropped_budget'] += 1
+			return self._held(key, [(None, data, buffer_id, in_port)])
+
+		released = []
+		ring = self._rings.get(key)
+		if ring and len(ring) >= self.max_packets:
+			entry = ring.popleft()
+			self.size -= len(entry[1])
+			self.stats['dropped_dst_full'] += 1
+			released += self._held(key, [entry])
+
+		while self.size + len(data) > self.max_bytes:
+			evicted = self._evict_oldest()
+			if evicted is None:
+				break
+			released += self._held(*evicted)
+
+		# The eviction may have removed the ring of dst
+		ring = self._rings.setdefault(key, collections.deque())
+		self._seq += 1
+		ring.append((self._seq, data, buffer_id, in_port))
+		self._order.append((self._seq, key))
+		self.size += len(data)
+		self.stats['stored'] += 1
+
+		# Get rid of the entries left behind by popped destinations
+		if len(self._order) > 2 * self.max_packets * len(self._rings) + 64:
+			self._order = collections.deque((seq, k) for seq, k in self._order 
+								if k in self._rings and self._rings[k][0][0] <= seq)
+
+		return released
+
+
+	@staticmethod
+	def _held(key, entries):
+		"""
+		Return the (dpid, buffer_id, in_port) of the entries held by the switch
+		"""
+		return [(key[0], e[2], e[3]) for e in entries if e[2] is not None]
+
+
+	def _evict_oldest(self):
+		"""
+		Evict the oldest packet stored, return its (key, [entry]) 
+		or None if there is none
+		"""
+		while self._order:
+			seq, key = self._order.popleft()
+			ring = self._rings.get(key)
+			if ring and ring[0][0] == seq:
+				entry = ring.popleft()
+				self.size -= len(entry[1])
+				if not ring:
+					del self._rings[key]
+				self.stats['dropped_budget'] += 1
+				return key, [entry]
+
+		return None
+
+
+	def pop(self, dpid, dst):
+		"""
+		Remove and return the (data, buffer_id, in_port) stored 
+		for dst, oldest first
+		"""
+		ring = self._rings.pop((dpid, dst), ())
+		packets = [p[1:] for p in ring]
+		self.size -= sum(len(p[0]) for p in packets)
+		self.stats['replayed'] += len(packets)
+
+		return packets
+
+
+	def discard(self, dpid, dst):
+		"""
+		Drop the packets stored for dst, return their switch buffers
+		"""
+		ring = self._rings.pop((dpid, dst), ())
+		self.size -= sum(len(p[1]) for p in ring)
+		self.stats['dropped_unresolved'] += len(ring)
+
+		return self._held((dpid, dst), ring)
+
+
+	def discard_switch(self, dpid):
+		"""
+		Drop the packets stored for the switch dpid, return their switch buffers
+		"""
+		released = []
+		for key in [k for k in self._rings if k[0] == dpid]:
+			released += self.discard(*key)
+
+		return released
+
 
 class Ndisc(app_manager.RyuApp):
 	"""
@@ -214,7 +504,8 @@ class Ndisc(app_manager.RyuApp):
 		================ =========================================================
 		switches         The dictionary storing the switches enabled for Ndisc
 		_pending_solicit The dictionary storing the nodes being solicited
-		_unknown_packets The dictionary storing the packets with unkwon dst.
+		_unknown_packets The PacketBuffer storing the packets with unkwon dst.
+		_templates       The cache of pre-serialized ND packets
 		================ =========================================================
 		"""	
 		super(Ndisc, self).__init__(*args, **kwargs)
@@ -227,8 +518,10 @@ class Ndisc(app_manager.RyuApp):
 		self._known_solicit_counter = {}
 
 		self._unknown_nodes = {}
-		self._unknown_packets = {}
+		self._unknown_packets = PacketBuffer(NDISC_BUFFER_PER_DST, NDISC_BUFFER_MAX_BYTES)
 		self._unknown_solicit_counter = {}
+
+		self._templates = NDPacketTemplates()
 	
 
 	@set_ev_cls(EventTimer1sec, MAIN_DISPATCHER)
@@ -264,21 +557,23 @@ class Ndisc(app_manager.RyuApp):
 		remove the UE from ues dictionaty and trigger an 
 		EventUEDisconnected event.
 		"""
+		slicer = TimeSlicer("Neighbor probing", self.logger)
 		node_unreachable = []
-		for sw_dpid, neighbors in self._known_nodes.iteritems():
-			# Solicit well-known neighbors
-			for node in neighbors.itervalues():
-				if self._known_solicit_counter[sw_dpid][node.ipv6_addr] >= 5:
-					node_unreachable.append(node)
-				else:
-					self._known_solicit_counter[sw_dpid][node.ipv6_addr] += 1
-					self._send_neighbor_solicitation(node.attachment.switch, node.attachment.port, node.ipv6_addr)
+		# Solicit well-known neighbors
+		known_nodes = ((sw_dpid, node) for sw_dpid, neighbors in self._known_nodes.iteritems() for node in neighbors.itervalues())
+		for sw_dpid, node in slicer.iterate(known_nodes):
+			if self._known_solicit_counter[sw_dpid][node.ipv6_addr] >= 5:
+				node_unreachable.append(node)
+			else:
+				self._known_solicit_counter[sw_dpid][node.ipv6_addr] += 1
+				self._send_neighbor_solicitation(node.attachment.switch, node.attachment.port, node.ipv6_addr)
 		
-		for node in node_unreachable:
+		for node in slicer.iterate(node_unreachable):
 			ev = EventNodeUnreachable(node.attachment.switch, node.attachment.port, node)
 			self.send_event_to_observers(ev)
 
 			self._remove_neighbor_node(node.attachment.switch, node.attachment.port, node.ipv6_addr, node.hw_addr)
+		slicer.done()
 	
 
 	def _send_router_advertisement(self, switch, port, anch, eth_dst, ipv6_dst):
@@ -291,13 +586,17 @@ class Ndisc(app_manager.RyuApp):
 		eth_src = anch.gw.hw_addr
 		ipv6_src = anch.gw.ipv6_local_ucast_addr
 
-		# Create a router advertisment with the extracted info
-		router_advert = RouterAdvertisement(eth_src, eth_dst, ipv6_src, ipv6_dst, anch.router_lft, options)
-		# Send the router advertisment
-		pkt = router_advert.pkt
-		pkt.serialize()
+		if NDISC_PACKET_TEMPLATES:
+			data = self._templates.router_advertisement(anch.gw, eth_dst, ipv6_dst, anch.router_lft, options[0])
+		else:
+			# Create a router advertisment with the extracted info
+			router_advert = RouterAdvertisement(eth_src, eth_dst, ipv6_src, ipv6_dst, anch.router_lft, options)
+			pkt = router_advert.pkt
+			pkt.serialize()
+			data = pkt.data
 
-		req = EventPushPacket(switch, port, pkt)
+		# Send the router advertisment
+		req = EventPushPacket(switch, port, data)
 		self.send_event(req.dst, req)
 
 
@@ -317,13 +616,17 @@ class Ndisc(app_manager.RyuApp):
 #		# Ethernet Solicited-Node multicast address
 #		mac_dst = ipv6_utils.mac_mcast_from_ipv6_local_mcast(ipv6_mst)
 
-		# Create a Neighbor Soliciation with the extracted info      
-		neighbor_solicit = NeighborSolicitation(eth_src, eth_dst, ipv6_src, ipv6_dst, ipv6_target)
-		# Send the Neighbor Solicitation
-		pkt = neighbor_solicit.pkt
-		pkt.serialize()
+		if NDISC_PACKET_TEMPLATES:
+			data = self._templates.neighbor_solicitation(switch, eth_dst, ipv6_dst, ipv6_target)
+		else:
+			# Create a Neighbor Soliciation with the extracted info      
+			neighbor_solicit = NeighborSolicitation(eth_src, eth_dst, ipv6_src, ipv6_dst, ipv6_target)
+			pkt = neighbor_solicit.pkt
+			pkt.serialize()
+			data = pkt.data
 		
-		req = EventPushPacket(switch, port, pkt)
+		# Send the Neighbor Solicitation
+		req = EventPushPacket(switch, port, data)
 		self.send_event(req.dst, req)
 
 			
@@ -340,12 +643,17 @@ class Ndisc(app_manager.RyuApp):
 		eth_dst = eth_dst
 		ipv6_dst = ipv6_utils.ipv6_local_ucast_from_mac(eth_dst)
 
-		# Create a Neighbor Advertisment with the extracted info      
-		nd_neighbor_adv = NeighborAdvertisement(eth_src, eth_dst, ipv6_src, ipv6_dst, switch.is_gw)
-		pkt = nd_neighbor_adv.pkt
-		pkt.serialize()
+		if NDISC_PACKET_TEMPLATES:
+			data = self._templates.neighbor_advertisement(switch, eth_dst, ipv6_dst)
+		else:
+			# Create a Neighbor Advertisment with the extracted info      
+			nd_neighbor_adv = NeighborAdvertisement(eth_src, eth_dst, ipv6_src, ipv6_dst, switch.is_gw)
+			pkt = nd_neighbor_adv.pkt
+			pkt.serialize()
+			data = pkt.data
+
 		# Send the Neighbor Advertisment
-		req = EventPushPacket(switch, port, pkt)
+		req = EventPushPacket(switch, port, data)
 		self.send_event(req.dst, req)
 
 	
@@ -439,8 +747,8 @@ class Ndisc(app_manager.RyuApp):
 			del self._unknown_nodes[switch.switch.dp.id][ipv6_addr]
 			self._add_neighbor_node(switch, port, ipv6_addr, hw_addr)
 
-			for p in self._unknown_packets[switch.switch.dp.id][ipv6_addr]:
-				req = EventProcessPacket(switch, p)
+			for data, buffer_id, in_port in self._unknown_packets.pop(switch.switch.dp.id, ipv6_addr):
+				req = EventProcessPacket(switch, data, buffer_id, in_port)
 				self.send_event(req.dst, req)
 		except KeyError:
 			pass
@@ -455,12 +763,24 @@ class Ndisc(app_manager.RyuApp):
 							str(hex(switch.switch.dp.id)) + " port " + str(port.name))
 
 
+	def _release_packets(self, released):
+		"""
+		Drop the packets held by the switches, freeing their buffers
+		"""
+		for dpid, buffer_id, in_port in released:
+			if dpid in self.switches:
+				req = EventDropPacket(self.switches[dpid], buffer_id, in_port)
+				self.send_event(req.dst, req)
+
+
 	def _miss_neighbor_node(self, switch, ipv6_addr):
 		"""
 		Discovery procedure has failed, there is no neighbor with ipv6 addr connected to the switch
 		"""
+		self._release_packets(self._unknown_packets.discard(switch.switch.dp.id, ipv6_addr))
+		self.logger.debug("Unknown packets buffer: %d bytes, %s", self._unknown_packets.size,
+						dict(self._unknown_packets.stats))
 		try:
-			del self._unknown_packets[switch.switch.dp.id][ipv6_addr]
 			del self._unknown_solicit_counter[switch.switch.dp.id][ipv6_addr]
 			del self._unknown_nodes[switch.switch.dp.id][ipv6_addr]
 		except KeyError:
@@ -494,23 +814,17 @@ class Ndisc(app_manager.RyuApp):
 		Send a Neighbor Advertisement upon Neighbor Solicitation reception
 		"""
 		# Check if the switch is enabled for Ndisc
-		if ev.msg.datapath.id in self.switches:
-			sw = self.switches[ev.msg.datapath.id]
-			port = sw.get_port(ev.msg.match.get("in_port"))
+		if ev.switch.switch.dp.id in self.switches:
+			sw = self.switches[ev.switch.switch.dp.id]
 
-			pkt = packet.Packet(ev.msg.data)
-			p_eth = pkt.get_protocol(ethernet.ethernet)
-			p_ipv6 = pkt.get_protocol(ipv6.ipv6)
-			p_icmpv6 = pkt.get_protocol(icmpv6.icmpv6)
-
-			target_ipv6 = p_icmpv6.data.dst
+			target_ipv6 = ev.p_icmpv6.data.dst
 
 			if target_ipv6 == sw.ipv6_local_ucast_addr:
-				target_hw = p_eth.src
-				if p_ipv6.dst == sw.ipv6_local_mcast_addr:
-					target_hw = p_icmpv6.data.option.hw_src
+				target_hw = ev.eth_src
+				if ev.ipv6_dst == sw.ipv6_local_mcast_addr:
+					target_hw = ev.p_icmpv6.data.option.hw_src
 				# Add the node as Neighbor
-				self._send_neighbor_advertisement(sw, port, target_hw)
+				self._send_neighbor_advertisement(sw, ev.port, target_hw)
 			
 
 
@@ -522,19 +836,15 @@ class Ndisc(app_manager.RyuApp):
 		upon Neighbor Advertisement reception
 		Reset also _pending_solicit counter
 		"""
-		if ev.msg.datapath.id in self.switches:
-			sw = self.switches[ev.msg.datapath.id]
-			port = sw.get_port(ev.msg.match.get("in_port"))
-			
-			pkt = packet.Packet(ev.msg.data)
-			p_icmpv6 = pkt.get_protocol(icmpv6.icmpv6)
+		if ev.switch.switch.dp.id in self.switches:
+			sw = self.switches[ev.switch.switch.dp.id]
 
-			target_ipv6 = p_icmpv6.data.dst
+			target_ipv6 = ev.p_icmpv6.data.dst
 
 			if target_ipv6 in self._known_nodes[sw.switch.dp.id]:
 				self._known_solicit_counter[sw.switch.dp.id][target_ipv6] = 0
 			elif target_ipv6 in self._unknown_nodes[sw.switch.dp.id]:				
-				self._add_discovered_neighbor_node(sw, port, target_ipv6, p_icmpv6.data.option.hw_src)
+				self._add_discovered_neighbor_node(sw, ev.port, target_ipv6, ev.p_icmpv6.data.option.hw_src)
 
 
 	@set_ev_cls(EventUnknownIPReceived, MAIN_DISPATCHER)
@@ -544,17 +854,21 @@ class Ndisc(app_manager.RyuApp):
 		Start Neighbor Discovery procedure when 
 		a packet with unkwnon IPv6 dst in received 
 		"""
-		if ev.msg.datapath.id in self.switches:
-			sw = self.switches[ev.msg.datapath.id]
+		if ev.switch.switch.dp.id in self.switches:
+			sw = self.switches[ev.switch.switch.dp.id]
 
-			pkt = packet.Packet(ev.msg.data)
-			p_ipv6 = pkt.get_protocol(ipv6.ipv6)
-
-			if p_ipv6.dst not in self._unknown_packets[sw.switch.dp.id]:
-				self._unknown_packets[sw.switch.dp.id][p_ipv6.dst] = []
-			self._unknown_packets[sw.switch.dp.id][p_ipv6.dst].append(pkt)
+			# Keep the raw packet, there is no need to decode it.
+			# If the switch holds the packet keep just its buffer_id
+			if ev.msg.buffer_id != ev.msg.datapath.ofproto.OFP_NO_BUFFER:
+				released = self._unknown_packets.push(sw.switch.dp.id, ev.ipv6_dst, ev.msg.data, 
+										ev.msg.buffer_id, ev.msg.match['in_port'])
+			else:
+				released = self._unknown_packets.push(sw.switch.dp.id, ev.ipv6_dst, ev.msg.data)
+			self._release_packets(released)
 
-			self._discover_neighbor_node(sw, p_ipv6.dst)
+			# Solicit the destination only if it is not being discovered yet
+			if ev.ipv6_dst not in self._unknown_nodes[sw.switch.dp.id]:
+				self._discover_neighbor_node(sw, ev.ipv6_dst)
 
 
 	@set_ev_cls(EventNeighRequest)
@@ -606,7 +920,6 @@ class Ndisc(app_manager.RyuApp):
 		self._known_solicit_counter[ev.switch.switch.dp.id] = {}
 
 		self._unknown_nodes[ev.switch.switch.dp.id] = {}
-		self._unknown_packets[ev.switch.switch.dp.id] = {}
 		self._unknown_solicit_counter[ev.switch.switch.dp.id] = {}		
 
 		self.ndisc_of_rule[ev.switch.switch.dp.id] = {}
@@ -635,13 +948,15 @@ class Ndisc(app_manager.RyuApp):
 			del self.ndisc_of_rule[ev.switch.switch.dp.id]
 
 			del self._unknown_nodes[ev.switch.switch.dp.id]
-			del self._unknown_packets[ev.switch.switch.dp.id]
+			self._release_packets(self._unknown_packets.discard_switch(ev.switch.switch.dp.id))
 			del self._unknown_solicit_counter[ev.switch.switch.dp.id]
 
 			del self._known_solicit_counter[ev.switch.switch.dp.id]
 			del self._known_nodes[ev.switch.switch.dp.id]
 
 			del self.switches[ev.switch.switch.dp.id]
+
+			self._templates.remove_switch(ev.switch.switch.dp.id)
 		except KeyError:
 			self.logger.error("Error in _disable_ndisc_on_switch")
 
@@ -198,44 +198,153 @@ class EventDelOFRule(event.EventRequestBase):
 		self.of_rule = of_rule
 
 
+class EventWriteOFGroup(event.EventRequestBase):
+	"""
+	This Event is triggered when a module wants to write an OpenFlow group
+	"""
+	def __init__(self, of_group):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		of_group         The OpenFlow group to write, OFGroup instance
+		================ =========================================================
+		"""	
+		super(EventWriteOFGroup, self).__init__()
+		self.dst = 'Nmm'
+		self.of_group = of_group
+
+
+class EventDelOFGroup(event.EventRequestBase):
+	"""
+	This Event is triggered when a module wants to delete an OpenFlow group
+	"""
+	def __init__(self, of_group):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		of_group         The OpenFlow group to delete, OFGroup instance
+		================ =========================================================
+		"""	
+		super(EventDelOFGroup, self).__init__()
+		self.dst = 'Nmm'
+		self.of_group = of_group
+
+
+class EventSendBarrier(event.EventRequestBase):
+	"""
+	This Event is triggered when a module wants to know when the switch 
+	has applied the messages sent to it so far
+	"""
+	def __init__(self, switch, requester, cookie, trace_id = None):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		switch           Switch instance
+		requester        The name of the module to send EventBarrierDone to
+		cookie           The value identifying the request for the requester
+		trace_id         The correlation ID of the UE attachment the messages
+						 before the barrier are sent for, None if not traced
+		================ =========================================================
+		"""	
+		super(EventSendBarrier, self).__init__()
+		self.dst = 'Nmm'
+		self.switch = switch
+		self.requester = requester
+		self.cookie = cookie
+		self.trace_id = trace_id
+
+
+class EventBarrierDone(event.EventBase):
+	"""
+	This Event is sent by Nmm when a switch replies to the barrier 
+	requested by EventSendBarrier
+	"""
+	def __init__(self, switch, cookie):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		switch           Switch instance
+		cookie           The cookie of the EventSendBarrier
+		================ =========================================================
+		"""	
+		super(EventBarrierDone, self).__init__()
+		self.switch = switch
+		self.cookie = cookie
+
+
 class EventPushPacket(event.EventRequestBase):
 	"""
 	This Event is triggered when a module wants to push a packet through a switch's interface
 	"""
-	def __init__(self, switch, port, pkt):
+	def __init__(self, switch, port, data, buffer_id = None, in_port = None):
 		"""
 		================ =========================================================
 		Attribute        Description
 		================ =========================================================
 		switch           Switch instance
 		port			 Port instance
-		pkt				 Serialized Packet instance
+		data			 The serialized packet, bytes or bytearray instance
+		buffer_id		 The id of the switch buffer holding the packet, 
+						 None if the packet is not buffered on the switch
+		in_port			 The port number the buffered packet was received on
 		================ =========================================================
 		"""	
 		super(EventPushPacket, self).__init__()
 		self.dst = 'Nmm'
 		self.switch = switch
 		self.port = port
-		self.pkt = pkt
+		self.data = data
+		self.buffer_id = buffer_id
+		self.in_port = in_port
 
 
 class EventProcessPacket(event.EventRequestBase):
 	"""
 	This Event is triggered when a module wants to push a packet through switch's OFTable
 	"""
-	def __init__(self, switch, pkt):
+	def __init__(self, switch, data, buffer_id = None, in_port = None):
 		"""
 		================ =========================================================
 		Attribute        Description
 		================ =========================================================
 		switch           Switch instance
-		pkt				 Serialized Packet instance
+		data			 The serialized packet, bytes or bytearray instance
+		buffer_id		 The id of the switch buffer holding the packet, 
+						 None if the packet is not buffered on the switch
+		in_port			 The port number the buffered packet was received on
 		================ =========================================================
 		"""	
 		super(EventProcessPacket, self).__init__()
 		self.dst = 'Nmm'
 		self.switch = switch
-		self.pkt = pkt
+		self.data = data
+		self.buffer_id = buffer_id
+		self.in_port = in_port
+
+
+class EventDropPacket(event.EventRequestBase):
+	"""
+	This Event is triggered when a module wants to drop a packet held by a switch's buffer
+	"""
+	def __init__(self, switch, buffer_id, in_port = None):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		switch           Switch instance
+		buffer_id		 The id of the switch buffer holding the packet
+		in_port			 The port number the buffered packet was received on
+		================ =========================================================
+		"""	
+		super(EventDropPacket, self).__init__()
+		self.dst = 'Nmm'
+		self.switch = switch
+		self.buffer_id = buffer_id
+		self.in_port = in_port
 
 
 class EventSwitchRequest(event.EventRequestBase):
@@ -34,6 +34,14 @@ import log
 from static import OF_TABLE_NUM
 from static import WLAN_IFACE
 from static import GW_IFACE
+from static import NMM_SEND_BATCHING
+from static import NMM_BATCH_BARRIER
+from static import NMM_RECONCILE
+from static import NMM_RECONCILE_GRACE
+from static import NMM_RECONCILE_TIMEOUT
+from static import NMM_GW_STATS
+from static import COOKIE
+from static import COOKIE_MASK
 
 from switch import OFRule
 from switch import Switch
@@ -41,13 +49,21 @@ from switch import Link
 from switch import AccessPointConf
 from switch import GatewayConf
 
+from tracing import tracer
+
 from event import *
+
+from timer.event import EventTimer5sec
 # End import from iJOIN solution files
 
 # Start import from Ryu files
+import collections
+
 from ryu.base import app_manager
+from ryu.controller import ofp_event
 from ryu.controller.handler import set_ev_cls
 from ryu.controller.handler import MAIN_DISPATCHER
+from ryu.lib import hub
 from ryu.ofproto import ofproto_v1_3 as ofproto
 from ryu.ofproto import ofproto_v1_3_parser as ofp_parser
 from ryu.topology.api import get_switch
@@ -85,6 +101,25 @@ class Nmm(app_manager.RyuApp):
 		================ =========================================================
 		switches         The dictionary storing the switches as 
 		                 custom Switch isntance
+		of_rules         The dictionary storing the OFRules written on 
+						 the switches, by dpid and rule key
+		of_groups        The dictionary storing the OFGroups written on 
+						 the switches, by dpid and group_id
+		send_stats       Counter of the batches and messages sent
+		_send_queues     The dictionary storing the (datapath, messages) 
+						 waiting to be sent, by dpid
+		_send_flush_pending Boolean instance.
+						 Tells if a flush of the queues is scheduled or not.
+		_send_traces     The list of the correlation IDs to stamp once the
+						 queued messages are sent
+		_reconciling     The dictionary storing the (flows, groups, dumps 
+						 pending) dumped from the switches being reconciled,
+						 by dpid
+		_switch_views    The dictionary storing the (flows, groups) dumped 
+						 from the reconciled switches and not claimed yet by
+						 a rule or a group, by dpid, until the grace period ends
+		_barriers        The dictionary storing the EventSendBarrier waiting 
+						 for the barrier reply, by (dpid, xid)
 		================ =========================================================
 		"""
 		super(Nmm, self).__init__(*args, **kwargs)
@@ -95,28 +130,143 @@ class Nmm(app_manager.RyuApp):
 		self.gateways = {}
 
 		self.of_rules = {}
+		self.of_groups = {}
 
+		self.send_stats = collections.Counter()
+		self._send_queues = collections.OrderedDict()
+		self._send_flush_pending = False
+		self._send_traces = []
 
-	def _initialise_switch_of_tables(self, switch):
+		self._reconciling = {}
+		self._switch_views = {}
+		self._barriers = {}
+
+
+	def _send_msg(self, datapath, msg):
 		"""
-		Flush the flow table when the switch connects to the controller.
+		Send an OpenFlow message to the datapath.
+		With batching enabled the message is queued and flushed together
+		with the others once the event loop yields.
 		"""
-		# Flush OpenFlow entries
-		match = ofp_parser.OFPMatch()
-		instructions = []
-		actions = []
+		if not NMM_SEND_BATCHING:
+			datapath.send_msg(msg)
+			self.send_stats['batches'] += 1
+			self.send_stats['messages'] += 1
+			return
 
-		datapath = switch.switch.dp
+		if datapath.id not in self._send_queues:
+			self._send_queues[datapath.id] = (datapath, [])
+		self._send_queues[datapath.id][1].append(msg)
+
+		if not self._send_flush_pending:
+			self._send_flush_pending = True
+			hub.spawn(self._flush_send_queues)
+
+
+	def _flush_send_queues(self):
+		"""
+		Write the queued messages of every datapath with a single socket write.
+		"""
+		self._send_flush_pending = False
+		queues = self._send_queues
+		self._send_queues = collections.OrderedDict()
+		traces = self._send_traces
+		self._send_traces = []
+
+		for datapath, msgs in queues.itervalues():
+			ofproto = datapath.ofproto
+			parser = datapath.ofproto_parser
+
+			if NMM_BATCH_BARRIER and any(msg.cls_msg_type == ofproto.OFPT_FLOW_MOD for msg in msgs):
+				msgs.append(parser.OFPBarrierRequest(datapath))
+
+			buf = bytearray()
+			for msg in msgs:
+				if msg.xid is None:
+					datapath.set_xid(msg)
+				msg.serialize()
+				buf += msg.buf
+			datapath.send(bytes(buf))
+
+			self.send_stats['batches'] += 1
+			self.send_stats['messages'] += len(msgs)
+			self.logger.debug("Sent %d messages to switch <%s> in one write", len(msgs), hex(datapath.id))
+
+		for trace_id in traces:
+			tracer.stamp(trace_id, 'flowmods_sent')
+
+
+	def _flow_mod(self, datapath, of_rule):
+		"""
+		Build the FlowMod adding of_rule.
+		"""
+		parser = datapath.ofproto_parser
+
+		return parser.OFPFlowMod(datapath = datapath, table_id = of_rule.table_id, priority = of_rule.priority, match = of_rule.match, instructions = of_rule.instructions, cookie = of_rule.cookie)
+
+
+	def _group_mod(self, datapath, of_group, command):
+		"""
+		Build the GroupMod adding, modifying or deleting of_group.
+		"""
+		parser = datapath.ofproto_parser
+
+		return parser.OFPGroupMod(datapath, command, of_group.type_, of_group.group_id, of_group.buckets)
+
+
+	def _write_switch_of_groups(self, datapath):
+		"""
+		Write the groups known by the controller on the flushed switch.
+		"""
+		ofproto = datapath.ofproto
+
+		for of_group in self.of_groups[datapath.id].itervalues():
+			self._send_msg(datapath, self._group_mod(datapath, of_group, ofproto.OFPGC_ADD))
+
+
+	def _flush_switch_of_tables(self, datapath):
+		"""
+		Delete every flow entry and every group of the switch.
+		"""
 		ofproto = datapath.ofproto
 		parser = datapath.ofproto_parser
 
+		match = parser.OFPMatch()
+		instructions = []
+
 		for i in xrange(1, OF_TABLE_NUM):
 			mod = parser.OFPFlowMod(datapath = datapath, cookie = 0,
 							cookie_mask = 0, command = ofproto.OFPFC_DELETE,
 							idle_timeout = 0, hard_timeout = 0, table_id = i,
 							buffer_id = ofproto.OFPCML_NO_BUFFER, out_port = ofproto.OFPP_ANY,
 							out_group = ofproto.OFPG_ANY, match = match, instructions = instructions)
-			datapath.send_msg(mod)
+			self._send_msg(datapath, mod)
+
+		mod = parser.OFPGroupMod(datapath, ofproto.OFPGC_DELETE, 0, ofproto.OFPG_ALL, [])
+		self._send_msg(datapath, mod)
+
+
+	def _initialise_switch_of_tables(self, switch):
+		"""
+		Flush the flow table when the switch connects to the controller.
+		In reconcile mode the flow table is dumped instead, the rules written
+		meanwhile are held until the dump is compared with them.
+		"""
+		match = ofp_parser.OFPMatch()
+		actions = []
+
+		datapath = switch.switch.dp
+
+		if NMM_RECONCILE:
+			# Keep the rules known before the disconnection
+			self.of_rules.setdefault(datapath.id, {})
+			self.of_groups.setdefault(datapath.id, {})
+			self._reconcile_switch_of_tables(datapath)
+		else:
+			# The rules previously written are gone
+			self.of_rules[datapath.id] = {}
+			self.of_groups[datapath.id] = {}
+			self._flush_switch_of_tables(datapath)
 		
 		for i in xrange(0, OF_TABLE_NUM-1):
 			instructions = [ofp_parser.OFPInstructionGotoTable(i+1)]
@@ -124,6 +274,235 @@ class Nmm(app_manager.RyuApp):
 			self.send_event(req.dst, req)
 
 
+	def _switch_view(self, table_id, priority, match, instructions):
+		"""
+		Return the (key, instructions) of a flow entry as the switch 
+		reports it. Both are computed from the wire format, so that the
+		rules written by the controller compare equal to the dumped flows.
+		"""
+		buf = bytearray()
+		match.serialize(buf, 0)
+		match = ofp_parser.OFPMatch.parser(bytes(buf), 0)
+
+		buf = bytearray()
+		for inst in instructions:
+			inst.serialize(buf, len(buf))
+
+		return (table_id, priority, tuple(sorted(match.items()))), bytes(buf)
+
+
+	def _group_view(self, type_, buckets):
+		"""
+		Return the type and the wire format of the buckets of a group,
+		to compare the groups of the controller with the dumped ones.
+		"""
+		buf = bytearray()
+		offset = 0
+		for bucket in buckets:
+			bucket.serialize(buf, offset)
+			offset += bucket.len
+
+		return type_, bytes(buf).ljust(offset, '\0')
+
+
+	def _claim_switch_flow(self, of_rule):
+		"""
+		Claim the dumped flow matching of_rule during the grace period.
+		Return True if the flow is already the one of_rule would write.
+		"""
+		views = self._switch_views.get(of_rule.key[0])
+		if views is None:
+			return False
+
+		key, inst = self._switch_view(of_rule.table_id, of_rule.priority, of_rule.match, of_rule.instructions)
+		flow = views[0].pop(key, None)
+
+		return flow is not None and flow[0] == inst
+
+
+	def _reconcile_switch_of_tables(self, datapath):
+		"""
+		Dump the flow entries written by the controller and the groups 
+		of the switch.
+		"""
+		ofproto = datapath.ofproto
+		parser = datapath.ofproto_parser
+
+		self._reconciling[datapath.id] = ({}, {}, set(['flows', 'groups']))
+		self._switch_views.pop(datapath.id, None)
+
+		req = parser.OFPFlowStatsRequest(datapath, 0, ofproto.OFPTT_ALL, 
+						ofproto.OFPP_ANY, ofproto.OFPG_ANY, COOKIE, COOKIE_MASK, parser.OFPMatch())
+		self._send_msg(datapath, req)
+		req = parser.OFPGroupDescStatsRequest(datapath, 0)
+		self._send_msg(datapath, req)
+
+		hub.spawn_after(NMM_RECONCILE_TIMEOUT, self._reconcile_timeout, datapath)
+
+
+	def _reconcile_timeout(self, datapath):
+		"""
+		The switch did not answer the flow dump, flush it and 
+		write all the rules.
+		"""
+		if self._reconciling.get(datapath.id) is None or \
+				datapath.id not in self.switches or self.switches[datapath.id].switch.dp is not datapath:
+			return
+
+		del self._reconciling[datapath.id]
+		self._flush_switch_of_tables(datapath)
+		self._write_switch_of_groups(datapath)
+		for of_rule in self.of_rules[datapath.id].itervalues():
+			self._send_msg(datapath, self._flow_mod(datapath, of_rule))
+
+		self.logger.warning("Switch <" + str(hex(datapath.id)) + "> did not dump its flows, tables flushed")
+
+
+	def _reconcile_done(self, datapath):
+		"""
+		Compare the dumped flows and groups with the rules and groups known 
+		by the controller, write the missing or stale ones and keep the 
+		others for the grace period: the rules written meanwhile claim them,
+		the unclaimed ones are removed.
+		"""
+		ofproto = datapath.ofproto
+		flows, groups, _ = self._reconciling.pop(datapath.id)
+
+		# The groups before the rules forwarding to them
+		groups_written = 0
+		for of_group in self.of_groups[datapath.id].itervalues():
+			view = groups.pop(of_group.group_id, None)
+			if view is None:
+				self._send_msg(datapath, self._group_mod(datapath, of_group, ofproto.OFPGC_ADD))
+			elif view != self._group_view(of_group.type_, of_group.buckets):
+				self._send_msg(datapath, self._group_mod(datapath, of_group, ofproto.OFPGC_MODIFY))
+			else:
+				continue
+			groups_written += 1
+
+		written = 0
+		for of_rule in self.of_rules[datapath.id].itervalues():
+			key, inst = self._switch_view(of_rule.table_id, of_rule.priority, of_rule.match, of_rule.instructions)
+			flow = flows.pop(key, None)
+			if flow is None or flow[0] != inst:
+				self._send_msg(datapath, self._flow_mod(datapath, of_rule))
+				written += 1
+
+		if flows or groups:
+			views = (flows, groups)
+			self._switch_views[datapath.id] = views
+			hub.spawn_after(NMM_RECONCILE_GRACE, self._delete_leftover_flows, datapath, views)
+
+		self.logger.info("Switch <" + str(hex(datapath.id)) + "> reconciled: " + 
+						str(len(self.of_rules[datapath.id]) - written) + " rules kept, " + str(written) + " written, " + 
+						str(groups_written) + " groups written, " + str(len(flows) + len(groups)) + " unclaimed")
+
+
+	def _delete_leftover_flows(self, datapath, views):
+		"""
+		Delete the dumped flows and groups that no rule or group has 
+		claimed during the grace period.
+		"""
+		if self._switch_views.get(datapath.id) is not views:
+			return
+		del self._switch_views[datapath.id]
+
+		if datapath.id not in self.switches or self.switches[datapath.id].switch.dp is not datapath:
+			return
+
+		ofproto = datapath.ofproto
+		parser = datapath.ofproto_parser
+		flows, groups = views
+
+		for inst, flow in flows.itervalues():
+			mod = parser.OFPFlowMod(datapath = datapath, cookie = flow.cookie,
+								cookie_mask = COOKIE_MASK, table_id = flow.table_id, 
+								command = ofproto.OFPFC_DELETE_STRICT, idle_timeout = 0, hard_timeout = 0, 
+								priority = flow.priority, buffer_id = ofproto.OFPCML_NO_BUFFER, 
+								out_port = ofproto.OFPP_ANY, out_group = ofproto.OFPG_ANY, 
+								match = flow.match, instructions = [])
+			self._send_msg(datapath, mod)
+
+		for group_id in groups:
+			if group_id not in self.of_groups[datapath.id]:
+				mod = parser.OFPGroupMod(datapath, ofproto.OFPGC_DELETE, 0, group_id, [])
+				self._send_msg(datapath, mod)
+
+
+	@set_ev_cls(EventTimer5sec, MAIN_DISPATCHER)
+	def _handler_timer_5_sec(self, ev):
+		"""
+		Request the counters of the gateway ports
+		"""
+		if not NMM_GW_STATS:
+			return
+
+		for switch in self.gateways.values():
+			datapath = switch.switch.dp
+			req = datapath.ofproto_parser.OFPPortStatsRequest(datapath, 0, switch.gw_conf.port.port_no)
+			self._send_msg(datapath, req)
+
+
+	@set_ev_cls(ofp_event.EventOFPPortStatsReply, MAIN_DISPATCHER)
+	def _handler_port_stats_reply(self, ev):
+		"""
+		Update the throughput through the gateway port.
+		"""
+		switch = self.gateways.get(ev.msg.datapath.id)
+		if switch is None:
+			return
+
+		gw_conf = switch.gw_conf
+		for stat in ev.msg.body:
+			if stat.port_no != gw_conf.port.port_no:
+				continue
+			now = stat.duration_sec + stat.duration_nsec / 1e9
+			count = stat.rx_bytes + stat.tx_bytes
+			# The counters are reset when the port is recreated
+			if gw_conf.stats is not None and now > gw_conf.stats[0] and count >= gw_conf.stats[1]:
+				gw_conf.rate = (count - gw_conf.stats[1]) * 8 / (now - gw_conf.stats[0])
+			gw_conf.stats = (now, count)
+
+
+	@set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+	def _handler_flow_stats_reply(self, ev):
+		"""
+		Collect the flows dumped from a switch being reconciled.
+		"""
+		datapath = ev.msg.datapath
+		reconciling = self._reconciling.get(datapath.id)
+		if reconciling is None:
+			return
+
+		for flow in ev.msg.body:
+			key, inst = self._switch_view(flow.table_id, flow.priority, flow.match, flow.instructions)
+			reconciling[0][key] = (inst, flow)
+
+		if not ev.msg.flags & datapath.ofproto.OFPMPF_REPLY_MORE:
+			reconciling[2].discard('flows')
+			if not reconciling[2]:
+				self._reconcile_done(datapath)
+
+
+	@set_ev_cls(ofp_event.EventOFPGroupDescStatsReply, MAIN_DISPATCHER)
+	def _handler_group_desc_stats_reply(self, ev):
+		"""
+		Collect the groups dumped from a switch being reconciled.
+		"""
+		datapath = ev.msg.datapath
+		reconciling = self._reconciling.get(datapath.id)
+		if reconciling is None:
+			return
+
+		for group in ev.msg.body:
+			reconciling[1][group.group_id] = self._group_view(group.type, group.buckets)
+
+		if not ev.msg.flags & datapath.ofproto.OFPMPF_REPLY_MORE:
+			reconciling[2].discard('groups')
+			if not reconciling[2]:
+				self._reconcile_done(datapath)
+
+
 	def _check_if_ap_port(self, port):
 		"""
 		Check if a switch port is an access port.
@@ -148,6 +527,26 @@ class Nmm(app_manager.RyuApp):
 		return ap_conf
 
 	
+	def _packet_out(self, datapath, actions, data, buffer_id, in_port):
+		"""
+		Build a PacketOut, releasing the packet from the switch buffer
+		when buffer_id is given.
+		"""
+		ofproto = datapath.ofproto
+		parser = datapath.ofproto_parser
+
+		if buffer_id is None or buffer_id == ofproto.OFP_NO_BUFFER:
+			return parser.OFPPacketOut(datapath = datapath,
+						buffer_id = ofproto.OFP_NO_BUFFER,
+						in_port = ofproto.OFPP_CONTROLLER,
+						actions = actions, data = data)
+
+		return parser.OFPPacketOut(datapath = datapath,
+					buffer_id = buffer_id,
+					in_port = in_port if in_port is not None else ofproto.OFPP_CONTROLLER,
+					actions = actions, data = None)
+
+
 	def _get_gw_conf(self, switch, port):
 		"""
 		Get GW configuration.
@@ -164,35 +563,41 @@ class Nmm(app_manager.RyuApp):
 	@set_ev_cls(EventPushPacket)
 	def _handler_push_packet(self, ev):
 		"""
-		Send the Packet pkt through the OFPort port.
+		Send the serialized packet through the OFPort port.
 		"""
 		datapath = ev.switch.switch.dp
-		ofproto = datapath.ofproto
 		parser = datapath.ofproto_parser
 
 		actions = [parser.OFPActionOutput(port = ev.port.port_no)]
-		out = parser.OFPPacketOut(datapath = datapath,
-					buffer_id = ofproto.OFP_NO_BUFFER,
-					in_port = ofproto.OFPP_CONTROLLER,
-					actions = actions, data = ev.pkt.data)
-		datapath.send_msg(out)
+		out = self._packet_out(datapath, actions, ev.data, ev.buffer_id, ev.in_port)
+		self._send_msg(datapath, out)
 
 
 	@set_ev_cls(EventProcessPacket)
 	def _handler_process_packet(self, ev):
 		"""
-		Send the Packet pkt through the OFPP_TABLE.
+		Send the serialized packet through the OFPP_TABLE.
+		A packet buffered on the switch is released by buffer_id.
 		"""
 		datapath = ev.switch.switch.dp
 		ofproto = datapath.ofproto
 		parser = datapath.ofproto_parser
 
 		actions = [parser.OFPActionOutput(port = ofproto.OFPP_TABLE)]
-		out = parser.OFPPacketOut(datapath = datapath,
-					buffer_id = ofproto.OFP_NO_BUFFER,
-					in_port = ofproto.OFPP_CONTROLLER,
-					actions = actions, data = ev.pkt.data)
-		datapath.send_msg(out)
+		out = self._packet_out(datapath, actions, ev.data, ev.buffer_id, ev.in_port)
+		self._send_msg(datapath, out)
+
+
+	@set_ev_cls(EventDropPacket)
+	def _handler_drop_packet(self, ev):
+		"""
+		Release the packet from the switch buffer with no actions,
+		the switch drops it.
+		"""
+		datapath = ev.switch.switch.dp
+
+		out = self._packet_out(datapath, [], None, ev.buffer_id, ev.in_port)
+		self._send_msg(datapath, out)
 
 
 	@set_ev_cls(EventWriteOFRule)
@@ -200,20 +605,20 @@ class Nmm(app_manager.RyuApp):
 		"""
 		Write OpenFlow rule on switch.
 		If the rule is already present in the switch,
-		don't write it again
+		don't write it again. While the switch is being 
+		reconciled the rule is only recorded, during the
+		grace period an identical dumped flow is kept.
 		"""
 		try:
-			if ev.of_rule.key not in self.of_rules \
-				or self.of_rules[ev.of_rule.key].actions != ev.of_rule.actions:
+			of_rules = self.of_rules[ev.of_rule.key[0]]
+			if ev.of_rule.key not in of_rules \
+				or of_rules[ev.of_rule.key].fingerprint != ev.of_rule.fingerprint:
 
-				datapath = ev.of_rule.switch.switch.dp
-				ofproto = datapath.ofproto
-				parser = datapath.ofproto_parser
+				if ev.of_rule.key[0] not in self._reconciling and not self._claim_switch_flow(ev.of_rule):
+					datapath = ev.of_rule.switch.switch.dp
+					self._send_msg(datapath, self._flow_mod(datapath, ev.of_rule))
 
-				mod = parser.OFPFlowMod(datapath = datapath, table_id = ev.of_rule.table_id, priority = ev.of_rule.priority, match = ev.of_rule.match, instructions = ev.of_rule.instructions, cookie = ev.of_rule.cookie)
-				datapath.send_msg(mod)
-
-				self.of_rules[ev.of_rule.key] = ev.of_rule
+				of_rules[ev.of_rule.key] = ev.of_rule
 		except KeyError:
 			pass
 
@@ -223,10 +628,15 @@ class Nmm(app_manager.RyuApp):
 		"""
 		Delete OpenFlow rule on switch.
 		If the rule has been already deleted from the switch,
-		don't delete it again
+		don't delete it again. While the switch is being 
+		reconciled the rule is only forgotten, the flow left
+		on the switch is removed as unclaimed.
 		"""
 		try:
-			if ev.of_rule.key in self.of_rules:
+			of_rules = self.of_rules[ev.of_rule.key[0]]
+			if ev.of_rule.key[0] in self._reconciling:
+				of_rules.pop(ev.of_rule.key, None)
+			elif ev.of_rule.key in of_rules:
 				datapath = ev.of_rule.switch.switch.dp
 				ofproto = datapath.ofproto
 				parser = datapath.ofproto_parser
@@ -238,13 +648,96 @@ class Nmm(app_manager.RyuApp):
 									priority = ev.of_rule.priority, buffer_id = ofproto.OFPCML_NO_BUFFER, 
 									out_port = ofproto.OFPP_ANY, out_group = ofproto.OFPG_ANY, 
 									match = ev.of_rule.match, instructions = inst)
-				datapath.send_msg(mod)
+				self._send_msg(datapath, mod)
 
-				del self.of_rules[ev.of_rule.key]
+				del of_rules[ev.of_rule.key]
 		except KeyError:
 			pass
 
 
+	@set_ev_cls(EventWriteOFGroup)
+	def _handler_write_of_group(self, ev):
+		"""
+		Write OpenFlow group on switch.
+		A group already present is modified in place, the
+		flow entries forwarding to it are left untouched. 
+		While the switch is being reconciled the group is 
+		only recorded, during the grace period an identical
+		dumped group is kept.
+		"""
+		try:
+			of_groups = self.of_groups[ev.of_group.key[0]]
+			old_group = of_groups.get(ev.of_group.group_id)
+			if old_group is None or old_group.fingerprint != ev.of_group.fingerprint:
+
+				if ev.of_group.key[0] not in self._reconciling:
+					datapath = ev.of_group.switch.switch.dp
+					ofproto = datapath.ofproto
+					command = ofproto.OFPGC_ADD if old_group is None else ofproto.OFPGC_MODIFY
+					# The group dumped from the switch, not claimed yet
+					views = self._switch_views.get(ev.of_group.key[0])
+					if views is not None and ev.of_group.group_id in views[1]:
+						view = views[1].pop(ev.of_group.group_id)
+						command = None if view == self._group_view(ev.of_group.type_, ev.of_group.buckets) else ofproto.OFPGC_MODIFY
+					if command is not None:
+						self._send_msg(datapath, self._group_mod(datapath, ev.of_group, command))
+
+				of_groups[ev.of_group.group_id] = ev.of_group
+		except KeyError:
+			pass
+
+
+	@set_ev_cls(EventDelOFGroup)
+	def _handler_del_of_group(self, ev):
+		"""
+		Delete OpenFlow group on switch, the flow entries 
+		forwarding to it are deleted by the switch.
+		While the switch is being reconciled the group is 
+		only forgotten.
+		"""
+		try:
+			of_groups = self.of_groups[ev.of_group.key[0]]
+			if ev.of_group.group_id in of_groups:
+				if ev.of_group.key[0] not in self._reconciling:
+					datapath = ev.of_group.switch.switch.dp
+					self._send_msg(datapath, self._group_mod(datapath, ev.of_group, datapath.ofproto.OFPGC_DELETE))
+
+				del of_groups[ev.of_group.group_id]
+		except KeyError:
+			pass
+
+
+	@set_ev_cls(EventSendBarrier)
+	def _handler_send_barrier(self, ev):
+		"""
+		Send a barrier request to the switch after the messages 
+		already sent or queued for it.
+		"""
+		try:
+			datapath = self.switches[ev.switch.switch.dp.id].switch.dp
+			msg = datapath.ofproto_parser.OFPBarrierRequest(datapath)
+			xid = datapath.set_xid(msg)
+			self._barriers[(datapath.id, xid)] = ev
+			self._send_msg(datapath, msg)
+			# With batching the messages are written at the next flush
+			if ev.trace_id is not None and NMM_SEND_BATCHING:
+				self._send_traces.append(ev.trace_id)
+			else:
+				tracer.stamp(ev.trace_id, 'flowmods_sent')
+		except KeyError:
+			pass
+
+
+	@set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+	def _handler_barrier_reply(self, ev):
+		"""
+		Notify the module that requested the barrier.
+		"""
+		req = self._barriers.pop((ev.msg.datapath.id, ev.msg.xid), None)
+		if req is not None:
+			self.send_event(req.requester, EventBarrierDone(req.switch, req.cookie))
+
+
 	@set_ev_cls(EventSwitchRequest)
 	def _handler_switch_request(self, req):
 		"""
@@ -326,6 +819,13 @@ class Nmm(app_manager.RyuApp):
 			self.send_event_to_observers(ev_tu)
 
 			del self.switches[ev.switch.dp.id]
+			self._reconciling.pop(ev.switch.dp.id, None)
+			self._switch_views.pop(ev.switch.dp.id, None)
+			for key in [key for key in self._barriers if key[0] == ev.switch.dp.id]:
+				del self._barriers[key]
+			if not NMM_RECONCILE:
+				self.of_rules.pop(ev.switch.dp.id, None)
+				self.of_groups.pop(ev.switch.dp.id, None)
 
 			ev_tu = EventTopologyUpdate(self.switches)
 			self.send_event_to_observers(ev_tu)
@@ -154,10 +154,13 @@ class Association(Attachment):
 		Attribute        Description
 		================ =========================================================
 		anchors          Anchor dictionary instance.
+		trace_id         The correlation ID of the association, None if 
+						 it is not traced
 		================ =========================================================
 		"""
 		super(Association, self).__init__(switch, port)
 		self.anchors = {}
+		self.trace_id = None
 
 
 	def to_dict(self):
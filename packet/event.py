@@ -29,70 +29,99 @@
 
 # Start import from Ryu files
 from ryu.controller import event
+
+from ryu.lib.packet import packet
+from ryu.lib.packet import ethernet
+from ryu.lib.packet import icmpv6
+from ryu.lib.packet import ipv6
 # End import from Ryu files
 
 
 
 
-class EventRSReceived(event.EventBase):
+class EventPacketReceived(event.EventBase):
 	"""
-	This Event is triggered when a Router Solicitation is received.
+	Base class for the events raised upon a meaningful PacketIn.
+	The header fields used for the classification are carried along 
+	with the event. The packet is fully decoded at most once, the first
+	time a handler accesses pkt, p_eth, p_ipv6 or p_icmpv6.
 	"""
-	def __init__(self, msg):
+	def __init__(self, msg, switch, port, header, pkt = None):
 		"""
 		================ =========================================================
 		Attribute        Description
 		================ =========================================================
 		msg              The msg content as generated by Ryu
+		switch           The Switch instance the packet has been received from
+		port             The Port instance the packet has been received from
+		eth_dst          The ethernet destination address, String instance
+		eth_src          The ethernet source address, String instance
+		ipv6_src         The ipv6 source address, String instance
+		ipv6_dst         The ipv6 destination address, String instance
+		icmpv6_type      The icmpv6 type, None if the packet is not ICMPv6
+		pkt              The decoded Packet instance
+		p_eth            The decoded ethernet header
+		p_ipv6           The decoded ipv6 header
+		p_icmpv6         The decoded icmpv6 header, None if not present
 		================ =========================================================
 		"""	
-		super(EventRSReceived, self).__init__()
+		super(EventPacketReceived, self).__init__()
 		self.msg = msg
+		self.switch = switch
+		self.port = port
+		self.eth_dst = header.eth_dst
+		self.eth_src = header.eth_src
+		self.ipv6_src = header.ipv6_src
+		self.ipv6_dst = header.ipv6_dst
+		self.icmpv6_type = header.icmpv6_type
+		self._pkt = pkt
+
+
+	@property
+	def pkt(self):
+		if self._pkt is None:
+			self._pkt = packet.Packet(self.msg.data)
+		return self._pkt
+
+
+	@property
+	def p_eth(self):
+		return self.pkt.get_protocol(ethernet.ethernet)
+
+
+	@property
+	def p_ipv6(self):
+		return self.pkt.get_protocol(ipv6.ipv6)
+
+
+	@property
+	def p_icmpv6(self):
+		return self.pkt.get_protocol(icmpv6.icmpv6)
 
 
-class EventNSReceived(event.EventBase):
+class EventRSReceived(EventPacketReceived):
+	"""
+	This Event is triggered when a Router Solicitation is received.
+	"""
+	pass
+
+
+class EventNSReceived(EventPacketReceived):
 	"""
 	This Event is triggered when a Neighbor Solicitation is received.
 	"""
-	def __init__(self, msg):
-		"""
-		================ =========================================================
-		Attribute        Description
-		================ =========================================================
-		msg              The msg content as generated by Ryu
-		================ =========================================================
-		"""	
-		super(EventNSReceived, self).__init__()
-		self.msg = msg
+	pass
 
 
-class EventNAReceived(event.EventBase):
+class EventNAReceived(EventPacketReceived):
 	"""
 	This Event is triggered when a Neighbor Advertisement is received.
 	"""
-	def __init__(self, msg):
-		"""
-		================ =========================================================
-		Attribute        Description
-		================ =========================================================
-		msg              The msg content as generated by Ryu
-		================ =========================================================
-		"""	
-		super(EventNAReceived, self).__init__()
-		self.msg = msg
+	pass
 
 
-class EventUnknownIPReceived(event.EventBase):
+class EventUnknownIPReceived(EventPacketReceived):
 	"""
 	This Event is triggered when an IP packet with unknown destination is received.
 	"""
-	def __init__(self, msg):
-		"""
-		================ =========================================================
-		Attribute        Description
-		================ =========================================================
-		msg              The msg content as generated by Ryu
-		================ =========================================================
-		"""	
-		super(EventUnknownIPReceived, self).__init__()
-		self.msg = msg
+	pass
@@ -30,15 +30,24 @@
 # Start import from iJOIN solution files
 import log
 
+from static import PACKET_FAST_CLASSIFIER
+
 from event import *
+
+from nmm.event import EventTopologyUpdate
 # End import from iJOIN solution files
 
 # Start import from Ryu files
+import socket
+import struct
+
 from ryu.base import app_manager
 
 from ryu.controller.handler import set_ev_cls
 from ryu.controller.handler import MAIN_DISPATCHER
 
+from ryu.ofproto import ether
+from ryu.ofproto import inet
 from ryu.ofproto import ofproto_v1_3 as ofproto
 from ryu.controller.ofp_event import EventOFPPacketIn
 
@@ -51,6 +60,92 @@ from ryu.lib.packet import ipv6
 
 
 
+ETH_HDR_LEN = 14
+VLAN_HDR_LEN = 4
+IPV6_HDR_LEN = 40
+
+# IPv6 extension headers whose length is expressed in 8-octet units
+IPV6_EXT_HDRS = (inet.IPPROTO_HOPOPTS, inet.IPPROTO_ROUTING, inet.IPPROTO_DSTOPTS)
+
+
+class PacketHeader(object):
+	"""
+	The header fields needed to classify a PacketIn
+	"""
+	__slots__ = ('eth_dst', 'eth_src', 'ipv6_src', 'ipv6_dst', 'icmpv6_type')
+
+	def __init__(self, eth_dst, eth_src, ipv6_src, ipv6_dst, icmpv6_type = None):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		eth_dst          String instance
+		eth_src          String instance
+		ipv6_src         String instance
+		ipv6_dst         String instance
+		icmpv6_type      Int instance, None if the packet is not ICMPv6
+		================ =========================================================
+		"""
+		self.eth_dst = eth_dst
+		self.eth_src = eth_src
+		self.ipv6_src = ipv6_src
+		self.ipv6_dst = ipv6_dst
+		self.icmpv6_type = icmpv6_type
+
+
+def _mac_to_str(data, offset):
+	return ':'.join('%02x' % b for b in bytearray(data[offset:offset+6]))
+
+
+def classify(data):
+	"""
+	Classify a raw ethernet frame reading the fields at fixed offsets.
+	IPv6 extension headers are walked until the upper-layer header.
+	Return a PacketHeader instance, None if the frame is not IPv6.
+	"""
+	if len(data) < ETH_HDR_LEN:
+		return None
+
+	off = ETH_HDR_LEN
+	(ethertype,) = struct.unpack_from('!H', data, off-2)
+	while ethertype in (ether.ETH_TYPE_8021Q, ether.ETH_TYPE_8021AD):
+		if len(data) < off + VLAN_HDR_LEN:
+			return None
+		(ethertype,) = struct.unpack_from('!H', data, off+2)
+		off += VLAN_HDR_LEN
+
+	if ethertype != ether.ETH_TYPE_IPV6 or len(data) < off + IPV6_HDR_LEN:
+		return None
+
+	header = PacketHeader(_mac_to_str(data, 0), _mac_to_str(data, 6),
+						socket.inet_ntop(socket.AF_INET6, bytes(data[off+8:off+24])),
+						socket.inet_ntop(socket.AF_INET6, bytes(data[off+24:off+40])))
+
+	nxt = bytearray(data[off+6:off+7])[0]
+	off += IPV6_HDR_LEN
+	while off + 2 <= len(data):
+		if nxt in IPV6_EXT_HDRS:
+			nxt, hdr_len = struct.unpack_from('!BB', data, off)
+			off += (hdr_len + 1) * 8
+		elif nxt == inet.IPPROTO_AH:
+			nxt, hdr_len = struct.unpack_from('!BB', data, off)
+			off += (hdr_len + 2) * 4
+		elif nxt == inet.IPPROTO_FRAGMENT:
+			if off + 4 > len(data):
+				break
+			nxt, _, frag = struct.unpack_from('!BBH', data, off)
+			if frag & 0xfff8:
+				# Not the first fragment, no upper-layer header
+				break
+			off += 8
+		else:
+			if nxt == inet.IPPROTO_ICMPV6 and off + 4 <= len(data):
+				header.icmpv6_type = bytearray(data[off:off+1])[0]
+			break
+
+	return header
+
+
 class Packet(app_manager.RyuApp):
 	"""
 	================ =========================================================
@@ -65,8 +160,16 @@ class Packet(app_manager.RyuApp):
 
 
 	def __init__(self, *args, **kwargs):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		switches         The dictionary storing the switches
+		================ =========================================================
+		"""	
 		super(Packet, self).__init__(*args, **kwargs)
 		self.logger = log.get_logger(self.name)
+		self.switches = {}
 
 
 	@set_ev_cls(EventOFPPacketIn, MAIN_DISPATCHER)
@@ -77,20 +180,45 @@ class Packet(app_manager.RyuApp):
 		Once a meaningful packet is detected, raise the associated event.
 		"""
 		msg = ev.msg
-		pkt = packet.Packet(msg.data)
-		
-		p_eth = pkt.get_protocol(ethernet.ethernet)
-		p_ipv6 = pkt.get_protocol(ipv6.ipv6)
-		p_icmpv6 = pkt.get_protocol(icmpv6.icmpv6)
-		if p_eth and p_ipv6 and p_icmpv6 and p_icmpv6.type_ == icmpv6.ND_ROUTER_SOLICIT:
-			ev = EventRSReceived(msg)
-			self.send_event_to_observers(ev)
-		elif p_eth and p_ipv6 and p_icmpv6 and p_icmpv6.type_ == icmpv6.ND_NEIGHBOR_SOLICIT:
-			ev = EventNSReceived(msg)
-			self.send_event_to_observers(ev)
-		elif p_eth and p_ipv6 and p_icmpv6 and p_icmpv6.type_ == icmpv6.ND_NEIGHBOR_ADVERT:
-			ev = EventNAReceived(msg)
-			self.send_event_to_observers(ev)
-		elif p_eth and p_ipv6:
-			ev = EventUnknownIPReceived(msg)
-			self.send_event_to_observers(ev)
+		try:
+			switch = self.switches[msg.datapath.id]
+		except KeyError:
+			# The switch is not part of the topology yet
+			return
+
+		if PACKET_FAST_CLASSIFIER:
+			# The full decode is deferred to the handlers needing it
+			pkt = None
+			header = classify(msg.data)
+			if not header:
+				return
+		else:
+			pkt = packet.Packet(msg.data)
+
+			p_eth = pkt.get_protocol(ethernet.ethernet)
+			p_ipv6 = pkt.get_protocol(ipv6.ipv6)
+			p_icmpv6 = pkt.get_protocol(icmpv6.icmpv6)
+			if not (p_eth and p_ipv6):
+				return
+			header = PacketHeader(p_eth.dst, p_eth.src, p_ipv6.src, p_ipv6.dst,
+								p_icmpv6.type_ if p_icmpv6 else None)
+
+		port = switch.get_port(msg.match.get("in_port"))
+		if header.icmpv6_type == icmpv6.ND_ROUTER_SOLICIT:
+			ev = EventRSReceived(msg, switch, port, header, pkt)
+		elif header.icmpv6_type == icmpv6.ND_NEIGHBOR_SOLICIT:
+			ev = EventNSReceived(msg, switch, port, header, pkt)
+		elif header.icmpv6_type == icmpv6.ND_NEIGHBOR_ADVERT:
+			ev = EventNAReceived(msg, switch, port, header, pkt)
+		else:
+			ev = EventUnknownIPReceived(msg, switch, port, header, pkt)
+		self.send_event_to_observers(ev)
+
+
+	@set_ev_cls(EventTopologyUpdate, MAIN_DISPATCHER)
+	def _handler_topology_update(self, ev):
+		"""
+		Handler for EventTopologyUpdate.
+		Update the network topology stored locally.
+		"""	
+		self.switches = ev.switches
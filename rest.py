@@ -52,6 +52,8 @@ from nmm.event import EventLinkAdd
 from nmm.event import EventLinkDelete
 
 from static import ETH_PATTERN
+
+from tracing import tracer
 # End import from iJOIN solution files
 
 # Start import from Ryu files
@@ -295,6 +297,12 @@ class iJOINController(ControllerBase):
 		return Response(content_type = 'application/json', body = body)
 
 
+	@route('tracing', '/tracing/handover', methods=['GET'])
+	def _handler_get_handover_tracing(self, req, **kwargs):
+		body = json.dumps(tracer.to_dict())
+		return Response(content_type = 'application/json', body = body)
+
+
 	def _update_ue_profile(self, ueid, profile, enabled):
 		rep = self.app.send_request(EventUEProfileUpdateRequest(ueid, profile, enabled))
 		return rep.status
@@ -43,6 +43,117 @@ MN_ETH = ['00:11:22:33:44:55']
 WLAN_IFACE = 'wlan'
 GW_IFACE = 'gw'
 
+# Packet classification
+# When True, PacketIns are classified reading the ethertype, the IPv6
+# next-header and the ICMPv6 type at fixed offsets, and the full decode
+# is performed only when a handler needs deeper fields.
+PACKET_FAST_CLASSIFIER = True
+
+# Neighbor Discovery
+# When True, NS, NA and RA packets are built patching pre-serialized
+# templates instead of serializing the whole protocol stack.
+NDISC_PACKET_TEMPLATES = True
+# The packets with unknown destination are buffered until the neighbor
+# is resolved: at most NDISC_BUFFER_PER_DST packets per destination and
+# NDISC_BUFFER_MAX_BYTES bytes overall, the oldest are evicted first.
+NDISC_BUFFER_PER_DST = 16
+NDISC_BUFFER_MAX_BYTES = 4 * 1024 * 1024
+
+# Switch-side buffering
+# When True, the gateways keep the packets with unknown destination in
+# their own buffers and punt only the first SWITCH_BUFFER_MAX_LEN bytes,
+# the packets are released by buffer_id once the neighbor is resolved.
+SWITCH_BUFFERING = False
+SWITCH_BUFFER_MAX_LEN = 128
+
+# Outbound messages
+# When True, the messages Nmm sends to a datapath while handling events
+# are queued and written to the socket in a single batch once the event
+# loop yields. NMM_BATCH_BARRIER appends a barrier to the batches 
+# carrying flow table changes.
+NMM_SEND_BATCHING = True
+NMM_BATCH_BARRIER = False
+
+# Switch reconnection
+# When True, the flow tables of a (re)connecting switch are not flushed:
+# the flows carrying COOKIE are dumped and compared with the rules known
+# by the controller, only the missing or stale rules are written. 
+# The flows nobody claims within NMM_RECONCILE_GRACE seconds are deleted.
+# A switch not answering within NMM_RECONCILE_TIMEOUT seconds is flushed.
+NMM_RECONCILE = False
+NMM_RECONCILE_GRACE = 10
+NMM_RECONCILE_TIMEOUT = 5
+
+# Time slicing
+# The long loops of the handlers (routing, anchors reassignment, 
+# neighbor probing, router advertisements) yield to the other
+# greenthreads every TIMESLICE_BUDGET seconds, 0 never yields.
+TIMESLICE_BUDGET = 0.01
+
+# Routing
+# A burst of topology changes triggers a single routing recomputation:
+# Teem waits for TEEM_DEBOUNCE_WINDOW seconds without changes, but not
+# more than TEEM_DEBOUNCE_MAX_DELAY seconds after the first change.
+# A window of 0 recomputes on every change.
+TEEM_DEBOUNCE_WINDOW = 0.2
+TEEM_DEBOUNCE_MAX_DELAY = 2.0
+# The shortest paths algorithm: 'dijkstra' updates incrementally the 
+# trees affected by a change, 'floyd_warshall' recomputes all the pairs
+# with array operations and is faster on small, dense topologies.
+ROUTING_ALGORITHM = 'dijkstra'
+# When True, every switch balances the traffic toward a destination over
+# all its equal cost next hops with an OpenFlow select group, the group
+# is modified in place when the next hops change.
+ROUTING_MULTIPATH = False
+# When True, every switch also gets a loop-free backup next hop toward
+# each destination: the routing and UE rules forward through OpenFlow
+# fast failover groups, which switch to the backup port as soon as the
+# primary port goes down, before the controller recomputes the routing.
+ROUTING_FAST_FAILOVER = False
+# Compute the shortest paths in a worker process fed with snapshots of
+# the topology, so that Teem keeps serving its events meanwhile. Teem
+# checks every TEEM_ROUTING_WORKER_POLL seconds for the result.
+TEEM_ROUTING_WORKER = False
+TEEM_ROUTING_WORKER_POLL = 0.01
+# Keep the UE rules on the AP and on the anchor GW only: the edge switch
+# labels the packets with the hw_addr of the switch at the other end of
+# the path and the core switches forward them with the routing rules,
+# so a handover only touches the AP and the GW.
+TEEM_LABEL_FORWARDING = False
+# Replace the downlink rules matching the global address of each UE, but
+# on the AP, with masked rules on the aggregate prefixes of the UEs of a
+# gateway sharing the same forwarding on a switch.
+TEEM_DL_AGGREGATION = False
+# Make-before-break handover: the rules of the new paths are written and
+# confirmed by a barrier on every switch before the rules redirecting the
+# traffic are modified, the old rules and the old AP neighbor entry are 
+# removed last. A phase not confirmed within TEEM_HANDOVER_TIMEOUT 
+# seconds is considered done.
+TEEM_MAKE_BEFORE_BREAK = False
+TEEM_HANDOVER_TIMEOUT = 0.5
+
+# Anchor selection
+# The default gateway of a UE is the one with the lowest cost: the 
+# distance from the AP, plus AMM_LOAD_WEIGHT per UE anchored to the 
+# gateway, plus AMM_RATE_WEIGHT per Mbit/s through its gateway port. 
+# A gateway anchoring AMM_GW_MAX_UES UEs, 0 unlimited, is selected only
+# if no other reachable gateway can be. With the defaults the closest
+# gateway is selected.
+AMM_LOAD_WEIGHT = 0
+AMM_RATE_WEIGHT = 0
+AMM_GW_MAX_UES = 0
+# When True, Nmm measures every 5 seconds the throughput through the 
+# gateway ports.
+NMM_GW_STATS = False
+
+# Handover tracing
+# Every UE attachment gets a correlation ID at the Router Solicitation,
+# the latency of each stage up to the rules acknowledged by the switches
+# is added to a histogram, exposed over REST. At most TRACE_MAX_OPEN
+# attachments are traced at the same time.
+TRACE_HANDOVER = False
+TRACE_MAX_OPEN = 256
+
 # OpenFlow config
 OF_TABLE_NUM = 5
 
@@ -52,6 +52,36 @@ from ryu.ofproto import ofproto_v1_3_parser as ofp_parser
 # End import from Ryu files
 
 
+class RuleKey(tuple):
+	"""
+	The identity of an OpenFlow rule on a switch:
+	(dpid, table_id, priority, sorted match fields).
+	The hash is computed once, the key is used for every rule lookup.
+	"""
+	def __new__(cls, dpid, table_id, priority, match):
+		key = tuple.__new__(cls, (dpid, table_id, priority, tuple(sorted(match.items()))))
+		key._hash = tuple.__hash__(key)
+		return key
+
+
+	def __hash__(self):
+		return self._hash
+
+
+def of_fingerprint(obj):
+	"""
+	Return a hashable value identifying the content of OpenFlow 
+	instructions or actions. Lengths are skipped, they are only 
+	known once the message is serialized.
+	"""
+	if isinstance(obj, (list, tuple)):
+		return tuple(of_fingerprint(o) for o in obj)
+	if hasattr(obj, '__dict__'):
+		return (obj.__class__.__name__,) + tuple(sorted((k, of_fingerprint(v)) 
+						for k, v in obj.__dict__.iteritems() if k not in ('len', 'length')))
+	return obj
+
+
 class OFRule:
 	"""
 	This class represents an OpenFlow Rule
@@ -66,9 +96,12 @@ class OFRule:
 		match			 The OpenFlow matching rule, OFPMatch instance
 		actions	         The OpenFlow actions rule, OFPAction instance
 		priority		 The OpenFlow rule's priority, Int isntance
+		key				 The rule identity, RuleKey instance
+		fingerprint		 The cookie and instructions fingerprint, 
+						 computed on first use
 		================ =========================================================
 		"""
-		self.key = str(switch.switch.dp.id) + ':' + str(table_id) + ':' + str(match)
+		self.key = RuleKey(switch.switch.dp.id, table_id, priority, match)
 		self.switch = switch
 		self.match = match
 		self.actions = actions
@@ -77,6 +110,47 @@ class OFRule:
 		self.priority = priority
 		self.cookie = cookie
 		self.cookie_mask = cookie_mask
+		self._fingerprint = None
+
+
+	@property
+	def fingerprint(self):
+		if self._fingerprint is None:
+			self._fingerprint = (self.cookie, of_fingerprint(self.instructions))
+		return self._fingerprint
+
+
+class OFGroup:
+	"""
+	This class represents an OpenFlow Group
+	"""
+	def __init__(self, switch, group_id, buckets, type_ = ofproto.OFPGT_SELECT):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		switch			 The switch involved, Switch instance
+		group_id		 The OpenFlow group identifier, Int instance
+		buckets	         The OpenFlow buckets, list of OFPBucket instances
+		type_			 The OpenFlow group type
+		key				 The group identity, (dpid, group_id)
+		fingerprint		 The type and buckets fingerprint, 
+						 computed on first use
+		================ =========================================================
+		"""
+		self.key = (switch.switch.dp.id, group_id)
+		self.switch = switch
+		self.group_id = group_id
+		self.buckets = buckets
+		self.type_ = type_
+		self._fingerprint = None
+
+
+	@property
+	def fingerprint(self):
+		if self._fingerprint is None:
+			self._fingerprint = (self.type_, of_fingerprint(self.buckets))
+		return self._fingerprint
 
 
 class Link:
@@ -146,12 +220,16 @@ class GatewayConf:
 						 CIDR netmask to apply to network_prefix.
 		served_ues	     The dictionary storing the UEs being served by the 
 						 gateway
+		rate             The throughput through the gateway port, in bit/s
+		stats            The (time, bytes) of the last gateway port counters
 		================ =========================================================
 		"""
 		self.port = None
 		self.nw_prefix = None
 		self.nw_prefix_len = 0
 		self.served_ues = {}
+		self.rate = 0.0
+		self.stats = None
 
 	
 	def to_dict(self):
@@ -38,15 +38,89 @@ class EventRoutingUpdate(event.EventBase):
 	"""
 	This Event is triggered when a topology change occurs in the network.
 	"""
-	def __init__(self, previous, distance):
+	def __init__(self, previous, distance, changed = None, matrix = None, dpids = None):
 		"""
 		================ =========================================================
 		Attribute        Description
 		================ =========================================================
 		previous         The dictionary storing the previous switches 
 		distance         The dictionary storing the distance between the switches 
+		changed          The set of (src dpid, dst dpid) whose path or distance
+						 changed, None if every path may have changed
+		matrix           The distance matrix, numpy array indexed as dpids.
+						 It must not be modified.
+		dpids            The list of the dpids indexing the matrix
+		index            The dictionary storing the matrix index of each dpid
 		================ =========================================================
 		"""	
 		super(EventRoutingUpdate, self).__init__()
 		self.previous = previous.copy()
 		self.distance = distance.copy()
+		self.changed = changed
+		self.matrix = matrix
+		self.dpids = dpids
+		self.index = dict((dpid, i) for i, dpid in enumerate(dpids or []))
+
+
+class EventRoutingComputed(event.EventBase):
+	"""
+	This Event is sent by Teem to itself when the routing worker 
+	returns the shortest paths of a topology snapshot.
+	"""
+	def __init__(self, seq, switches, graph, changed, rows):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		seq              The sequence number of the snapshot
+		switches         The switches of the snapshot
+		graph            The Graph of the snapshot
+		changed          The set of (src dpid, dst dpid) whose path or distance
+						 changed, None if every path may have changed
+		rows             The dictionary storing the previous and distance 
+						 arrays of the recomputed trees, by source dpid
+		================ =========================================================
+		"""	
+		super(EventRoutingComputed, self).__init__()
+		self.seq = seq
+		self.switches = switches
+		self.graph = graph
+		self.changed = changed
+		self.rows = rows
+
+
+class EventHandoverComplete(event.EventBase):
+	"""
+	This Event is triggered when the rules of a UE have been updated
+	and the old ones removed, in make-before-break mode.
+	"""
+	def __init__(self, ue):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		ue               The UE whose rules have been updated
+		================ =========================================================
+		"""	
+		super(EventHandoverComplete, self).__init__()
+		self.ue = ue
+
+
+class EventHandoverTimeout(event.EventBase):
+	"""
+	This Event is sent by Teem to itself when a phase of a handover 
+	has not been confirmed in time.
+	"""
+	def __init__(self, hw_addr, cookie):
+		super(EventHandoverTimeout, self).__init__()
+		self.hw_addr = hw_addr
+		self.cookie = cookie
+
+
+class EventRecomputeRouting(event.EventBase):
+	"""
+	This Event is sent by Teem to itself when the topology 
+	has been stable long enough to recompute the routing.
+	"""
+	def __init__(self):
+		super(EventRecomputeRouting, self).__init__()
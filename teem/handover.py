@@ -0,0 +1,70 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+# Start import from Ryu files
+import time
+# End import from Ryu files
+
+
+
+
+class Handover:
+	"""
+	A make-before-break update of the rules of a UE. The requests are 
+	sent in three phases: the rules and groups of the new paths, the 
+	rules modified in place, which redirect the traffic on the new paths,
+	and the deletion of the old rules and groups. A phase is sent once
+	every switch involved in the previous one replied to a barrier.
+	"""
+	def __init__(self, ue, make, flip, break_):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		ue               The UE whose rules are updated
+		make             The requests writing the rules of the new paths
+		flip             The requests modifying the rules in place
+		break_           The requests deleting the old rules
+		step             The number of phases sent
+		cookie           The cookie of the barriers of the last phase
+		pending          The set of the dpids of the switches whose barrier
+						 reply is awaited
+		start            The time the update started
+		redirected       The time the flip phase was confirmed, None until then
+		================ =========================================================
+		"""
+		self.ue = ue
+		self.make = make
+		self.flip = flip
+		self.break_ = break_
+		self.step = 0
+		self.cookie = None
+		self.pending = set()
+		self.start = time.time()
+		self.redirected = None
@@ -0,0 +1,721 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+# Start import from Ryu files
+import heapq
+import multiprocessing
+import numpy
+
+from collections import OrderedDict
+# End import from Ryu files
+
+
+
+
+class Graph:
+	"""
+	This class represents the network topology as an integer-indexed 
+	adjacency list, built once per topology and shared by all the 
+	shortest path computations.
+	"""
+	def __init__(self, switches):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		dpids            The list of the switch dpids, by index
+		index            The dictionary storing the index of each dpid
+		adj              The list storing, by index, the (neighbor index, 
+						 weight, Link) of the outgoing links
+		edges            The dictionary storing the (source index, neighbor 
+						 index, weight, Link) of the links, by Link id
+		================ =========================================================
+		The order of the switches and of their links is the order of the
+		dictionaries, so that equal cost paths are broken as before.
+		"""
+		self.dpids = switches.keys()
+		self.index = dict((dpid, i) for i, dpid in enumerate(self.dpids))
+		self.adj = []
+		self.edges = {}
+
+		for u, dpid in enumerate(self.dpids):
+			edges = []
+			for v, links in switches[dpid].links.iteritems():
+				if v in self.index:
+					for l in links:
+						edges.append((self.index[v], l.weight, l))
+						self.edges[id(l)] = (u, self.index[v], l.weight, l)
+			self.adj.append(edges)
+
+
+	def __len__(self):
+		return len(self.dpids)
+
+
+def shortest_paths(graph, src):
+	"""
+	Compute Dijkstra from the switch index src.
+	Return the lists of distances and of the Link reaching each switch.
+	Ties are broken like the previous list based implementation:
+	among the closest switches the first in index order is settled first,
+	among equal cost links the first seen is kept.
+	"""
+	n = len(graph)
+	distance = [float('inf')] * n
+	previous = [None] * n
+	done = [False] * n
+
+	distance[src] = 0
+	heap = [(0, src)]
+	while heap:
+		d, u = heapq.heappop(heap)
+		if done[u]:
+			continue
+		done[u] = True
+
+		for v, weight, link in graph.adj[u]:
+			if not done[v]:
+				alt = d + weight
+				if alt < distance[v]:
+					distance[v] = alt
+					previous[v] = link
+					heapq.heappush(heap, (alt, v))
+
+	return distance, previous
+
+
+def shortest_paths_dict(graph, src_dpid):
+	"""
+	Compute Dijkstra from src_dpid.
+	Return the distance and previous dictionaries keyed by dpid.
+	"""
+	distance, previous = shortest_paths(graph, graph.index[src_dpid])
+
+	return dict(zip(graph.dpids, distance)), dict(zip(graph.dpids, previous))
+
+
+def floyd_warshall(graph, slicer = None):
+	"""
+	Compute all pairs shortest paths with Floyd-Warshall, vectorized 
+	over the dense distance matrix: one array operation per pivot.
+	Return the distance matrix, the matrix of the indices in links of
+	the Link reaching each destination (-1 if none) and links.
+	The TimeSlicer slicer, if any, is checked after each pivot.
+	"""
+	n = len(graph)
+	distance = numpy.full((n, n), numpy.inf)
+	numpy.fill_diagonal(distance, 0)
+	previous = numpy.full((n, n), -1, dtype = int)
+	links = []
+
+	for u, edges in enumerate(graph.adj):
+		for v, weight, link in edges:
+			# Among parallel links the first cheapest is kept
+			if weight < distance[u, v]:
+				distance[u, v] = weight
+				previous[u, v] = len(links)
+				links.append(link)
+
+	for k in xrange(n):
+		alt = distance[:, k, None] + distance[None, k, :]
+		better = alt < distance
+		distance = numpy.where(better, alt, distance)
+		previous = numpy.where(better, previous[k, :][None, :], previous)
+		if slicer is not None:
+			slicer.check()
+
+	return distance, previous, links
+
+
+class ShortestPaths:
+	"""
+	This class maintains the shortest path trees of every switch.
+	With the dijkstra algorithm only the trees affected by the links 
+	added, removed or re-weighted are recomputed on a topology update.
+	With the floyd_warshall algorithm all the pairs are recomputed with 
+	array operations, which pays off on small and dense topologies.
+	In multipath mode the changes reported include the changes of the 
+	equal cost next hops, see next_hops, in backup mode the changes of 
+	the backup next hops, see backup_hops.
+	"""
+	def __init__(self, algorithm = 'dijkstra', multipath = False, backup = False):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		algorithm        The algorithm used, dijkstra or floyd_warshall
+		multipath        True if the equal cost next hops are tracked
+		backup           True if the backup next hops are tracked
+		graph            The Graph the trees are computed on
+		switches         The switches dictionary the trees are computed on
+		distance         The dictionary storing the distance dictionaries, 
+						 by source dpid
+		previous         The dictionary storing the previous Link dictionaries,
+						 by source dpid
+		matrix           The distance matrix, numpy array indexed 
+						 as graph.dpids. It is replaced, never modified.
+		================ =========================================================
+		"""
+		if algorithm not in ('dijkstra', 'floyd_warshall'):
+			raise ValueError('Unknown routing algorithm ' + str(algorithm))
+
+		self.algorithm = algorithm
+		self.multipath = multipath
+		self.backup = backup
+		self.graph = None
+		self.switches = {}
+		self.distance = {}
+		self.previous = {}
+		self.matrix = numpy.zeros((0, 0))
+
+		self._distance = []
+		self._previous = []
+		self._link_of = None
+		self._first_hops = {}
+		self._next_hops = {}
+		self._backup_hops = {}
+
+
+	def update(self, switches, slicer = None):
+		"""
+		Update the trees to the topology switches.
+		Return the set of (src dpid, dst dpid) whose path or distance 
+		changed, None when every tree has been recomputed.
+		A tree untouched by the changes is kept as it is, even where a
+		full recomputation could break an equal cost tie differently.
+		The TimeSlicer slicer, if any, is checked after each tree.
+		"""
+		old = self.graph
+		changed = self._update_trees(switches, slicer)
+		if self.multipath or self.backup:
+			changed = self._update_hops(old, changed)
+
+		return changed
+
+
+	def _update_trees(self, switches, slicer):
+		graph = Graph(switches)
+		old = self.graph
+		self.graph = graph
+		self.switches = switches
+
+		if self.algorithm == 'floyd_warshall':
+			return self._update_floyd_warshall(old, graph, slicer)
+
+		if old is None or old.dpids != graph.dpids:
+			self._distance = []
+			self._previous = []
+			for s in xrange(len(graph)):
+				distance, previous = shortest_paths(graph, s)
+				self._distance.append(distance)
+				self._previous.append(previous)
+				if slicer is not None:
+					slicer.check()
+			self.distance = dict((dpid, dict(zip(graph.dpids, self._distance[s]))) for s, dpid in enumerate(graph.dpids))
+			self.previous = dict((dpid, dict(zip(graph.dpids, self._previous[s]))) for s, dpid in enumerate(graph.dpids))
+			self.matrix = numpy.array(self._distance, dtype = float).reshape(len(graph), len(graph))
+			self._first_hops = {}
+			return None
+
+		# A re-weighted link is both removed and added
+		removed = [e for k, e in old.edges.iteritems() if k not in graph.edges or graph.edges[k] != e]
+		added = [e for k, e in graph.edges.iteritems() if k not in old.edges or old.edges[k] != e]
+
+		changed = set()
+		matrix = None
+		for s in xrange(len(graph)):
+			distance = self._distance[s]
+			previous = self._previous[s]
+
+			affected = False
+			# The tree uses a removed link
+			for u, v, weight, link in removed:
+				if previous[v] is link:
+					affected = True
+					break
+			# An added link reaches a switch at least as cheaply
+			if not affected:
+				for u, v, weight, link in added:
+					if distance[u] + weight <= distance[v] and distance[u] != float('inf'):
+						affected = True
+						break
+			if not affected:
+				continue
+
+			new_distance, new_previous = shortest_paths(graph, s)
+			for d in self._changed_destinations(graph, s, distance, previous, new_distance, new_previous):
+				changed.add((graph.dpids[s], graph.dpids[d]))
+
+			self._distance[s] = new_distance
+			self._previous[s] = new_previous
+			self.distance[graph.dpids[s]] = dict(zip(graph.dpids, new_distance))
+			self.previous[graph.dpids[s]] = dict(zip(graph.dpids, new_previous))
+			self._first_hops.pop(graph.dpids[s], None)
+
+			if matrix is None:
+				matrix = self.matrix.copy()
+			matrix[s] = new_distance
+			if slicer is not None:
+				slicer.check()
+
+		if matrix is not None:
+			self.matrix = matrix
+
+		return changed
+
+
+	def _update_floyd_warshall(self, old, graph, slicer = None):
+		"""
+		Recompute all the pairs, the changed pairs are found comparing
+		the new matrices with the previous ones.
+		"""
+		n = len(graph)
+		matrix, previous, links = floyd_warshall(graph, slicer)
+
+		# The Link and the index of the switch preceding each destination
+		link_of = numpy.array(links + [None], dtype = object)[previous]
+		parent = numpy.array([graph.edges[id(l)][0] for l in links] + [0], dtype = int)[previous]
+		parent[previous < 0] = numpy.arange(n).repeat(n).reshape(n, n)[previous < 0]
+
+		changed = None
+		if old is not None and old.dpids == graph.dpids:
+			# A path changes if its last link or the path to that link changes
+			diff = (matrix != self.matrix) | (link_of != self._link_of)
+			rows = numpy.arange(n)[:, None]
+			while True:
+				new_diff = diff | diff[rows, parent]
+				if (new_diff == diff).all():
+					break
+				diff = new_diff
+			changed = set((graph.dpids[i], graph.dpids[j]) for i, j in zip(*numpy.nonzero(diff)))
+
+		self.matrix = matrix
+		self._link_of = link_of
+		self.distance = {}
+		self.previous = {}
+		for s, dpid in enumerate(graph.dpids):
+			self.distance[dpid] = dict(zip(graph.dpids, matrix[s].tolist()))
+			self.previous[dpid] = dict(zip(graph.dpids, link_of[s].tolist()))
+			if slicer is not None:
+				slicer.check()
+		self._first_hops = {}
+
+		return changed
+
+
+	def first_hops(self, src_dpid):
+		"""
+		Return the dictionary storing, by destination dpid, the first 
+		Link of the path from src_dpid. The result is cached until the 
+		tree of src_dpid changes.
+		"""
+		if src_dpid in self._first_hops:
+			return self._first_hops[src_dpid]
+
+		graph = self.graph
+		previous = self.previous[src_dpid]
+
+		children = dict((dpid, []) for dpid in graph.dpids)
+		for dpid, link in previous.iteritems():
+			if link is not None:
+				children[graph.dpids[graph.edges[id(link)][0]]].append(dpid)
+
+		hops = {}
+		stack = [(dpid, previous[dpid]) for dpid in children[src_dpid]]
+		while stack:
+			dpid, hop = stack.pop()
+			hops[dpid] = hop
+			stack.extend((child, hop) for child in children[dpid])
+
+		self._first_hops[src_dpid] = hops
+		return hops
+
+
+	def next_hops(self, src_dpid):
+		"""
+		Return the dictionary storing, by destination dpid, the list of
+		the Links of src_dpid starting a shortest path: the equal cost 
+		next hops, parallel links included. The result is cached until
+		the next hops of src_dpid change.
+		"""
+		if src_dpid in self._next_hops:
+			return self._next_hops[src_dpid]
+
+		graph = self.graph
+		s = graph.index[src_dpid]
+		distance = self.matrix[s]
+		reachable = numpy.isfinite(distance)
+		reachable[s] = False
+
+		hops = {}
+		for v, weight, link in graph.adj[s]:
+			for d in numpy.nonzero((weight + self.matrix[v] == distance) & reachable)[0]:
+				hops.setdefault(graph.dpids[d], []).append(link)
+
+		self._next_hops[src_dpid] = hops
+		return hops
+
+
+	def backup_hops(self, src_dpid):
+		"""
+		Return the dictionary storing, by destination dpid, the backup 
+		Link of src_dpid: the cheapest link other than the first hop 
+		whose neighbor reaches the destination without going back 
+		through src_dpid (loop-free alternate). Destinations without 
+		such a link are missing. The result is cached until the backup
+		next hops of src_dpid change.
+		"""
+		if src_dpid in self._backup_hops:
+			return self._backup_hops[src_dpid]
+
+		graph = self.graph
+		s = graph.index[src_dpid]
+		distance = self.matrix[s]
+		first_hops = self.first_hops(src_dpid)
+
+		hops = {}
+		if graph.adj[s]:
+			links = [link for _, _, link in graph.adj[s]]
+			neighbors = [v for v, _, _ in graph.adj[s]]
+			weights = numpy.array([weight for _, weight, _ in graph.adj[s]], dtype = float)[:, None]
+			cost = weights + self.matrix[neighbors]
+			loop_free = self.matrix[neighbors] < self.matrix[neighbors, s][:, None] + distance
+			cost[~loop_free] = numpy.inf
+
+			position = dict((id(link), i) for i, link in enumerate(links))
+			for dst_dpid, link in first_hops.iteritems():
+				d = graph.index[dst_dpid]
+				column = cost[:, d].copy()
+				column[position[id(link)]] = numpy.inf
+				i = int(numpy.argmin(column))
+				if numpy.isfinite(column[i]):
+					hops[dst_dpid] = links[i]
+
+		self._backup_hops[src_dpid] = hops
+		return hops
+
+
+	def _update_hops(self, old, changed):
+		"""
+		Add to changed the (src dpid, dst dpid) whose equal cost or
+		backup next hops changed. The next hops of a switch depend on 
+		its links, on its tree and on its distances and those of its 
+		neighbors.
+		"""
+		if changed is None:
+			self._next_hops = {}
+			self._backup_hops = {}
+			return None
+
+		graph = self.graph
+		rows = set(src for src, _ in changed)
+		sources = set(rows)
+		for k, e in old.edges.iteritems():
+			if k not in graph.edges or graph.edges[k] != e:
+				sources.add(graph.dpids[e[0]])
+		for k, e in graph.edges.iteritems():
+			if k not in old.edges or old.edges[k] != e or graph.dpids[e[1]] in rows:
+				sources.add(graph.dpids[e[0]])
+
+		tracked = []
+		if self.multipath:
+			tracked.append((self._next_hops, self.next_hops))
+		if self.backup:
+			tracked.append((self._backup_hops, self.backup_hops))
+
+		for src in sources:
+			for cache, get_hops in tracked:
+				old_hops = cache.pop(src, None)
+				hops = get_hops(src)
+				if old_hops is None:
+					changed.update((src, dst) for dst in graph.dpids if dst != src)
+					continue
+				for dst in set(old_hops) | set(hops):
+					if _link_ids(old_hops.get(dst)) != _link_ids(hops.get(dst)):
+						changed.add((src, dst))
+
+		return changed
+
+
+	def apply(self, switches, graph, changed, rows, slicer = None):
+		"""
+		Update the trees to the topology switches, whose Graph is graph,
+		with the result of a computation done elsewhere, see RoutingWorker.
+		rows stores, by source dpid, the (previous, distance) arrays of the
+		recomputed trees, indexed as graph.dpids: the position in the 
+		adjacency lists of graph of the Link reaching each switch, -1 if 
+		none, and the distance of each switch.
+		The TimeSlicer slicer, if any, is checked after each tree.
+		"""
+		self.graph = graph
+		self.switches = switches
+
+		# Only the rows of the recomputed trees are new
+		if changed is None:
+			self.matrix = numpy.array([rows[dpid][1] for dpid in graph.dpids], dtype = float).reshape(len(graph), len(graph))
+		elif rows:
+			self.matrix = self.matrix.copy()
+			for dpid, (_, distance) in rows.iteritems():
+				self.matrix[graph.index[dpid]] = distance
+
+		# The Link of each position in the adjacency lists, None at -1
+		links = numpy.array([link for edges in graph.adj for _, _, link in edges] + [None], dtype = object)
+		if changed is None:
+			self.distance = {}
+			self.previous = {}
+			self._first_hops = {}
+			self._next_hops = {}
+			self._backup_hops = {}
+
+		for dpid, (previous, distance) in rows.iteritems():
+			self.distance[dpid] = dict(zip(graph.dpids, distance.tolist()))
+			self.previous[dpid] = dict(zip(graph.dpids, links[previous].tolist()))
+			self._first_hops.pop(dpid, None)
+			self._next_hops.pop(dpid, None)
+			self._backup_hops.pop(dpid, None)
+			if slicer is not None:
+				slicer.check()
+
+
+	def _changed_destinations(self, graph, s, distance, previous, new_distance, new_previous):
+		"""
+		Return the destinations whose path from s or distance changed:
+		a path changes if its last link or the path to that link changes.
+		"""
+		children = [[] for _ in xrange(len(graph))]
+		for d, link in enumerate(new_previous):
+			if link is not None:
+				children[graph.edges[id(link)][0]].append(d)
+
+		changed = [d for d in xrange(len(graph)) 
+					if new_previous[d] is None and d != s and distance[d] != new_distance[d]]
+
+		stack = [(s, False)]
+		while stack:
+			u, parent_changed = stack.pop()
+			for d in children[u]:
+				d_changed = parent_changed or new_previous[d] is not previous[d] or new_distance[d] != distance[d]
+				if d_changed:
+					changed.append(d)
+				stack.append((d, d_changed))
+
+		return changed
+
+
+
+def _link_ids(links):
+	"""
+	Return the identities of a Link, of a list of Links or of None
+	"""
+	if links is None:
+		return []
+	if isinstance(links, list):
+		return [id(l) for l in links]
+	return [id(links)]
+
+
+def link_key(link):
+	"""
+	Return the (src dpid, src port, dst dpid, dst port) identifying link
+	across processes.
+	"""
+	return (link.link.src.dpid, link.link.src.port_no, link.link.dst.dpid, link.link.dst.port_no)
+
+
+def snapshot(graph):
+	"""
+	Return the picklable topology of graph: the list of the dpids and 
+	the list storing, by index, the (neighbor index, weight, link_key)
+	of the outgoing links.
+	"""
+	return graph.dpids, [[(v, weight, link_key(link)) for v, weight, link in edges] for edges in graph.adj]
+
+
+class _SnapshotLink:
+	"""
+	This class stands for a Link in the worker process.
+	"""
+	def __init__(self, weight):
+		self.weight = weight
+
+
+class _SnapshotSwitch:
+	"""
+	This class stands for a Switch in the worker process.
+	"""
+	def __init__(self):
+		self.links = OrderedDict()
+
+
+def _worker_main(recv, send, algorithm, multipath, backup):
+	"""
+	The loop of the worker process: compute the trees of each 
+	snapshot received and send back the previous and distance arrays
+	of the recomputed trees only, see ShortestPaths.apply.
+	The same _SnapshotLink stands for a link across the snapshots, so 
+	that the trees are updated incrementally as in the controller.
+	"""
+	paths = ShortestPaths(algorithm, multipath, backup)
+	links = {}
+
+	while True:
+		try:
+			seq, reset, (dpids, adj) = recv.recv()
+		except EOFError:
+			return
+
+		if reset:
+			paths = ShortestPaths(algorithm, multipath, backup)
+			links = {}
+
+		# Rebuild the switches in the same order, for the same ties
+		switches = OrderedDict((dpid, _SnapshotSwitch()) for dpid in dpids)
+		used = {}
+		position = {None: -1}
+		for u, edges in enumerate(adj):
+			sw_links = switches[dpids[u]].links
+			for v, weight, key in edges:
+				l = links.get(key) or _SnapshotLink(weight)
+				l.weight = weight
+				used[key] = l
+				position[l] = len(position) - 1
+				sw_links.setdefault(dpids[v], []).append(l)
+		links = used
+
+		changed = paths.update(switches)
+
+		sources = dpids if changed is None else set(src for src, _ in changed)
+		rows = {}
+		for src in sources:
+			previous = paths.previous[src]
+			rows[src] = (numpy.array([position[previous[d]] for d in dpids], dtype = numpy.int32),
+						paths.matrix[paths.graph.index[src]])
+
+		send.send((seq, changed, rows))
+
+
+class RoutingWorker:
+	"""
+	This class computes the shortest path trees in a separate process, 
+	so that the controller keeps serving its events meanwhile.
+	A single snapshot is computed at a time: the snapshots submitted 
+	meanwhile are coalesced into the last one, which is sent when the 
+	result comes back. The pipes block the controller while a message 
+	is transferred: a snapshot is sent only when the worker waits for 
+	it and only the rows of the recomputed trees are sent back.
+	"""
+	def __init__(self, algorithm = 'dijkstra', multipath = False, backup = False):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		algorithm        The algorithm used, dijkstra or floyd_warshall
+		multipath        True if the equal cost next hops are tracked
+		backup           True if the backup next hops are tracked
+		seq              The sequence number of the last snapshot submitted
+		pending          True until the result of the last snapshot submitted
+						 is returned
+		_sent            The (seq, switches, Graph) of the snapshot being
+						 computed, None if the worker is idle
+		_next            The (seq, switches, Graph, reset) of the snapshot 
+						 waiting for the worker, None if any
+		================ =========================================================
+		"""
+		self.algorithm = algorithm
+		self.multipath = multipath
+		self.backup = backup
+		self.seq = 0
+		self.pending = False
+		self._sent = None
+		self._next = None
+
+		# One-way pipes are plain file descriptors, which the green 
+		# socket patching of eventlet leaves blocking
+		child_recv, self._send = multiprocessing.Pipe(False)
+		self._recv, child_send = multiprocessing.Pipe(False)
+		self._process = multiprocessing.Process(target = _worker_main, args = (child_recv, child_send, algorithm, multipath, backup))
+		self._process.daemon = True
+		self._process.start()
+		child_recv.close()
+		child_send.close()
+
+
+	def submit(self, switches, reset = False):
+		"""
+		Submit a snapshot of the topology switches, reset discards the 
+		trees of the previous snapshots.
+		Return the sequence number of the snapshot.
+		"""
+		self.seq += 1
+		self.pending = True
+		if self._next is not None:
+			reset = reset or self._next[3]
+		self._next = (self.seq, switches, Graph(switches), reset)
+
+		if self._sent is None:
+			self._send_next()
+		return self.seq
+
+
+	def _send_next(self):
+		seq, switches, graph, reset = self._next
+		self._next = None
+		self._sent = (seq, switches, graph)
+		self._send.send((seq, reset, snapshot(graph)))
+
+
+	def poll(self):
+		"""
+		Return the (seq, switches, graph, changed, rows) result 
+		of the snapshot being computed, None if it is not ready.
+		Each result must be applied, see ShortestPaths.apply, it is 
+		superseded if seq is not the last sequence number submitted.
+		"""
+		if self._sent is None or not self._recv.poll():
+			return None
+
+		seq, changed, rows = self._recv.recv()
+		_, switches, graph = self._sent
+		self._sent = None
+		if self._next is not None:
+			self._send_next()
+		self.pending = seq != self.seq
+
+		return seq, switches, graph, changed, rows
+
+
+	def close(self):
+		"""
+		Stop the worker process.
+		"""
+		self._send.close()
+		self._process.join(1)
+		if self._process.is_alive():
+			self._process.terminate()
+		self._recv.close()
@@ -34,24 +34,56 @@ import ipv6_utils
 
 from static import OF_TABLE_ROUTING
 from static import OF_TABLE_UES
+from static import TEEM_DEBOUNCE_WINDOW
+from static import TEEM_DEBOUNCE_MAX_DELAY
+from static import ROUTING_ALGORITHM
+from static import ROUTING_MULTIPATH
+from static import ROUTING_FAST_FAILOVER
+from static import TEEM_ROUTING_WORKER
+from static import TEEM_ROUTING_WORKER_POLL
+from static import TEEM_LABEL_FORWARDING
+from static import TEEM_DL_AGGREGATION
+from static import TEEM_MAKE_BEFORE_BREAK
+from static import TEEM_HANDOVER_TIMEOUT
 
 from switch import OFRule
+from switch import OFGroup
+from switch import of_fingerprint
+
+import routing
+
+from handover import Handover
+
+from tracing import tracer
+
+from timeslice import TimeSlicer
 
 from event import *
 
 from nmm.event import EventTopologyUpdate
 from nmm.event import EventWriteOFRule
 from nmm.event import EventDelOFRule
+from nmm.event import EventWriteOFGroup
+from nmm.event import EventDelOFGroup
+from nmm.event import EventSendBarrier
+from nmm.event import EventBarrierDone
 
 from amm.event import EventUEAnchorsUpdate
 # End import from iJOIN solution files
 
 # Start import from Ryu files
+import time
+
+from collections import OrderedDict
+from collections import Counter
+
 from ryu.base import app_manager
 
 from ryu.controller.handler import set_ev_cls
 from ryu.controller.handler import MAIN_DISPATCHER
 
+from ryu.lib import hub
+
 from ryu.ofproto import ether
 from ryu.ofproto import inet
 
@@ -74,7 +106,7 @@ class Teem(app_manager.RyuApp):
 	================ =========================================================
 	"""
 	OFP_VERSIONS = [ofproto.OFP_VERSION]
-	_EVENTS = [EventRoutingUpdate]
+	_EVENTS = [EventRoutingUpdate, EventHandoverComplete]
 
 	
 	def __init__(self, *args, **kwargs):
@@ -85,6 +117,53 @@ class Teem(app_manager.RyuApp):
 		switches         The dictionary storing the switches.
 		previous         The previous dictionary calculated by Dijkstra
 		distance         The distance dictionary calculated by Dijkstra		
+		routing_ofr      The dictionary storing the routing rules of each 
+						 destination tree, by destination dpid
+		routing_groups   The dictionary storing the routing groups of each 
+						 destination tree, by destination dpid
+		ue_groups        The dictionary storing the keys of the fast failover
+						 groups used by the rules of each UE, by UE hw_addr
+		dl_aggregate_ofr The dictionary storing the downlink rules on the 
+						 aggregate prefixes of the UEs, by gateway dpid
+		_paths           The ShortestPaths maintaining the trees of the switches
+		_routed_switches The switches of the last routing computation
+		_group_ids       The dictionary storing the group_id of the routing 
+						 groups, by destination dpid, and of the UE groups,
+						 by (out port, path end dpid)
+		_ue_groups       The dictionary storing the UE fast failover groups 
+						 with their primary Link and path end dpid, by key
+		_ue_group_users  The dictionary storing the hw_addr of the UEs using
+						 each UE fast failover group, by key
+		_dl_classes      The dictionary storing the switch, in_port, actions,
+						 instructions, prefix of each member UE by hw_addr
+						 and aggregate rules of the downlink classes, by 
+						 gateway dpid and (dpid, in_port, prefix length, 
+						 instructions fingerprint)
+		_ue_anchors      The dictionary storing the signature, rules, groups
+						 and downlink transit rules of each UE toward each
+						 anchor, by UE hw_addr and anchor dpid
+		_routing_resets  The number of full routing computations, the UE
+						 rules built before the last one are outdated
+		_handovers       The dictionary storing the Handover in progress, 
+						 by UE hw_addr
+		_handover_deferred The dictionary storing the EventUEAnchorsUpdate 
+						 waiting for the Handover of the UE, by UE hw_addr
+		_trace_barriers  The dictionary storing the Counter of the barrier 
+						 replies awaited from each switch, by correlation ID
+		_worker          The RoutingWorker computing the trees, None if they 
+						 are computed inline
+		_worker_thread   The greenthread waiting for the results of the
+						 worker, None if none is awaited
+		_worker_seq      The sequence number of the last snapshot applied
+		_worker_changed  The changes of the worker results superseded by a
+						 newer snapshot, None if every path may have changed
+		_deferred_ues    The dictionary storing the EventUEAnchorsUpdate 
+						 waiting for the routing, by UE hw_addr
+		_first_change    The time of the first topology change not yet routed,
+						 None if the routing is up to date
+		_last_change     The time of the last topology change
+		_debounce_thread The greenthread waiting for the end of the burst of
+						 topology changes, None if there is none
 		================ =========================================================
 		"""	
 		super(Teem, self).__init__(*args, **kwargs)
@@ -92,41 +171,45 @@ class Teem(app_manager.RyuApp):
 		self.switches = {}
 		self.previous = {}
 		self.distance = {}
-		self.path = {}
 		self.routing_ofr = {}
+		self.routing_groups = {}
 		self.ue_ofr = {}
-
-
-	def _dijkstra(self, start_sw):
+		self.ue_groups = {}
+		self.dl_aggregate_ofr = {}
+
+		self._paths = routing.ShortestPaths(ROUTING_ALGORITHM, ROUTING_MULTIPATH, ROUTING_FAST_FAILOVER)
+		self._routed_switches = {}
+		self._group_ids = {}
+		self._ue_groups = {}
+		self._ue_group_users = {}
+		self._dl_classes = {}
+		self._ue_anchors = {}
+		self._routing_resets = 0
+		self._handovers = {}
+		self._handover_deferred = {}
+		self._trace_barriers = {}
+
+		self._worker = None
+		self._worker_thread = None
+		self._worker_seq = 0
+		self._worker_changed = set()
+		self._deferred_ues = OrderedDict()
+		if TEEM_ROUTING_WORKER:
+			self._worker = routing.RoutingWorker(ROUTING_ALGORITHM, ROUTING_MULTIPATH, ROUTING_FAST_FAILOVER)
+
+		self._first_change = None
+		self._last_change = None
+		self._debounce_thread = None
+
+
+	def _dijkstra(self, start_sw, graph = None):
 		"""
 		Compute Dijkstra over the network topology starting from start_sw_dpid
 		"""
-		previous = {}
-		distance = {}
-		
-		# Initialization
-		for sw in self.switches.keys():
-			distance[sw] = float('inf')
-			previous[sw] = None
-		distance[start_sw.switch.dp.id] = 0
-
-		q = self.switches.keys()
-		while q:
-			u = q[0]
-			for node in q[1:]:
-				if (u not in distance) or ((node in distance) and (distance[node] < distance[u])):
-					u = node
-			q.remove(u)
-
-			for v, link in self.switches[u].links.iteritems():
-				for l in link:
-					if v in q:
-						alt = distance[u] + l.weight
-						if (v not in distance) or (alt < distance[v]):
-							distance[v] = alt
-							previous[v] = l
-
-		return distance, previous
+		if graph is None:
+			graph = routing.Graph(self.switches)
+
+		return routing.shortest_paths_dict(graph, start_sw.switch.dp.id)
 
 
 	def _extract_path(self, start_sw, end_sw):
@@ -147,76 +230,300 @@ class Teem(app_manager.RyuApp):
 		return path
 
 	
-	def _get_routing_of_rule(self, path):
+	def _get_routing_of_rule(self, dst_sw):
 		"""
-		Write the OpenFlow rules along the computed routing path 
+		Write the OpenFlow rules of the tree toward dst_sw: every switch
+		forwards on the first link of its own path to dst_sw, or to the
+		group of dst_sw in multipath or fast failover mode
 		"""
 		ofrs = {}
-		try:
-			start_sw = self.switches[path[0].link.src.dpid]
-			end_sw = self.switches[path[-1].link.dst.dpid]
+		dst_dpid = dst_sw.switch.dp.id
+
+		# Forwarding based on destination MAC unicast addr	
+		for sw_dpid, sw in self._paths.switches.iteritems():
+			if ROUTING_MULTIPATH:
+				if not self._paths.next_hops(sw_dpid).get(dst_dpid):
+					continue
+				actions = [ofp_parser.OFPActionGroup(self._group_ids[dst_dpid])]
+			else:
+				link = self._paths.first_hops(sw_dpid).get(dst_dpid)
+				if link is None:
+					continue
+				if ROUTING_FAST_FAILOVER:
+					actions = [ofp_parser.OFPActionGroup(self._group_ids[dst_dpid])]
+				else:
+					actions = [ofp_parser.OFPActionOutput(link.link.src.port_no)]
+
+			match = ofp_parser.OFPMatch(eth_dst = dst_sw.hw_addr)
+			instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
+			ofr = OFRule(sw, match, actions, instructions, table_id = OF_TABLE_ROUTING)
+			ofrs[ofr.key] = ofr
 
-			# Forwarding based on destination MAC unicast addr	
-			match = ofp_parser.OFPMatch(eth_dst = end_sw.hw_addr)
-			for p in path:
-				out_port = p.link.src.port_no
-				if match.get('in_port') == out_port:
-					out_port = ofproto.OFPP_IN_PORT
+		return ofrs
 
-				actions = [ofp_parser.OFPActionOutput(out_port)]
-				instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
-				ofr = OFRule(self.switches[p.link.src.dpid], match, actions, instructions, table_id = OF_TABLE_ROUTING)
-				ofrs[ofr.key] = ofr
-				match = ofp_parser.OFPMatch(eth_dst = end_sw.hw_addr)
-		except IndexError:
-			self.logger.debug("Index error in _get_path_of_rule")
 
-		return ofrs
+	def _get_routing_of_group(self, dst_sw):
+		"""
+		Write the OpenFlow groups of the tree toward dst_sw: every switch
+		balances over its equal cost next hops toward dst_sw in multipath
+		mode, skipping the ports down in fast failover mode, otherwise 
+		it fails over from its first hop to its backup next hop
+		"""
+		groups = {}
+		dst_dpid = dst_sw.switch.dp.id
+		group_id = self._group_ids.setdefault(dst_dpid, len(self._group_ids) + 1)
+
+		for sw_dpid, sw in self._paths.switches.iteritems():
+			if ROUTING_MULTIPATH:
+				links = self._paths.next_hops(sw_dpid).get(dst_dpid)
+				if not links:
+					continue
+
+				buckets = []
+				for link in links:
+					port_no = link.link.src.port_no
+					watch_port = port_no if ROUTING_FAST_FAILOVER else ofproto.OFPP_ANY
+					buckets.append(ofp_parser.OFPBucket(weight = 1, watch_port = watch_port, watch_group = ofproto.OFPG_ANY,
+										actions = [ofp_parser.OFPActionOutput(port_no)]))
+				group = OFGroup(sw, group_id, buckets)
+			else:
+				link = self._paths.first_hops(sw_dpid).get(dst_dpid)
+				if link is None:
+					continue
+
+				links = [link]
+				backup = self._paths.backup_hops(sw_dpid).get(dst_dpid)
+				if backup is not None:
+					links.append(backup)
+
+				buckets = [ofp_parser.OFPBucket(watch_port = l.link.src.port_no, watch_group = ofproto.OFPG_ANY,
+								actions = [ofp_parser.OFPActionOutput(l.link.src.port_no)]) for l in links]
+				group = OFGroup(sw, group_id, buckets, ofproto.OFPGT_FF)
+
+			groups[group.key] = group
+
+		return groups
+
+
+	def _schedule_routing(self):
+		"""
+		Coalesce the topology changes: the routing is computed once the
+		topology has been stable for TEEM_DEBOUNCE_WINDOW seconds or
+		TEEM_DEBOUNCE_MAX_DELAY seconds after the first change.
+		"""
+		if TEEM_DEBOUNCE_WINDOW <= 0:
+			self._update_routing()
+			return
+
+		self._last_change = time.time()
+		if self._first_change is None:
+			self._first_change = self._last_change
+		if self._debounce_thread is None:
+			self._debounce_thread = hub.spawn(self._debounce)
+
+
+	def _debounce(self):
+		while self._first_change is not None:
+			deadline = min(self._last_change + TEEM_DEBOUNCE_WINDOW, 
+						self._first_change + TEEM_DEBOUNCE_MAX_DELAY)
+			delay = deadline - time.time()
+			if delay <= 0:
+				self.send_event(self.name, EventRecomputeRouting())
+				break
+			hub.sleep(delay)
+
+		self._debounce_thread = None
+
+
+	@set_ev_cls(EventRecomputeRouting, MAIN_DISPATCHER)
+	def _handler_recompute_routing(self, ev):
+		"""
+		Handler for EventRecomputeRouting.
+		Compute the routing unless it is already up to date.
+		"""
+		if self._first_change is not None:
+			self._update_routing()
 
 
 	def _update_routing(self):
 		"""
-		Compute the routing on the network topology
-		and send EventRoutingUpdate event
+		Compute the routing on the network topology, or submit it to
+		the routing worker, and send EventRoutingUpdate event
 		"""
-		for sw_dpid, sw in self.switches.iteritems():
-			distance, previous = self._dijkstra(sw)
-			self.previous[sw_dpid] = previous
-			self.distance[sw_dpid] = distance
+		if self._first_change is not None:
+			self.logger.debug("Routing computed %.3f s after the first topology change", time.time() - self._first_change)
+		self._first_change = None
 
+		# A reconnected switch has new Switch and datapath instances, 
+		# the rules built for the previous ones are useless
+		reset = any(self._routed_switches.get(dpid) is not sw for dpid, sw in self.switches.iteritems())
+		self._routed_switches = self.switches
 
-		ofrs = {}
-		paths = {}
-		for swa_dpid, swa in self.switches.iteritems():
-			for swb_dpid, swb in self.switches.iteritems():
-				if swa_dpid not in paths:
-					paths[swa_dpid] = {}
-
-				paths[swa_dpid][swb_dpid] = self._extract_path(swa, swb)
-				ofrs_path = self._get_routing_of_rule(paths[swa_dpid][swb_dpid])
-				ofrs = dict(ofrs.items() + ofrs_path.items())
-
-		# Write new rules
-		for ofr in ofrs.itervalues():
-			req = EventWriteOFRule(ofr)
-			self.send_event(req.dst, req)
+		if self._worker is not None:
+			self._worker.submit(self.switches, reset)
+			if self._worker_thread is None:
+				self._worker_thread = hub.spawn(self._collect_routing)
+			return
 
-		# Delete old rules
-		diff = set(self.routing_ofr.keys()) - set(ofrs.keys())
-		for key in diff:
-			req = EventDelOFRule(self.routing_ofr[key])
-			self.send_event(req.dst, req)
+		if reset:
+			self._paths = routing.ShortestPaths(ROUTING_ALGORITHM, ROUTING_MULTIPATH, ROUTING_FAST_FAILOVER)
+
+		# Only the trees affected by the changes are recomputed
+		slicer = TimeSlicer("Routing", self.logger)
+		changed = self._paths.update(self.switches, slicer)
+		self._apply_routing(changed, slicer)
+		slicer.done()
 
-		self.routing_ofr = ofrs
-		self.path = paths
 
-		ev = EventRoutingUpdate(self.previous, self.distance)
+	def _collect_routing(self):
+		while self._worker.pending:
+			result = self._worker.poll()
+			if result is None:
+				hub.sleep(TEEM_ROUTING_WORKER_POLL)
+				continue
+			self.send_event(self.name, EventRoutingComputed(*result))
+
+		self._worker_thread = None
+
+
+	@set_ev_cls(EventRoutingComputed, MAIN_DISPATCHER)
+	def _handler_routing_computed(self, ev):
+		"""
+		Handler for EventRoutingComputed.
+		Apply the trees computed by the worker. The rules are written 
+		only for the last snapshot, the superseded ones are discarded.
+		"""
+		slicer = TimeSlicer("Routing", self.logger)
+		self._paths.apply(ev.switches, ev.graph, ev.changed, ev.rows, slicer)
+		self._worker_seq = ev.seq
+
+		if ev.changed is None or self._worker_changed is None:
+			self._worker_changed = None
+		else:
+			self._worker_changed.update(ev.changed)
+
+		if ev.seq != self._worker.seq:
+			self.logger.debug("Routing of snapshot " + str(ev.seq) + " superseded by snapshot " + str(self._worker.seq))
+			slicer.done()
+			return
+
+		changed = self._worker_changed
+		self._worker_changed = set()
+		self._apply_routing(changed, slicer)
+		slicer.done()
+
+		# Serve the UEs waiting for the routing
+		deferred = self._deferred_ues
+		self._deferred_ues = OrderedDict()
+		for ue_ev in deferred.itervalues():
+			self._handler_ue_anchor_update(ue_ev)
+
+
+	def _apply_routing(self, changed, slicer):
+		"""
+		Write the routing rules of the trees affected by changed
+		and send EventRoutingUpdate event
+		"""
+		self.previous = self._paths.previous
+		self.distance = self._paths.distance
+
+		# Only the trees toward the destinations of the changed paths
+		# are regenerated, the diff is computed tree by tree
+		if changed is None:
+			dsts = set(self._paths.switches.keys()) | set(self.routing_ofr.keys())
+			self._routing_resets += 1
+		else:
+			dsts = set(dst_dpid for _, dst_dpid in changed)
+
+		for dst_dpid in slicer.iterate(dsts):
+			old_ofrs = self.routing_ofr.pop(dst_dpid, {})
+			old_groups = self.routing_groups.pop(dst_dpid, {})
+			ofrs = {}
+			groups = {}
+			if dst_dpid in self._paths.switches:
+				if ROUTING_MULTIPATH or ROUTING_FAST_FAILOVER:
+					groups = self._get_routing_of_group(self._paths.switches[dst_dpid])
+					self.routing_groups[dst_dpid] = groups
+				ofrs = self._get_routing_of_rule(self._paths.switches[dst_dpid])
+				self.routing_ofr[dst_dpid] = ofrs
+
+			# Write new groups before the rules forwarding to them,
+			# a group whose next hops changed is modified in place
+			for key, group in groups.iteritems():
+				if changed is None or key not in old_groups or old_groups[key].fingerprint != group.fingerprint:
+					req = EventWriteOFGroup(group)
+					self.send_event(req.dst, req)
+
+			# Write new rules, all of them after a full computation
+			for key, ofr in ofrs.iteritems():
+				if changed is None or key not in old_ofrs or old_ofrs[key].fingerprint != ofr.fingerprint:
+					req = EventWriteOFRule(ofr)
+					self.send_event(req.dst, req)
+
+			# Delete old rules
+			for key, ofr in old_ofrs.iteritems():
+				if key not in ofrs:
+					req = EventDelOFRule(ofr)
+					self.send_event(req.dst, req)
+
+			# Delete old groups, once no rule forwards to them
+			for key, group in old_groups.iteritems():
+				if key not in groups:
+					req = EventDelOFGroup(group)
+					self.send_event(req.dst, req)
+
+		# The backup next hops of the UE groups may have changed
+		for key, (group, link, end_dpid) in slicer.iterate(self._ue_groups.iteritems()):
+			src_dpid = link.link.src.dpid
+			if changed is not None and (src_dpid, end_dpid) not in changed:
+				continue
+			if src_dpid not in self._paths.switches or end_dpid not in self._paths.switches:
+				continue
+			# The link of the group is gone, the UE rules are rebuilt
+			if src_dpid not in self.switches or link.link.dst.dpid not in self.switches:
+				continue
+
+			new_group = self._get_ue_of_group(link, end_dpid)
+			if changed is None or new_group.fingerprint != group.fingerprint:
+				self._ue_groups[key] = (new_group, link, end_dpid)
+				req = EventWriteOFGroup(new_group)
+				self.send_event(req.dst, req)
+
+		ev = EventRoutingUpdate(self.previous, self.distance, changed, self._paths.matrix, self._paths.graph.dpids)
 		self.send_event_to_observers(ev)
 
 
-	def _get_ue_ul_of_rule(self, ue, path, anchor):
+	def _get_ue_of_group(self, link, end_dpid):
+		"""
+		Write the OpenFlow fast failover group forwarding on link along
+		a path ending on end_dpid. If the port of link goes down, the
+		switch sends the packets on its backup next hop toward end_dpid,
+		addressed to end_dpid, and they are forwarded by the routing 
+		rules from there
+		"""
+		sw = self.switches[link.link.src.dpid]
+		port_no = link.link.src.port_no
+		group_id = self._group_ids.setdefault((port_no, end_dpid), len(self._group_ids) + 1)
+
+		actions = [ofp_parser.OFPActionSetField(eth_src = sw.hw_addr),
+					ofp_parser.OFPActionSetField(eth_dst = self.switches[link.link.dst.dpid].hw_addr),
+					ofp_parser.OFPActionOutput(port_no)]
+		buckets = [ofp_parser.OFPBucket(watch_port = port_no, watch_group = ofproto.OFPG_ANY, actions = actions)]
+
+		backup = self._paths.backup_hops(link.link.src.dpid).get(end_dpid)
+		if backup is not None and backup.link.src.port_no != port_no:
+			actions = [ofp_parser.OFPActionSetField(eth_src = sw.hw_addr),
+						ofp_parser.OFPActionSetField(eth_dst = self.switches[end_dpid].hw_addr),
+						ofp_parser.OFPActionOutput(backup.link.src.port_no)]
+			buckets.append(ofp_parser.OFPBucket(watch_port = backup.link.src.port_no, watch_group = ofproto.OFPG_ANY, actions = actions))
+
+		return OFGroup(sw, group_id, buckets, ofproto.OFPGT_FF)
+
+
+	def _get_ue_ul_of_rule(self, ue, path, anchor, groups):
 		"""
-		Write the OpenFlow rules along the computed routing path 
+		Write the OpenFlow rules along the computed routing path, the 
+		fast failover groups they forward to are added to groups
 		"""
 		ofrs = {}
 		try:
@@ -231,9 +538,15 @@ class Teem(app_manager.RyuApp):
 					match = ofp_parser.OFPMatch(in_port = inp,
 												eth_type = ether.ETH_TYPE_IPV6,
 												ipv6_src = (':'.join(anchor.nw_prefix), ipv6_utils.ipv6_mask_from_cidr(anchor.nw_prefix_len)))
-					actions = [ofp_parser.OFPActionSetField(eth_src = self.switches[p.link.src.dpid].hw_addr),
-								ofp_parser.OFPActionSetField(eth_dst = self.switches[p.link.dst.dpid].hw_addr),
-								ofp_parser.OFPActionOutput(out_port)]
+					if ROUTING_FAST_FAILOVER and out_port != ofproto.OFPP_IN_PORT:
+						end_dpid = path[-1].link.dst.dpid
+						group = self._get_ue_of_group(p, end_dpid)
+						groups[group.key] = (group, p, end_dpid)
+						actions = [ofp_parser.OFPActionGroup(group.group_id)]
+					else:
+						actions = [ofp_parser.OFPActionSetField(eth_src = self.switches[p.link.src.dpid].hw_addr),
+									ofp_parser.OFPActionSetField(eth_dst = self.switches[p.link.dst.dpid].hw_addr),
+									ofp_parser.OFPActionOutput(out_port)]
 					instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
 				
 					ofr = OFRule(self.switches[p.link.src.dpid], match, actions, instructions, table_id = OF_TABLE_UES)
@@ -247,13 +560,44 @@ class Teem(app_manager.RyuApp):
 		return ofrs
 
 
-	def _get_ue_dl_of_rule(self, ue, path, anchor):
+	def _get_ue_ul_edge_of_rule(self, ue, path, anchor):
+		"""
+		Write the OpenFlow rule labelling the packets of the UE at the AP
+		with the hw_addr of the GW, the routing rules carry them there
+		"""
+		ofrs = {}
+		try:
+			ap = self.switches[path[0].link.src.dpid]
+			gw = self.switches[path[-1].link.dst.dpid]
+
+			match = ofp_parser.OFPMatch(in_port = ap.ap_conf.port.port_no,
+										eth_type = ether.ETH_TYPE_IPV6,
+										ipv6_src = (':'.join(anchor.nw_prefix), ipv6_utils.ipv6_mask_from_cidr(anchor.nw_prefix_len)))
+			actions = [ofp_parser.OFPActionSetField(eth_src = ap.hw_addr),
+						ofp_parser.OFPActionSetField(eth_dst = gw.hw_addr)]
+			instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions),
+							ofp_parser.OFPInstructionGotoTable(OF_TABLE_ROUTING)]
+
+			ofr = OFRule(ap, match, actions, instructions, table_id = OF_TABLE_UES)
+			ofrs[ofr.key] = ofr
+
+		except IndexError:
+			self.logger.debug("Index error in _get_ue_ul_edge_of_rule")
+
+		return ofrs
+
+
+	def _get_ue_dl_of_rule(self, ue, path, anchor, groups, transit):
 		"""
-		Write the OpenFlow rules along the computed routing path 
+		Write the OpenFlow rules along the computed routing path, the 
+		fast failover groups they forward to are added to groups. In 
+		aggregation mode the (switch, in_port, actions, instructions) of
+		the rules on the global address are added to transit instead
 		"""
 		ofrs = {}
 		try:
 			# Forwarding based on destination MAC unicast addr	
+			global_addr = ipv6_utils.ipv6_global_from_mac(anchor.nw_prefix, anchor.nw_prefix_len, ue.hw_addr)
 			in_port = [self.switches[path[0].link.src.dpid].gw_conf.port.port_no]
 			for p in path:
 				for inp in in_port:
@@ -261,17 +605,26 @@ class Teem(app_manager.RyuApp):
 					if inp == out_port:
 						out_port = ofproto.OFPP_IN_PORT
 					
-					for ipv6_addr in [ue.ipv6_addr, ipv6_utils.ipv6_global_from_mac(anchor.nw_prefix, anchor.nw_prefix_len, ue.hw_addr)]:
+					for ipv6_addr in [ue.ipv6_addr, global_addr]:
 						match = ofp_parser.OFPMatch(in_port = inp,
 													eth_type = ether.ETH_TYPE_IPV6,
 													ipv6_dst = ipv6_addr)
-						actions = [ofp_parser.OFPActionSetField(eth_src = self.switches[p.link.src.dpid].hw_addr),
-									ofp_parser.OFPActionSetField(eth_dst = self.switches[p.link.dst.dpid].hw_addr),
-									ofp_parser.OFPActionOutput(out_port)]
+						if ROUTING_FAST_FAILOVER and out_port != ofproto.OFPP_IN_PORT:
+							end_dpid = path[-1].link.dst.dpid
+							group = self._get_ue_of_group(p, end_dpid)
+							groups[group.key] = (group, p, end_dpid)
+							actions = [ofp_parser.OFPActionGroup(group.group_id)]
+						else:
+							actions = [ofp_parser.OFPActionSetField(eth_src = self.switches[p.link.src.dpid].hw_addr),
+										ofp_parser.OFPActionSetField(eth_dst = self.switches[p.link.dst.dpid].hw_addr),
+										ofp_parser.OFPActionOutput(out_port)]
 						instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
 				
-						ofr = OFRule(self.switches[p.link.src.dpid], match, actions, instructions, table_id = OF_TABLE_UES)
-						ofrs[ofr.key] = ofr
+						if TEEM_DL_AGGREGATION and ipv6_addr == global_addr:
+							transit.append((self.switches[p.link.src.dpid], inp, actions, instructions))
+						else:
+							ofr = OFRule(self.switches[p.link.src.dpid], match, actions, instructions, table_id = OF_TABLE_UES)
+							ofrs[ofr.key] = ofr
 			
 						# ICMPv6 target	
 						for icmpv6_type in [icmpv6.ND_NEIGHBOR_SOLICIT, icmpv6.ND_NEIGHBOR_ADVERT]:
@@ -288,16 +641,26 @@ class Teem(app_manager.RyuApp):
 
 				in_port = [p.link.dst.port_no]
 
-			match = ofp_parser.OFPMatch(in_port = in_port[0],
-										eth_type = ether.ETH_TYPE_IPV6,
-										ipv6_dst = (':'.join(anchor.nw_prefix), ipv6_utils.ipv6_mask_from_cidr(anchor.nw_prefix_len)))
-			actions = [ofp_parser.OFPActionSetField(eth_src = anchor.gw.hw_addr),
-						ofp_parser.OFPActionSetField(eth_dst = ue.hw_addr),
-						ofp_parser.OFPActionOutput(self.switches[path[-1].link.dst.dpid].ap_conf.port.port_no)]
-			instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
+			# The packets failed over may reach the AP on any link, only 
+			# those addressed to the AP are delivered, not those in transit
+			ap = self.switches[path[-1].link.dst.dpid]
+			if ROUTING_FAST_FAILOVER:
+				in_port = in_port + sorted(set(l.link.src.port_no for links in ap.links.itervalues() for l in links) - set(in_port))
+
+			for inp in in_port:
+				fields = {'in_port': inp,
+							'eth_type': ether.ETH_TYPE_IPV6,
+							'ipv6_dst': (':'.join(anchor.nw_prefix), ipv6_utils.ipv6_mask_from_cidr(anchor.nw_prefix_len))}
+				if ROUTING_FAST_FAILOVER:
+					fields['eth_dst'] = ap.hw_addr
+				match = ofp_parser.OFPMatch(**fields)
+				actions = [ofp_parser.OFPActionSetField(eth_src = anchor.gw.hw_addr),
+							ofp_parser.OFPActionSetField(eth_dst = ue.hw_addr),
+							ofp_parser.OFPActionOutput(ap.ap_conf.port.port_no)]
+				instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
 			
-			ofr = OFRule(self.switches[path[-1].link.dst.dpid], match, actions, instructions, table_id = OF_TABLE_UES)
-			ofrs[ofr.key] = ofr
+				ofr = OFRule(ap, match, actions, instructions, table_id = OF_TABLE_UES)
+				ofrs[ofr.key] = ofr
 
 		except IndexError:
 			self.logger.debug("Index error in _get_ue_dl_of_rule")
@@ -305,35 +668,423 @@ class Teem(app_manager.RyuApp):
 		return ofrs
 
 
+	def _get_ue_dl_edge_of_rule(self, ue, path, anchor, transit):
+		"""
+		Write the OpenFlow rules labelling the packets toward the UE at
+		the GW with the hw_addr of the AP, the routing rules carry them
+		there, and delivering them at the AP. In aggregation mode the 
+		(switch, in_port, actions, instructions) of the rule on the 
+		global address are added to transit instead
+		"""
+		ofrs = {}
+		try:
+			gw = self.switches[path[0].link.src.dpid]
+			ap = self.switches[path[-1].link.dst.dpid]
+			inp = gw.gw_conf.port.port_no
+
+			global_addr = ipv6_utils.ipv6_global_from_mac(anchor.nw_prefix, anchor.nw_prefix_len, ue.hw_addr)
+			for ipv6_addr in [ue.ipv6_addr, global_addr]:
+				match = ofp_parser.OFPMatch(in_port = inp,
+											eth_type = ether.ETH_TYPE_IPV6,
+											ipv6_dst = ipv6_addr)
+				actions = [ofp_parser.OFPActionSetField(eth_src = gw.hw_addr),
+							ofp_parser.OFPActionSetField(eth_dst = ap.hw_addr)]
+				instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions),
+								ofp_parser.OFPInstructionGotoTable(OF_TABLE_ROUTING)]
+
+				if TEEM_DL_AGGREGATION and ipv6_addr == global_addr:
+					transit.append((gw, inp, actions, instructions))
+				else:
+					ofr = OFRule(gw, match, actions, instructions, table_id = OF_TABLE_UES)
+					ofrs[ofr.key] = ofr
+
+				# ICMPv6 target	
+				for icmpv6_type in [icmpv6.ND_NEIGHBOR_SOLICIT, icmpv6.ND_NEIGHBOR_ADVERT]:
+					match = ofp_parser.OFPMatch(in_port = inp,
+												eth_type = ether.ETH_TYPE_IPV6,
+												ip_proto = inet.IPPROTO_ICMPV6,
+												icmpv6_type = icmpv6_type,
+												ipv6_nd_target = ipv6_addr)
+					actions = [ofp_parser.OFPActionSetField(eth_dst = ap.hw_addr)]
+					instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions),
+									ofp_parser.OFPInstructionGotoTable(OF_TABLE_ROUTING)]
+
+					ofr = OFRule(gw, match, actions, instructions, table_id = OF_TABLE_UES)
+					ofrs[ofr.key] = ofr
+
+			# The packets may reach the AP on any link, only those
+			# labelled with the AP are delivered, not those in transit
+			in_port = sorted(set(l.link.src.port_no for links in ap.links.itervalues() for l in links))
+			for inp in in_port:
+				match = ofp_parser.OFPMatch(in_port = inp,
+											eth_type = ether.ETH_TYPE_IPV6,
+											eth_dst = ap.hw_addr,
+											ipv6_dst = (':'.join(anchor.nw_prefix), ipv6_utils.ipv6_mask_from_cidr(anchor.nw_prefix_len)))
+				actions = [ofp_parser.OFPActionSetField(eth_src = anchor.gw.hw_addr),
+							ofp_parser.OFPActionSetField(eth_dst = ue.hw_addr),
+							ofp_parser.OFPActionOutput(ap.ap_conf.port.port_no)]
+				instructions = [ofp_parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
+			
+				ofr = OFRule(ap, match, actions, instructions, table_id = OF_TABLE_UES)
+				ofrs[ofr.key] = ofr
+
+		except IndexError:
+			self.logger.debug("Index error in _get_ue_dl_edge_of_rule")
+
+		return ofrs
+
+
+	def _update_dl_aggregate_of_rule(self, gw_dpid, hw_addr, old_transit, new_transit):
+		"""
+		Move the UE hw_addr from the downlink classes of old_transit to
+		those of new_transit, each (nw_prefix, nw_prefix_len, transit) or
+		None, and write again the masked OpenFlow rules of these classes
+		only: the UEs whose rules on a switch and in_port have the same 
+		instructions share the rules on the fewest prefixes covering 
+		exactly theirs. Return the (old rule, new rule) of the aggregate 
+		rules changed, None where there is none
+		"""
+		classes = self._dl_classes.setdefault(gw_dpid, {})
+		aggr_ofrs = self.dl_aggregate_ofr.setdefault(gw_dpid, {})
+
+		touched = set()
+		if old_transit is not None:
+			nw_prefix, nw_prefix_len, transit = old_transit
+			for sw, inp, actions, instructions in transit:
+				key = (sw.switch.dp.id, inp, nw_prefix_len, of_fingerprint(instructions))
+				if key in classes:
+					classes[key][4].pop(hw_addr, None)
+					touched.add(key)
+		if new_transit is not None:
+			nw_prefix, nw_prefix_len, transit = new_transit
+			for sw, inp, actions, instructions in transit:
+				key = (sw.switch.dp.id, inp, nw_prefix_len, of_fingerprint(instructions))
+				members, ofrs = classes[key][4:] if key in classes else ({}, {})
+				members[hw_addr] = nw_prefix
+				classes[key] = (sw, inp, actions, instructions, members, ofrs)
+				touched.add(key)
+
+		# A rule may move between the classes of the same in_port
+		old_ofrs = {}
+		new_ofrs = {}
+		for key in touched:
+			sw, inp, actions, instructions, members, ofrs = classes[key]
+			old_ofrs.update(ofrs)
+
+			ofrs = {}
+			for prefix, prefix_len in ipv6_utils.ipv6_aggregate_prefixes(members.values(), key[2]):
+				match = ofp_parser.OFPMatch(in_port = inp,
+											eth_type = ether.ETH_TYPE_IPV6,
+											ipv6_dst = (':'.join(prefix), ipv6_utils.ipv6_mask_from_cidr(prefix_len)))
+				ofr = OFRule(sw, match, actions, instructions, table_id = OF_TABLE_UES)
+				ofrs[ofr.key] = ofr
+			new_ofrs.update(ofrs)
+
+			if members:
+				classes[key] = (sw, inp, actions, instructions, members, ofrs)
+			else:
+				del classes[key]
+
+		changes = []
+		for rule_key in set(old_ofrs.keys()) - set(new_ofrs.keys()):
+			changes.append((old_ofrs[rule_key], None))
+			del aggr_ofrs[rule_key]
+		for rule_key, ofr in new_ofrs.iteritems():
+			old_ofr = old_ofrs.get(rule_key)
+			if old_ofr is None or old_ofr.fingerprint != ofr.fingerprint:
+				changes.append((old_ofr, ofr))
+			aggr_ofrs[rule_key] = ofr
+
+		self.logger.debug("Downlink rules toward gateway <" + str(hex(gw_dpid)) + ">: " + str(len(touched)) + 
+						" classes aggregated again, " + str(len(aggr_ofrs)) + " rules in " + str(len(classes)) + " classes")
+
+		return changes
+
+
+	def _get_ue_anchor_signature(self, ap, anchor, path_ul, path_dl):
+		"""
+		Return what the rules of a UE toward anchor depend on: the AP and
+		its links, the anchor prefix and the links of both paths
+		"""
+		return (self._routing_resets, ap.switch.dp.id, 
+				tuple(sorted(l.link.src.port_no for links in ap.links.itervalues() for l in links)),
+				anchor.gw.switch.dp.id, anchor.nw_prefix, anchor.nw_prefix_len,
+				tuple(routing.link_key(l) for l in path_ul), tuple(routing.link_key(l) for l in path_dl))
+
+
 	@set_ev_cls(EventUEAnchorsUpdate, MAIN_DISPATCHER)
 	def _handler_ue_anchor_update(self, ev):
 		if ev.ue.hw_addr not in self.ue_ofr:
 			self.ue_ofr[ev.ue.hw_addr] = {}
 
+		# The paths must reflect the current topology
+		if self._first_change is not None:
+			self._update_routing()
+		if self._worker is not None and self._worker_seq != self._worker.seq:
+			self._deferred_ues[ev.ue.hw_addr] = ev
+			return
+		# The rules of the UE are being updated
+		if ev.ue.hw_addr in self._handovers:
+			self._handover_deferred[ev.ue.hw_addr] = ev
+			return
+
 		ap = ev.ue.attachment.switch
+		old_anchors = self._ue_anchors.get(ev.ue.hw_addr, {})
 
-		ofrs = {}
+		# Only the anchors whose paths or attachment changed are rebuilt
+		anchors = {}
+		rebuilt = set()
 		for anch_dpid, anch in ev.ue.attachment.anchors.iteritems():		
-			path_ul = self.path[ap.switch.dp.id][anch_dpid]
-			path_dl = self.path[anch_dpid][ap.switch.dp.id]
+			path_ul = self._extract_path(ap, anch.gw)
+			path_dl = self._extract_path(anch.gw, ap)
 
-			ofrs_ul = self._get_ue_ul_of_rule(ev.ue, path_ul, anch)
-			ofrs_dl = self._get_ue_dl_of_rule(ev.ue, path_dl, anch)
+			signature = self._get_ue_anchor_signature(ap, anch, path_ul, path_dl)
+			if anch_dpid in old_anchors and old_anchors[anch_dpid][0] == signature:
+				anchors[anch_dpid] = old_anchors[anch_dpid]
+				continue
 
-			ofrs = dict(ofrs.items() + ofrs_ul.items() + ofrs_dl.items())
+			groups = {}
+			transit_dl = []
+			if TEEM_LABEL_FORWARDING:
+				ofrs = self._get_ue_ul_edge_of_rule(ev.ue, path_ul, anch)
+				ofrs.update(self._get_ue_dl_edge_of_rule(ev.ue, path_dl, anch, transit_dl))
+			else:
+				ofrs = self._get_ue_ul_of_rule(ev.ue, path_ul, anch, groups)
+				ofrs.update(self._get_ue_dl_of_rule(ev.ue, path_dl, anch, groups, transit_dl))
 
-		# Write new rules
-		for ofr in ofrs.itervalues():
-			req = EventWriteOFRule(ofr)
-			self.send_event(req.dst, req)
+			anchors[anch_dpid] = (signature, ofrs, groups, (anch.nw_prefix, anch.nw_prefix_len, transit_dl))
+			rebuilt.add(anch_dpid)
+
+		removed = set(old_anchors.keys()) - set(anchors.keys())
 
-		# Delete old rules
-		diff = set(self.ue_ofr[ev.ue.hw_addr].keys()) - set(ofrs.keys())
+		# The rules of the later anchors take over the shared keys
+		ofrs = {}
+		groups = {}
+		for anch_dpid in ev.ue.attachment.anchors.iterkeys():
+			ofrs.update(anchors[anch_dpid][1])
+			groups.update(anchors[anch_dpid][2])
+
+		# Aggregate again the downlink classes of the UE toward the 
+		# gateways whose anchor was rebuilt or removed
+		aggregates = []
+		if TEEM_DL_AGGREGATION:
+			for gw_dpid in rebuilt | removed:
+				old_transit = old_anchors[gw_dpid][3] if gw_dpid in old_anchors else None
+				new_transit = anchors[gw_dpid][3] if gw_dpid in anchors else None
+				aggregates += self._update_dl_aggregate_of_rule(gw_dpid, ev.ue.hw_addr, old_transit, new_transit)
+
+		# Sort the requests in the phases of a make-before-break 
+		# handover: the new rules, the rules modified in place, which
+		# redirect the traffic, and the deletions
+		make = []
+		flip = []
+		break_ = []
+
+		# The aggregate rules, the UEs not affected keep theirs
+		for old_ofr, ofr in aggregates:
+			if old_ofr is None:
+				make.append(EventWriteOFRule(ofr))
+			elif ofr is not None:
+				flip.append(EventWriteOFRule(ofr))
+
+		# The groups of the rebuilt anchors before the rules forwarding 
+		# to them, the groups are shared by the UEs along the same links
+		for anch_dpid in rebuilt:
+			for key, ue_group in anchors[anch_dpid][2].iteritems():
+				self._ue_groups[key] = ue_group
+				make.append(EventWriteOFGroup(ue_group[0]))
+		for key in groups:
+			self._ue_group_users.setdefault(key, set()).add(ev.ue.hw_addr)
+
+		# The new rules
+		old_ofrs = self.ue_ofr[ev.ue.hw_addr]
+		written = 0
+		for key, ofr in ofrs.iteritems():
+			if key not in old_ofrs:
+				make.append(EventWriteOFRule(ofr))
+				written += 1
+			elif old_ofrs[key].fingerprint != ofr.fingerprint:
+				flip.append(EventWriteOFRule(ofr))
+				written += 1
+
+		# The old rules
+		diff = set(old_ofrs.keys()) - set(ofrs.keys())
 		for key in diff:
-			req = EventDelOFRule(self.ue_ofr[ev.ue.hw_addr][key])
-			self.send_event(req.dst, req)
+			break_.append(EventDelOFRule(old_ofrs[key]))
+
+		# The groups no longer used by any UE
+		for key in self.ue_groups.get(ev.ue.hw_addr, set()) - set(groups.keys()):
+			self._ue_group_users[key].discard(ev.ue.hw_addr)
+			if not self._ue_group_users[key]:
+				del self._ue_group_users[key]
+				break_.append(EventDelOFGroup(self._ue_groups.pop(key)[0]))
+
+		# The old aggregate rules
+		for old_ofr, ofr in aggregates:
+			if ofr is None:
+				break_.append(EventDelOFRule(old_ofr))
+
+		trace_id = ev.ue.attachment.trace_id
+		tracer.stamp(trace_id, 'rules')
+		if TEEM_MAKE_BEFORE_BREAK:
+			handover = Handover(ev.ue, make, flip, break_)
+			self._handovers[ev.ue.hw_addr] = handover
+			self._advance_handover(handover)
+		else:
+			switches = self._send_of_requests(make + flip + break_)
+			if tracer.is_open(trace_id):
+				self._trace_rules(trace_id, switches)
+
+		self.logger.debug("Rules of UE <" + ev.ue.hw_addr + ">: " + str(len(rebuilt)) + " anchors rebuilt, " + 
+						str(len(removed)) + " removed, " + str(written) + " rules written, " + str(len(diff)) + " deleted")
 
 		self.ue_ofr[ev.ue.hw_addr] = ofrs
+		self.ue_groups[ev.ue.hw_addr] = set(groups.keys())
+		self._ue_anchors[ev.ue.hw_addr] = anchors
+
+
+	def _send_of_requests(self, reqs):
+		"""
+		Send the requests to Nmm and return the switches involved, by dpid
+		"""
+		switches = {}
+		for req in reqs:
+			self.send_event(req.dst, req)
+			if isinstance(req, (EventWriteOFGroup, EventDelOFGroup)):
+				switches[req.of_group.key[0]] = req.of_group.switch
+			else:
+				switches[req.of_rule.key[0]] = req.of_rule.switch
+
+		return switches
+
+
+	def _trace_rules(self, trace_id, switches):
+		"""
+		Send a barrier to every switch the rules of the traced UE 
+		attachment were sent to
+		"""
+		for key in [key for key in self._trace_barriers if not tracer.is_open(key)]:
+			del self._trace_barriers[key]
+
+		if not switches:
+			tracer.stamp(trace_id, 'flowmods_sent')
+			tracer.stamp(trace_id, 'rules_acked')
+			return
+
+		# The barriers of a previous update of the same attachment
+		# may still be awaited
+		pending = self._trace_barriers.setdefault(trace_id, Counter())
+		pending.update(switches.keys())
+		for sw in switches.itervalues():
+			req = EventSendBarrier(sw, self.name, ('trace', trace_id), trace_id)
+			self.send_event(req.dst, req)
+
+
+	def _advance_handover(self, handover):
+		"""
+		Send the next phase of handover, with a barrier to every switch 
+		involved, or complete it once the traffic is redirected
+		"""
+		while handover.step < 2:
+			reqs = handover.make if handover.step == 0 else handover.flip
+			handover.step += 1
+			switches = self._send_of_requests(reqs)
+			if switches:
+				handover.cookie = (handover.ue.hw_addr, handover.start, handover.step)
+				handover.pending = set(switches.keys())
+				for sw in switches.itervalues():
+					req = EventSendBarrier(sw, self.name, handover.cookie, handover.ue.attachment.trace_id)
+					self.send_event(req.dst, req)
+				hub.spawn_after(TEEM_HANDOVER_TIMEOUT, self.send_event, self.name, 
+								EventHandoverTimeout(handover.ue.hw_addr, handover.cookie))
+				return
+
+		handover.redirected = time.time()
+		if handover.cookie is None:
+			tracer.stamp(handover.ue.attachment.trace_id, 'flowmods_sent')
+		tracer.stamp(handover.ue.attachment.trace_id, 'rules_acked')
+		self._complete_handover(handover)
+
+
+	def _complete_handover(self, handover):
+		"""
+		Delete the old rules and groups of the UE, but those used again
+		meanwhile by other UEs, and serve the UE event waiting
+		"""
+		hw_addr = handover.ue.hw_addr
+		break_ = []
+		for req in handover.break_:
+			if isinstance(req, EventDelOFGroup):
+				if req.of_group.key in self._ue_groups:
+					continue
+			elif any(req.of_rule.key in ofrs for ofrs in self.dl_aggregate_ofr.itervalues()):
+				continue
+			break_.append(req)
+		self._send_of_requests(break_)
+
+		del self._handovers[hw_addr]
+		if handover.flip or handover.break_:
+			self.logger.info("Handover of UE <" + hw_addr + ">: traffic redirected after " + 
+						"%.1f ms" % ((handover.redirected - handover.start)*1000) + ", old rules removed")
+
+		ev = EventHandoverComplete(handover.ue)
+		self.send_event_to_observers(ev)
+
+		if hw_addr in self._handover_deferred:
+			self._handler_ue_anchor_update(self._handover_deferred.pop(hw_addr))
+
+
+	@set_ev_cls(EventBarrierDone, MAIN_DISPATCHER)
+	def _handler_barrier_done(self, ev):
+		"""
+		Handler for EventBarrierDone.
+		Send the next phase of the handover once every switch confirmed,
+		or stamp the rules of a traced UE attachment as acknowledged.
+		"""
+		# The barriers of a traced UE attachment, those of an attachment 
+		# no longer traced are ignored
+		if ev.cookie[0] == 'trace':
+			trace_id = ev.cookie[1]
+			pending = self._trace_barriers.get(trace_id)
+			dpid = ev.switch.switch.dp.id
+			if pending is None or not pending[dpid]:
+				return
+			pending[dpid] -= 1
+			if not pending[dpid]:
+				del pending[dpid]
+			if not pending:
+				del self._trace_barriers[trace_id]
+				tracer.stamp(trace_id, 'rules_acked')
+			return
+
+		handover = self._handovers.get(ev.cookie[0])
+		if handover is None or handover.cookie != ev.cookie:
+			return
+
+		handover.pending.discard(ev.switch.switch.dp.id)
+		if not handover.pending:
+			self._advance_handover(handover)
+
+
+	@set_ev_cls(EventHandoverTimeout, MAIN_DISPATCHER)
+	def _handler_handover_timeout(self, ev):
+		"""
+		Handler for EventHandoverTimeout.
+		Consider the phase done if some switch did not confirm it.
+		"""
+		handover = self._handovers.get(ev.hw_addr)
+		if handover is None or handover.cookie != ev.cookie or not handover.pending:
+			return
+
+		self.logger.warning("Handover of UE <" + ev.hw_addr + ">: no barrier reply from " + 
+						str([hex(dpid) for dpid in handover.pending]))
+		handover.pending = set()
+		self._advance_handover(handover)
+
+
+	def close(self):
+		if self._worker is not None:
+			self._worker.close()
 
 
 	@set_ev_cls(EventTopologyUpdate, MAIN_DISPATCHER)
@@ -343,5 +1094,6 @@ class Teem(app_manager.RyuApp):
 		Update the network topology stored locally.
 		"""
 		self.switches = ev.switches
-		# Update the routing according to new topology
-		self._update_routing()
+		# Update the routing according to new topology,
+		# once the burst of changes is over
+		self._schedule_routing()
@@ -0,0 +1,92 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+
+# Start import from Python files
+import os
+import random
+import sys
+import unittest
+# End import from Python files
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Start import from iJOIN solution files
+import ipv6_utils
+# End import from iJOIN solution files
+
+
+
+
+def _to_int(nw_prefix):
+	return int(''.join(q.zfill(4) for q in nw_prefix), 16)
+
+
+def _to_prefix(value):
+	return tuple('%x' % ((value >> (16*(7-i))) & 0xffff) for i in range(8))
+
+
+
+
+class TestAggregatePrefixes(unittest.TestCase):
+
+	def test_example(self):
+		nw_prefixes = [('2001','db8','0','2','0','0','0','0'), ('2001','db8','0','3','0','0','0','0')]
+		self.assertEqual(ipv6_utils.ipv6_aggregate_prefixes(nw_prefixes, 64), 
+						[(('2001','db8','0','2','0','0','0','0'), 63)])
+
+
+	def test_exact_cover(self):
+		rnd = random.Random(1)
+		base = _to_int(('2001','db8','0','0','0','0','0','0'))
+		for nw_prefix_len in (64, 48, 128):
+			for _ in range(100):
+				# The blocks are drawn close together, so that they merge
+				blocks = set(rnd.sample(range(64), rnd.randint(0, 64)))
+				nw_prefixes = [_to_prefix(base + (b << (128-nw_prefix_len))) for b in blocks]
+				aggregated = ipv6_utils.ipv6_aggregate_prefixes(nw_prefixes, nw_prefix_len)
+
+				covered = []
+				for prefix, prefix_len in aggregated:
+					value = _to_int(prefix)
+					self.assertTrue(prefix_len <= nw_prefix_len)
+					self.assertEqual(value % (1 << (128-prefix_len)), 0)
+					first = (value - base) >> (128-nw_prefix_len)
+					covered.extend(range(first, first + (1 << (nw_prefix_len-prefix_len))))
+				self.assertEqual(sorted(covered), sorted(blocks))
+
+				# The fewest prefixes: no two of them can be merged
+				merged = set((_to_int(p) >> (128-l+1), l) for p, l in aggregated)
+				self.assertEqual(len(merged), len(aggregated))
+
+
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,139 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+
+# Start import from Python files
+import os
+import random
+import sys
+import unittest
+# End import from Python files
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Start import from iJOIN solution files
+from ndisc.ndisc import NDPacketTemplates
+from ndisc.ndisc import NeighborAdvertisement
+from ndisc.ndisc import NeighborSolicitation
+from ndisc.ndisc import RouterAdvertisement
+# End import from iJOIN solution files
+
+
+
+
+class _Datapath:
+	def __init__(self, dpid):
+		self.id = dpid
+
+
+class _RyuSwitch:
+	def __init__(self, dpid):
+		self.dp = _Datapath(dpid)
+
+
+class _Switch:
+	def __init__(self, dpid, hw_addr, ipv6_addr, is_gw):
+		self.switch = _RyuSwitch(dpid)
+		self.hw_addr = hw_addr
+		self.ipv6_local_ucast_addr = ipv6_addr
+		self.is_gw = is_gw
+
+
+def _serialize(built):
+	built.pkt.serialize()
+	return bytearray(built.pkt.data)
+
+
+
+
+class TestNDPacketTemplates(unittest.TestCase):
+
+	def setUp(self):
+		self.rnd = random.Random(7)
+		self.templates = NDPacketTemplates()
+
+
+	def _mac(self):
+		return ':'.join('%02x' % self.rnd.randint(0, 255) for _ in range(6))
+
+
+	def _ipv6(self):
+		return ':'.join('%x' % self.rnd.randint(0, 0xffff) for _ in range(8))
+
+
+	def _switches(self):
+		return [_Switch(0x1000 + i, self._mac(), 'fe80::' + str(i + 1), i % 2 == 0) for i in range(4)]
+
+
+	def test_neighbor_solicitation(self):
+		switches = self._switches()
+		for _ in range(200):
+			sw = self.rnd.choice(switches)
+			eth_dst, ipv6_dst, ipv6_tgt = self._mac(), self._ipv6(), self._ipv6()
+			expected = _serialize(NeighborSolicitation(sw.hw_addr, eth_dst, sw.ipv6_local_ucast_addr, ipv6_dst, ipv6_tgt))
+			self.assertEqual(self.templates.neighbor_solicitation(sw, eth_dst, ipv6_dst, ipv6_tgt), expected)
+
+
+	def test_neighbor_advertisement(self):
+		switches = self._switches()
+		for _ in range(200):
+			sw = self.rnd.choice(switches)
+			eth_dst, ipv6_dst = self._mac(), self._ipv6()
+			expected = _serialize(NeighborAdvertisement(sw.hw_addr, eth_dst, sw.ipv6_local_ucast_addr, ipv6_dst, sw.is_gw))
+			self.assertEqual(self.templates.neighbor_advertisement(sw, eth_dst, ipv6_dst), expected)
+
+
+	def test_router_advertisement(self):
+		switches = self._switches()
+		for _ in range(200):
+			gw = self.rnd.choice(switches)
+			eth_dst, ipv6_dst = self._mac(), self._ipv6()
+			rou_l = self.rnd.randint(0, 0xffff)
+			ipv6_option = (self._ipv6(), self.rnd.randint(0, 128), 
+							self.rnd.randint(0, 0xffffffff), self.rnd.randint(0, 0xffffffff))
+			expected = _serialize(RouterAdvertisement(gw.hw_addr, eth_dst, gw.ipv6_local_ucast_addr, ipv6_dst, rou_l, [ipv6_option]))
+			self.assertEqual(self.templates.router_advertisement(gw, eth_dst, ipv6_dst, rou_l, ipv6_option), expected)
+
+
+	def test_remove_switch(self):
+		sw = self._switches()[0]
+		self.templates.neighbor_solicitation(sw, self._mac(), self._ipv6(), self._ipv6())
+		self.templates.remove_switch(sw.switch.dp.id)
+
+		# A switch reconnecting with another hw_addr gets a new template
+		sw.hw_addr = self._mac()
+		eth_dst, ipv6_dst, ipv6_tgt = self._mac(), self._ipv6(), self._ipv6()
+		expected = _serialize(NeighborSolicitation(sw.hw_addr, eth_dst, sw.ipv6_local_ucast_addr, ipv6_dst, ipv6_tgt))
+		self.assertEqual(self.templates.neighbor_solicitation(sw, eth_dst, ipv6_dst, ipv6_tgt), expected)
+
+
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,104 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+
+# Start import from Python files
+import os
+import sys
+import unittest
+# End import from Python files
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Start import from iJOIN solution files
+from ndisc.ndisc import PacketBuffer
+# End import from iJOIN solution files
+
+
+
+
+class TestPacketBuffer(unittest.TestCase):
+
+	def test_evict_ring_of_same_destination(self):
+		buf = PacketBuffer(16, 1000)
+		buf.push(1, 'a', 'x' * 400)
+		buf.push(1, 'a', 'x' * 400)
+		# Evicting both packets of 'a' removes its ring
+		buf.push(1, 'a', 'x' * 900)
+		self.assertEqual(buf.size, 900)
+		self.assertEqual(buf.pop(1, 'a'), [('x' * 900, None, None)])
+		self.assertEqual(buf.size, 0)
+
+
+	def test_evict_to_other_destination(self):
+		buf = PacketBuffer(16, 1000)
+		buf.push(1, 'a', 'x' * 600)
+		buf.push(1, 'a', 'x' * 600)
+		buf.push(1, 'b', 'y' * 500)
+		self.assertEqual(buf.size, 500)
+		self.assertEqual(len(buf), 1)
+		self.assertEqual(buf.pop(1, 'b'), [('y' * 500, None, None)])
+
+
+	def test_reject_packet_larger_than_budget(self):
+		buf = PacketBuffer(16, 1000)
+		buf.push(1, 'a', 'x' * 100)
+		buf.push(1, 'b', 'y' * 1001)
+		self.assertEqual(buf.size, 100)
+		self.assertEqual(buf.pop(1, 'b'), [])
+		self.assertEqual(buf.stats['dropped_budget'], 1)
+
+
+	def test_destination_full(self):
+		buf = PacketBuffer(2, 1000)
+		for i in range(3):
+			buf.push(1, 'a', str(i))
+		self.assertEqual([p[0] for p in buf.pop(1, 'a')], ['1', '2'])
+		self.assertEqual(buf.size, 0)
+
+
+	def test_release_switch_buffers(self):
+		buf = PacketBuffer(2, 1000)
+		buf.push(1, 'a', 'x' * 100, 7, 3)
+		buf.push(1, 'a', 'x' * 100)
+		# The packet held by the switch is dropped as the ring is full
+		self.assertEqual(buf.push(1, 'a', 'x' * 100), [(1, 7, 3)])
+		buf.push(2, 'b', 'y' * 700, 8, 4)
+		# The budget evicts the packets of 'a' first
+		self.assertEqual(buf.push(2, 'b', 'y' * 100, 9, 5), [])
+		self.assertEqual(buf.push(2, 'c', 'z' * 300), [(2, 8, 4)])
+		self.assertEqual(buf.discard_switch(2), [(2, 9, 5)])
+		self.assertEqual(buf.push(1, 'a', 'x' * 1001, 10, 6), [(1, 10, 6)])
+		self.assertEqual(buf.discard(1, 'a'), [])
+
+
+
+
+if __name__ == '__main__':
+	unittest.main()
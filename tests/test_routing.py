@@ -0,0 +1,226 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+
+# Start import from Python files
+import os
+import random
+import sys
+import unittest
+# End import from Python files
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Start import from iJOIN solution files
+from benchmark.routing import FakeLink
+from benchmark.routing import topology
+from teem import routing
+# End import from iJOIN solution files
+
+
+
+
+def _change_link(switches, rnd, weights):
+	"""
+	Add, delete or re-weight a random link of switches, the weights
+	are drawn from weights
+	"""
+	sw = rnd.choice(switches.values())
+	r = rnd.random()
+	if r < 0.3 and sw.links:
+		dpid = rnd.choice(sw.links.keys())
+		sw.links[dpid].pop(0)
+		if not sw.links[dpid]:
+			del sw.links[dpid]
+	elif r < 0.6:
+		dpid = rnd.choice(switches.keys())
+		if dpid != sw.dpid:
+			sw.links.setdefault(dpid, []).append(FakeLink(sw.port(), switches[dpid].port(), rnd.choice(weights)))
+	elif sw.links:
+		for link in sw.links[rnd.choice(sw.links.keys())]:
+			link.weight = rnd.choice(weights)
+
+
+def _link_ids(hops):
+	"""
+	Return the hops dictionary with the ids of its Links, for comparison
+	"""
+	return dict((dpid, [id(l) for l in links] if isinstance(links, list) else id(links)) 
+				for dpid, links in hops.iteritems())
+
+
+
+
+class TestShortestPaths(unittest.TestCase):
+
+	def _topology(self, rnd, weights):
+		switches = topology(30, 3, 0.3, rnd.randint(0, 1000))
+		for sw in switches.itervalues():
+			for links in sw.links.itervalues():
+				for link in links:
+					link.weight = rnd.choice(weights)
+		return switches
+
+
+	def test_incremental_update(self):
+		# The weights are drawn from a large range, so that the shortest
+		# paths are unique and the trees kept must be the trees recomputed
+		rnd = random.Random(1)
+		weights = range(1, 1000000)
+		switches = self._topology(rnd, weights)
+		paths = routing.ShortestPaths()
+		paths.update(dict(switches))
+
+		for _ in range(100):
+			_change_link(switches, rnd, weights)
+			paths.update(dict(switches))
+
+			fresh = routing.ShortestPaths()
+			fresh.update(dict(switches))
+			self.assertEqual(paths.distance, fresh.distance)
+			self.assertEqual(paths.previous, fresh.previous)
+			self.assertTrue((paths.matrix == fresh.matrix).all())
+
+
+	def test_changed_pairs(self):
+		# With equal cost ties the trees kept may differ from the trees
+		# recomputed, but not the distances, and the pairs whose path
+		# changed are reported
+		rnd = random.Random(2)
+		weights = [1, 2]
+		switches = self._topology(rnd, weights)
+		paths = routing.ShortestPaths()
+		paths.update(dict(switches))
+
+		for _ in range(100):
+			_change_link(switches, rnd, weights)
+			previous = dict((dpid, dict(p)) for dpid, p in paths.previous.iteritems())
+			changed = paths.update(dict(switches))
+
+			fresh = routing.ShortestPaths()
+			fresh.update(dict(switches))
+			self.assertEqual(paths.distance, fresh.distance)
+			for src, p in paths.previous.iteritems():
+				for dst, link in p.iteritems():
+					if link is not previous[src][dst]:
+						self.assertIn((src, dst), changed)
+
+
+	def test_floyd_warshall(self):
+		rnd = random.Random(3)
+		for weights, unique in ((range(1, 1000000), True), ([1, 2], False)):
+			switches = self._topology(rnd, weights)
+			for _ in range(20):
+				_change_link(switches, rnd, weights)
+				graph = routing.Graph(dict(switches))
+				matrix, previous, links = routing.floyd_warshall(graph)
+
+				for s in xrange(len(graph)):
+					distance, heap_previous = routing.shortest_paths(graph, s)
+					self.assertEqual(matrix[s].tolist(), distance)
+					# With equal cost ties any shortest path is correct
+					if unique:
+						self.assertEqual([links[i] if i >= 0 else None for i in previous[s]], heap_previous)
+					else:
+						for d, i in enumerate(previous[s]):
+							if i >= 0:
+								u = graph.edges[id(links[i])][0]
+								self.assertEqual(matrix[s][u] + links[i].weight, distance[d])
+
+
+	def test_floyd_warshall_update(self):
+		rnd = random.Random(4)
+		weights = range(1, 1000000)
+		switches = self._topology(rnd, weights)
+		paths = routing.ShortestPaths('floyd_warshall')
+		paths.update(dict(switches))
+
+		for _ in range(50):
+			_change_link(switches, rnd, weights)
+			paths.update(dict(switches))
+
+			fresh = routing.ShortestPaths('dijkstra')
+			fresh.update(dict(switches))
+			self.assertEqual(paths.distance, fresh.distance)
+			self.assertEqual(paths.previous, fresh.previous)
+
+
+	def test_next_hops(self):
+		# The equal cost next hops do not depend on how ties are broken
+		rnd = random.Random(5)
+		weights = [1, 2]
+		for algorithm in ('dijkstra', 'floyd_warshall'):
+			switches = self._topology(rnd, weights)
+			paths = routing.ShortestPaths(algorithm, multipath = True)
+			paths.update(dict(switches))
+
+			for _ in range(50):
+				_change_link(switches, rnd, weights)
+				old = dict((dpid, _link_ids(paths.next_hops(dpid))) for dpid in switches)
+				changed = paths.update(dict(switches))
+
+				fresh = routing.ShortestPaths(algorithm, multipath = True)
+				fresh.update(dict(switches))
+				for src in switches:
+					hops = _link_ids(paths.next_hops(src))
+					self.assertEqual(hops, _link_ids(fresh.next_hops(src)))
+					for dst in set(hops) | set(old[src]):
+						if hops.get(dst) != old[src].get(dst):
+							self.assertIn((src, dst), changed)
+
+
+	def test_backup_hops(self):
+		# The backup hops depend on the first hops, the weights are drawn
+		# from a large range so that the shortest paths are unique
+		rnd = random.Random(6)
+		weights = range(1, 1000000)
+		for algorithm in ('dijkstra', 'floyd_warshall'):
+			switches = self._topology(rnd, weights)
+			paths = routing.ShortestPaths(algorithm, backup = True)
+			paths.update(dict(switches))
+
+			for _ in range(50):
+				_change_link(switches, rnd, weights)
+				old = dict((dpid, _link_ids(paths.backup_hops(dpid))) for dpid in switches)
+				changed = paths.update(dict(switches))
+
+				fresh = routing.ShortestPaths(algorithm, backup = True)
+				fresh.update(dict(switches))
+				for src in switches:
+					hops = _link_ids(paths.backup_hops(src))
+					self.assertEqual(hops, _link_ids(fresh.backup_hops(src)))
+					for dst in set(hops) | set(old[src]):
+						if hops.get(dst) != old[src].get(dst):
+							self.assertIn((src, dst), changed)
+
+
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,183 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+
+# Start import from Python files
+import os
+import sys
+import unittest
+# End import from Python files
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Start import from iJOIN solution files
+from amm.event import EventUEAnchorsUpdate
+from benchmark.routing import FakeLink
+from benchmark.routing import FakeSwitch
+from nmm.event import EventDelOFRule
+from nmm.event import EventWriteOFRule
+from node import Anchor
+from teem.teem import Teem
+# End import from iJOIN solution files
+
+
+
+
+class _Switch:
+	"""
+	The fields of a Teem Switch the anchor signature depends on
+	"""
+	def __init__(self, dpid):
+		self.switch = FakeSwitch(dpid)
+		self.switch.dp = self.switch
+		self.switch.dp.id = dpid
+		self.links = {}
+
+
+class _Attachment:
+	def __init__(self, switch, anchors):
+		self.switch = switch
+		self.anchors = anchors
+		self.trace_id = None
+
+
+class _UE:
+	def __init__(self, hw_addr, attachment):
+		self.hw_addr = hw_addr
+		self.attachment = attachment
+
+
+class _Rule:
+	def __init__(self, switch, key):
+		self.switch = switch
+		self.key = key
+		self.fingerprint = key
+
+
+
+
+class TestUEAnchorDiff(unittest.TestCase):
+
+	def setUp(self):
+		self.teem = Teem()
+		self.ap = _Switch(1)
+		self.gws = dict((dpid, _Switch(dpid)) for dpid in (2, 3))
+		self.ap.links[2] = [FakeLink(self.ap.switch.port(), self.gws[2].switch.port())]
+
+		# The paths, by (start dpid, end dpid), and the anchors built
+		self.paths = {(1, 2): [FakeLink(self.ap.switch.port(), self.gws[2].switch.port())],
+					(2, 1): [FakeLink(self.gws[2].switch.port(), self.ap.switch.port())],
+					(1, 3): [FakeLink(self.ap.switch.port(), self.gws[3].switch.port())],
+					(3, 1): [FakeLink(self.gws[3].switch.port(), self.ap.switch.port())]}
+		self.built = []
+		self.requests = []
+
+		self.teem._extract_path = lambda start, end: self.paths[(start.switch.dp.id, end.switch.dp.id)]
+		self.teem._get_ue_ul_of_rule = lambda ue, path, anch, groups: self._rules('ul', anch)
+		self.teem._get_ue_dl_of_rule = lambda ue, path, anch, groups, transit: self._rules('dl', anch)
+		self.teem.send_event = lambda dst, req: self.requests.append(req)
+
+		self.anchors = dict((dpid, Anchor(gw, ('2020', str(dpid), '0', '1', '0', '0', '0', '0'))) 
+							for dpid, gw in self.gws.iteritems())
+		self.ue = _UE('00:11:22:33:44:55', _Attachment(self.ap, dict(self.anchors)))
+
+
+	def _rules(self, direction, anch):
+		gw_dpid = anch.gw.switch.dp.id
+		self.built.append((direction, gw_dpid))
+		# The key of a rule changes with its path
+		path = self.paths[(1, gw_dpid) if direction == 'ul' else (gw_dpid, 1)]
+		rule = _Rule(anch.gw, (direction, gw_dpid, id(path[0])))
+		return {rule.key: rule}
+
+
+	def _update(self):
+		self.built = []
+		self.requests = []
+		self.teem._handler_ue_anchor_update(EventUEAnchorsUpdate(self.ue))
+		written = set(r.of_rule.key[:2] for r in self.requests if isinstance(r, EventWriteOFRule))
+		deleted = set(r.of_rule.key[:2] for r in self.requests if isinstance(r, EventDelOFRule))
+		return set(self.built), written, deleted
+
+
+	def test_first_update(self):
+		built, written, deleted = self._update()
+		self.assertEqual(built, set([('ul', 2), ('dl', 2), ('ul', 3), ('dl', 3)]))
+		self.assertEqual(written, built)
+		self.assertEqual(deleted, set())
+
+
+	def test_unchanged(self):
+		self._update()
+		self.assertEqual(self._update(), (set(), set(), set()))
+
+
+	def test_path_change(self):
+		self._update()
+		self.paths[(3, 1)] = [FakeLink(self.gws[3].switch.port(), self.ap.switch.port())]
+		built, written, deleted = self._update()
+		self.assertEqual(built, set([('ul', 3), ('dl', 3)]))
+		self.assertEqual(written, set([('dl', 3)]))
+		self.assertEqual(deleted, set([('dl', 3)]))
+
+
+	def test_anchor_removed(self):
+		self._update()
+		del self.ue.attachment.anchors[2]
+		built, written, deleted = self._update()
+		self.assertEqual(built, set())
+		self.assertEqual(written, set())
+		self.assertEqual(deleted, set([('ul', 2), ('dl', 2)]))
+
+
+	def test_anchor_prefix_change(self):
+		self._update()
+		self.ue.attachment.anchors[2] = Anchor(self.gws[2], ('2020', '2', '0', '2', '0', '0', '0', '0'))
+		built, _, _ = self._update()
+		self.assertEqual(built, set([('ul', 2), ('dl', 2)]))
+
+
+	def test_ap_links_change(self):
+		self._update()
+		self.ap.links[3] = [FakeLink(self.ap.switch.port(), self.gws[3].switch.port())]
+		built, _, _ = self._update()
+		self.assertEqual(built, set([('ul', 2), ('dl', 2), ('ul', 3), ('dl', 3)]))
+
+
+	def test_routing_reset(self):
+		self._update()
+		self.teem._routing_resets += 1
+		built, _, _ = self._update()
+		self.assertEqual(built, set([('ul', 2), ('dl', 2), ('ul', 3), ('dl', 3)]))
+
+
+
+
+if __name__ == '__main__':
+	unittest.main()
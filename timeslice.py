@@ -0,0 +1,102 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+
+# Start import from iJOIN solution files
+from static import TIMESLICE_BUDGET
+# End import from iJOIN solution files
+
+# Start import from Python files
+import time
+# End import from Python files
+
+# Start import from Ryu files
+from ryu.lib import hub
+# End import from Ryu files
+
+
+
+
+class TimeSlicer:
+	"""
+	This class splits a long loop run by a handler into slices of at 
+	most budget seconds. Between two slices the other greenthreads of 
+	the hub run, e.g. the event loops of the other apps, so that they 
+	do not wait for the whole loop.
+	"""
+	def __init__(self, name, logger = None, budget = TIMESLICE_BUDGET):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		name             The name of the sliced work, for the report
+		logger           The logger the report is written to
+		budget           The duration of a slice in seconds, 0 never yields
+		slices           The number of slices run so far
+		================ =========================================================
+		"""
+		self.name = name
+		self.logger = logger
+		self.budget = budget
+		self.slices = 1
+
+		self._start = time.time()
+		self._slice_start = self._start
+
+
+	def check(self):
+		"""
+		Yield to the other greenthreads if the slice budget is exhausted
+		"""
+		if self.budget > 0 and time.time() - self._slice_start >= self.budget:
+			hub.sleep(0)
+			self.slices += 1
+			self._slice_start = time.time()
+
+
+	def iterate(self, iterable):
+		"""
+		Iterate over iterable, checking the budget after each item.
+		The items are read up front, so the loop body may change 
+		the collection iterable comes from.
+		"""
+		for item in list(iterable):
+			yield item
+			self.check()
+
+
+	def done(self):
+		"""
+		Report the number of slices the work needed.
+		"""
+		if self.logger is not None and self.slices > 1:
+			self.logger.debug(self.name + " done in " + str(self.slices) + " slices, " + 
+							"%.3f s" % (time.time() - self._start))
+
+		return self.slices
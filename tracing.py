@@ -0,0 +1,196 @@
+# Copyright (C) IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, hereby disclaims all 
+# copyright interest in the program 'OpenFlow-DMM', released by the Open Platform 
+# for DMM solutions (ODMM), written by Luca Cominardi <odmm-support@odmm.net>.
+#
+# signature of IMDEA Networks Institute and NETCOM research group, Department of 
+# Telematics Engineering, University Carlos III of Madrid, 12 June 2015.
+# Albert Banchs, Deputy director of IMDEA Networks Institute and Titular professor
+# at University Carlos III of Madrid.
+
+
+
+
+
+
+# Start import from iJOIN solution files
+from static import TRACE_HANDOVER
+from static import TRACE_MAX_OPEN
+# End import from iJOIN solution files
+
+# Start import from Python files
+import time
+import itertools
+import collections
+# End import from Python files
+
+
+
+
+# The stages of a UE attachment, each with the stage its latency 
+# is measured from
+STAGES = [('connected', 'rs'),
+		('anchors', 'connected'),
+		('rules', 'anchors'),
+		('flowmods_sent', 'rules'),
+		('rules_acked', 'flowmods_sent'),
+		('ra_sent', 'anchors'),
+		]
+
+# The upper bounds of the histogram buckets, in ms
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+
+
+class Histogram:
+	"""
+	A histogram of latencies, in ms.
+	"""
+	def __init__(self):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		counts           The list of the number of samples per bucket, the 
+						 last one counts the samples above the last bound
+		total            The sum of the samples
+		max              The greatest sample
+		================ =========================================================
+		"""
+		self.counts = [0] * (len(BUCKETS) + 1)
+		self.total = 0.0
+		self.max = 0.0
+
+
+	def add(self, value):
+		"""
+		Add a sample
+		"""
+		for i, bound in enumerate(BUCKETS):
+			if value <= bound:
+				self.counts[i] += 1
+				break
+		else:
+			self.counts[-1] += 1
+		self.total += value
+		self.max = max(self.max, value)
+
+
+	def to_dict(self):
+		count = sum(self.counts)
+		d = {'count': count,
+			'mean': self.total / count if count else 0.0,
+			'max': self.max,
+			'buckets': collections.OrderedDict()
+		}
+		for bound, n in zip(BUCKETS, self.counts):
+			d['buckets']['<=' + str(bound)] = n
+		d['buckets']['>' + str(BUCKETS[-1])] = self.counts[-1]
+
+		return d
+
+
+
+
+class Tracer:
+	"""
+	This class traces the UE attachments end-to-end. An attachment 
+	gets a correlation ID when its Router Solicitation is received, 
+	every app stamps the ID when the attachment goes through one of 
+	its stages. Once every stage is stamped the latency of each stage 
+	is added to its histogram.
+	"""
+	def __init__(self, enabled = TRACE_HANDOVER, max_open = TRACE_MAX_OPEN):
+		"""
+		================ =========================================================
+		Attribute        Description
+		================ =========================================================
+		enabled          Boolean instance.
+						 Tells if the attachments are traced or not.
+		max_open         The number of attachments traced at the same time
+		histograms       The dictionary storing the Histogram of each stage
+		_ids             The generator of the correlation IDs
+		_open            The ordered dictionary storing the stamps of the 
+						 attachments being traced, by correlation ID
+		================ =========================================================
+		"""
+		self.enabled = enabled
+		self.max_open = max_open
+		self.histograms = collections.OrderedDict()
+		for stage, ref in STAGES:
+			self.histograms[stage] = Histogram()
+		self.histograms['total'] = Histogram()
+
+		self._ids = itertools.count(1)
+		self._open = collections.OrderedDict()
+
+
+	def start(self):
+		"""
+		Start tracing an attachment and return its correlation ID, 
+		None if tracing is disabled
+		"""
+		if not self.enabled:
+			return None
+
+		trace_id = next(self._ids)
+		self._open[trace_id] = {'rs': time.time()}
+		while len(self._open) > self.max_open:
+			self._open.popitem(last = False)
+
+		return trace_id
+
+
+	def is_open(self, trace_id):
+		"""
+		Tell if the attachment is still being traced
+		"""
+		return trace_id in self._open
+
+
+	def stamp(self, trace_id, stage):
+		"""
+		Stamp the stage of the attachment. A stage stamped twice keeps
+		the last time.
+		"""
+		stamps = self._open.get(trace_id)
+		if stamps is None:
+			return
+
+		stamps[stage] = time.time()
+		if len(stamps) == len(STAGES) + 1:
+			del self._open[trace_id]
+			for stage, ref in STAGES:
+				self.histograms[stage].add((stamps[stage] - stamps[ref]) * 1000)
+			self.histograms['total'].add((max(stamps.itervalues()) - stamps['rs']) * 1000)
+
+
+	def to_dict(self):
+		d = collections.OrderedDict()
+		for stage, histogram in self.histograms.iteritems():
+			d[stage] = histogram.to_dict()
+
+		return d
+
+
+
+
+# The tracer shared by the apps
+tracer = Tracer()